@@ -1,7 +1,14 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 
 class BaseAlchemyRepository:
 
     def __init__(self, db: Session):
-        self.db = db
\ No newline at end of file
+        self.db = db
+
+
+class BaseAsyncAlchemyRepository:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Thread-safe counters of the connection requests of a pool: how many had to be served, how long they
+    waited for a connection and how many gave up after pool_timeout.
+    """
+
+    def __init__(self):
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+                "mean_wait_seconds": self.wait_seconds / self.waits if self.waits else 0.0,
+                "timeouts": self.timeouts,
+            }
+
+
+class _MeteredPool:
+    """
+    Times the connection requests of a queue pool. The time measured is the one spent waiting in the pool
+    queue, plus the opening of a new connection when the pool grows and the pre-ping when enabled.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            # Negative while the pool has not opened size connections yet
+            "overflow": self.overflow(),
+            **self.metrics.stats(),
+        }
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    pass
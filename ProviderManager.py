@@ -1,18 +1,19 @@
 from fastapi import Depends
 from requests import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from assistants.AssistantDocumentRepository import AssistantDocumentRepository
 from assistants.AssistantsManager import AssistantManager
-from assistants.AssistantsRepository import AssistantsRepository
+from assistants.AssistantsRepository import AssistantsRepository, AsyncAssistantsRepository
 from assistants.ToolManager import ToolManager
 from chat.ChatManager import ChatManager
-from config import get_db
-from conversation.ConversationRepository import ConversationRepository
+from config import get_db, get_async_db
+from conversation.ConversationRepository import ConversationRepository, AsyncConversationRepository
 from document.DocumentCategoryRepository import DocumentCategoryRepository
 from document.DocumentManager import DocumentManager
-from document.DocumentsRepository import DocumentsRepository
+from document.DocumentsRepository import DocumentsRepository, AsyncDocumentsRepository
 from job.JobRepository import JobRepository
-from message.MessageRepository import MessageRepository
+from message.MessageRepository import MessageRepository, AsyncMessageRepository
 from rights.UserManager import UserManager
 from rights.UserRepository import UserRepository
 
@@ -32,6 +33,10 @@ def message_dao_provider(session: Session = Depends(get_db)) -> MessageRepositor
     return MessageRepository(session)
 
 
+def async_message_dao_provider(session: AsyncSession = Depends(get_async_db)) -> AsyncMessageRepository:
+    return AsyncMessageRepository(session)
+
+
 def document_dao_provider(session: Session = Depends(get_db)) -> DocumentsRepository:
     return DocumentsRepository(session)
 
@@ -44,6 +49,10 @@ def document_manager_provider(session: Session = Depends(get_db)) -> DocumentMan
     return DocumentManager(DocumentsRepository(session))
 
 
+def async_document_manager_provider(session: AsyncSession = Depends(get_async_db)) -> DocumentManager:
+    return DocumentManager(AsyncDocumentsRepository(session))
+
+
 def user_manager_provider(session: Session = Depends(get_db)) -> UserManager:
     return UserManager(user_dao_provider(session),
                        category_dao_provider(session),
@@ -63,3 +72,14 @@ def chat_manager_provider(session: Session = Depends(get_db)) -> ChatManager:
                        document_manager_provider(session),
                        conversation_dao_provider(session)
                        )
+
+
+def async_assistant_manager_provider(session: AsyncSession = Depends(get_async_db)) -> AssistantManager:
+    return AssistantManager(AsyncMessageRepository(session), AsyncAssistantsRepository(session), ToolManager())
+
+
+def async_chat_manager_provider(session: AsyncSession = Depends(get_async_db)) -> ChatManager:
+    return ChatManager(AsyncMessageRepository(session),
+                       DocumentManager(AsyncDocumentsRepository(session)),
+                       AsyncConversationRepository(session)
+                       )
@@ -0,0 +1,28 @@
+import json
+import logging
+from typing import AsyncIterator, Tuple
+
+from CustomEncoder import CustomEncoder
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Ask reverse proxies not to buffer the stream
+}
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event, the payload is sent as a single line of JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=CustomEncoder)}\n\n"
+
+
+async def encode_events(events: AsyncIterator[Tuple[str, dict]]) -> AsyncIterator[str]:
+    """
+    Turns the (event, data) tuples produced by the managers into an SSE stream. An error raised while
+    streaming is sent as a last "error" event since the response status has already been sent.
+    """
+    try:
+        async for event, data in events:
+            yield format_sse(event, data)
+    except Exception as e:
+        logging.exception(f"Error occurred while streaming: {e}")
+        yield format_sse("error", {"detail": str(e)})
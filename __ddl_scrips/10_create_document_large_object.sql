@@ -0,0 +1,24 @@
+------------------------------------------------------------------------------------------------------------------------
+-- document content as a large object (document/DocumentsRepository.py)
+-- uploads and downloads are streamed chunk by chunk with lo_put / lo_get instead of going through a single
+-- BYTEA value held in memory, the rows stored before keep their BYTEA content
+ALTER TABLE document
+    ADD COLUMN content_oid  oid,
+    ADD COLUMN content_size bigint;
+
+-- large objects are not deleted with the row referencing them
+CREATE FUNCTION document_unlink_content() RETURNS trigger AS
+$$
+BEGIN
+    IF OLD.content_oid IS NOT NULL AND (TG_OP = 'DELETE' OR NEW.content_oid IS DISTINCT FROM OLD.content_oid) THEN
+        PERFORM lo_unlink(OLD.content_oid);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER document_unlink_content
+    AFTER UPDATE OF content_oid OR DELETE
+    ON document
+    FOR EACH ROW
+EXECUTE FUNCTION document_unlink_content();
@@ -0,0 +1,10 @@
+------------------------------------------------------------------------------------------------------------------------
+-- sha256 of the document content, the ETag of its downloads (document/DocumentsController.py)
+-- set at upload for the large object contents, computed here for the BYTEA ones
+ALTER TABLE document
+    ADD COLUMN content_hash text;
+
+UPDATE document
+SET content_hash = encode(sha256(document), 'hex'),
+    content_size = octet_length(document)
+WHERE document IS NOT NULL;
@@ -0,0 +1,74 @@
+------------------------------------------------------------------------------------------------------------------------
+-- content addressed store of the document contents (document/BlobStore.py)
+-- each distinct content is stored once as a large object, keyed by its sha256, the document rows only keep
+-- content_hash and content_size
+CREATE TABLE blob_content
+(
+    content_hash text PRIMARY KEY,
+    content_oid  oid     NOT NULL,
+    size         bigint  NOT NULL, -- size of the content
+    stored_size  bigint  NOT NULL, -- size of the large object, once compressed
+    compression  varchar(16),      -- NULL or 'zstd'
+    ref_count    integer NOT NULL DEFAULT 1
+);
+
+-- the large object goes with the last reference to it
+CREATE FUNCTION blob_content_unlink() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM lo_unlink(OLD.content_oid);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER blob_content_unlink
+    AFTER DELETE
+    ON blob_content
+    FOR EACH ROW
+EXECUTE FUNCTION blob_content_unlink();
+
+-- a document of the blob store has neither its own BYTEA nor its own large object
+CREATE FUNCTION document_release_content() RETURNS trigger AS
+$$
+BEGIN
+    IF OLD.content_hash IS NOT NULL AND OLD.document IS NULL AND OLD.content_oid IS NULL THEN
+        UPDATE blob_content SET ref_count = ref_count - 1 WHERE content_hash = OLD.content_hash;
+        DELETE FROM blob_content WHERE content_hash = OLD.content_hash AND ref_count <= 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER document_release_content
+    AFTER DELETE
+    ON document
+    FOR EACH ROW
+EXECUTE FUNCTION document_release_content();
+
+-- move the existing contents to the blob store, one copy per distinct content
+INSERT INTO blob_content (content_hash, content_oid, size, stored_size, ref_count)
+SELECT first.content_hash,
+       lo_from_bytea(0, coalesce(first.document, lo_get(first.content_oid))),
+       first.content_size,
+       first.content_size,
+       refs.ref_count
+FROM (SELECT DISTINCT ON (content_hash) content_hash, content_size, document, content_oid
+      FROM document
+      WHERE content_hash IS NOT NULL
+        AND (document IS NOT NULL OR content_oid IS NOT NULL)
+      ORDER BY content_hash, id) first
+         JOIN (SELECT content_hash, count(*) AS ref_count
+               FROM document
+               WHERE content_hash IS NOT NULL
+                 AND (document IS NOT NULL OR content_oid IS NOT NULL)
+               GROUP BY content_hash) refs USING (content_hash);
+
+-- the large objects of 10_create_document_large_object.sql are unlinked by its trigger
+UPDATE document
+SET document    = NULL,
+    content_oid = NULL
+WHERE content_hash IN (SELECT content_hash FROM blob_content)
+  AND (document IS NOT NULL OR content_oid IS NOT NULL);
+
+-- to be run outside of a transaction to give the space of the moved BYTEA back:
+-- VACUUM FULL document;
@@ -0,0 +1,23 @@
+------------------------------------------------------------------------------------------------------------------------
+-- text of the documents, extracted once per distinct content (document/DocumentText.py)
+CREATE TABLE document_text
+(
+    content_hash text PRIMARY KEY,
+    pages        text[]    NOT NULL,
+    extracted_on TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- the text goes with the last reference to the content, see 12_create_blob_content_table.sql
+CREATE FUNCTION blob_content_delete_text() RETURNS trigger AS
+$$
+BEGIN
+    DELETE FROM document_text WHERE content_hash = OLD.content_hash;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER blob_content_delete_text
+    AFTER DELETE
+    ON blob_content
+    FOR EACH ROW
+EXECUTE FUNCTION blob_content_delete_text();
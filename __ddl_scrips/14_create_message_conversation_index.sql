@@ -0,0 +1,8 @@
+------------------------------------------------------------------------------------------------------------------------
+-- last messages of a conversation (message/MessageRepository.py)
+-- ORDER BY id DESC LIMIT n on one conversation is read backwards from this index, without sorting the
+-- whole conversation
+CREATE INDEX CONCURRENTLY idx_message_conversation_id_id ON message (conversation_id, id);
+
+-- covered by the index above
+DROP INDEX CONCURRENTLY IF EXISTS idx_message_conversation_id;
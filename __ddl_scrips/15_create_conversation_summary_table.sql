@@ -0,0 +1,9 @@
+------------------------------------------------------------------------------------------------------------------------
+-- rolling summary of the messages gone out of the history window (message/RollingSummary.py)
+CREATE TABLE conversation_summary
+(
+    conversation_id INTEGER PRIMARY KEY REFERENCES conversation (id) ON DELETE CASCADE,
+    summary         TEXT      NOT NULL,
+    last_message_id INTEGER   NOT NULL, -- last message folded into the summary
+    updated_on      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
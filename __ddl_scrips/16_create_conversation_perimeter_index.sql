@@ -0,0 +1,4 @@
+------------------------------------------------------------------------------------------------------------------------
+-- conversations of a perimeter, newest first, by pages of ids (conversation/ConversationRepository.py)
+-- the assistant conversations are left out with an anti-join served by idx_assistants_conversation_id
+CREATE INDEX CONCURRENTLY idx_conversation_perimeter_id ON conversation (perimeter, id);
@@ -0,0 +1,14 @@
+------------------------------------------------------------------------------------------------------------------------
+-- persistent tier of the query embedding cache (embeddings/CachedEmbeddings.py)
+CREATE TABLE embedding_cache
+(
+    model      TEXT               NOT NULL,
+    deployment TEXT               NOT NULL,
+    text_hash  CHAR(64)           NOT NULL, -- sha256 of the embedded text
+    embedding  DOUBLE PRECISION[] NOT NULL,
+    created_on TIMESTAMP          NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (model, deployment, text_hash)
+);
+
+-- Used to purge old entries, e.g. DELETE FROM embedding_cache WHERE created_on < now() - interval '90 days';
+CREATE INDEX idx_embedding_cache_created_on ON embedding_cache (created_on);
@@ -0,0 +1,7 @@
+------------------------------------------------------------------------------------------------------------------------
+-- full-text search over the chunks, used by the hybrid retrieval (embeddings/ChunkSearch.py)
+-- 'simple' keeps codes, numbers and names as they are, without stemming nor stop words
+ALTER TABLE langchain_pg_embedding
+    ADD COLUMN document_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(document, ''))) STORED;
+
+CREATE INDEX idx_langchain_pg_embedding_document_tsv ON langchain_pg_embedding USING gin (document_tsv);
@@ -0,0 +1,11 @@
+------------------------------------------------------------------------------------------------------------------------
+-- perimeter membership of the chunks as an indexable array (embeddings/ChunkSearch.py)
+-- "/finance/ /hr/" in the metadata becomes {finance,hr}, filtered with && or @> on a GIN index
+-- instead of a leading wildcard LIKE on cmetadata
+ALTER TABLE langchain_pg_embedding
+    ADD COLUMN perimeters text[] GENERATED ALWAYS AS (
+        string_to_array(btrim(regexp_replace(coalesce(cmetadata ->> 'perimeter', ''), '[/[:space:]]+', '/', 'g'), '/'),
+                        '/')
+        ) STORED;
+
+CREATE INDEX idx_langchain_pg_embedding_perimeters ON langchain_pg_embedding USING gin (perimeters);
@@ -0,0 +1,17 @@
+------------------------------------------------------------------------------------------------------------------------
+-- HNSW index on the chunk embeddings, replaces the ivfflat index of 1_create_embedding_index.sql
+-- The retriever orders by cosine distance (<=>), which only an index built with vector_cosine_ops can serve.
+-- Unlike ivfflat, HNSW needs no training data and keeps its recall as the corpus grows.
+-- Recall/latency is tuned per search with hnsw.ef_search (ef_search on POST /document/search/), default 40.
+
+-- The column must have dimensions to be indexed, e.g. for text-embedding-ada-002 / text-embedding-3-small:
+-- ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector(1536);
+
+-- Building is much faster when the graph fits in memory
+SET maintenance_work_mem = '2GB';
+
+CREATE INDEX CONCURRENTLY idx_langchain_pg_embedding_embedding_hnsw
+    ON langchain_pg_embedding USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Drop the ivfflat index once the HNSW one is built, \d langchain_pg_embedding gives its name
+DROP INDEX CONCURRENTLY IF EXISTS langchain_pg_embedding_embedding_idx;
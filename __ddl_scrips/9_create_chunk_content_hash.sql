@@ -0,0 +1,30 @@
+------------------------------------------------------------------------------------------------------------------------
+-- content hash of the chunks (embeddings/IngestionPipeline.py)
+-- a chunk whose text is already in the collection reuses the stored vector instead of being embedded again,
+-- sha256 of the text, same as embeddings.PageParser.hash_content
+-- convert_to is not immutable, so the column can not be generated: the ingestion COPY writes it, the trigger
+-- fills it for the other writers (the LangChain add_documents of the embeddings job)
+ALTER TABLE langchain_pg_embedding
+    ADD COLUMN content_hash text;
+
+CREATE OR REPLACE FUNCTION langchain_pg_embedding_content_hash() RETURNS trigger AS
+$$
+BEGIN
+    IF NEW.content_hash IS NULL AND NEW.document IS NOT NULL THEN
+        NEW.content_hash := encode(sha256(convert_to(NEW.document, 'UTF8')), 'hex');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_langchain_pg_embedding_content_hash
+    BEFORE INSERT OR UPDATE OF document
+    ON langchain_pg_embedding
+    FOR EACH ROW
+EXECUTE FUNCTION langchain_pg_embedding_content_hash();
+
+UPDATE langchain_pg_embedding
+SET content_hash = encode(sha256(convert_to(document, 'UTF8')), 'hex')
+WHERE document IS NOT NULL;
+
+CREATE INDEX idx_langchain_pg_embedding_content_hash ON langchain_pg_embedding (collection_id, content_hash);
@@ -2,7 +2,7 @@ from typing import List, Sequence, Optional
 
 from sqlalchemy import delete, select
 
-from BaseAlchemyRepository import BaseAlchemyRepository
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
 from assistants.AssistantsDocument import AssistantsDocument, AssistantsDocumentCreate, AssistantsDocumentList
 
 
@@ -132,3 +132,28 @@ class AssistantDocumentRepository(BaseAlchemyRepository):
             shared_group_id=self.convert_to_str(assistant_document.shared_group_id)
 
         )
+
+
+class AsyncAssistantDocumentRepository(BaseAsyncAlchemyRepository):
+    """
+    Asynchronous counterpart of AssistantDocumentRepository for the tools of the async agent runs.
+
+    :ivar db: The async database session used for performing operations.
+    :type db: AsyncSession
+    """
+    async def list_by_assistant_id(self, assistant_id: int) -> List[AssistantsDocumentList]:
+        """
+        Retrieves the documents of an assistant without blocking the event loop.
+
+        :param assistant_id: ID of the assistant to filter documents by.
+        :type assistant_id: int
+        :return: List of AssistantsDocumentList objects.
+        :rtype: List[AssistantsDocumentList]
+        """
+        stmt = select(AssistantsDocument).where(AssistantsDocument.assistant_id == assistant_id)
+
+        assistants: Sequence[AssistantsDocument] = (await self.db.execute(stmt)).scalars().all()
+
+        # The mapping does not touch the session
+        mapper = AssistantDocumentRepository(None)
+        return [mapper.map_to_assistant_document_list(assistant) for assistant in assistants]
@@ -3,9 +3,11 @@ import tempfile
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Form, File, UploadFile
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
-from ProviderManager import assistant_manager_provider, conversation_dao_provider
+from ProviderManager import assistant_manager_provider, conversation_dao_provider, \
+    async_assistant_manager_provider
+from SseEncoder import encode_events, SSE_HEADERS
 from assistants.Assistant import AssistantCreate
 from assistants.AssistantCommand import AssistantCommand
 from assistants.AssistantsManager import AssistantManager
@@ -20,6 +22,7 @@ NOT_FOUND_RESPONSE = {404: {"description": "Not found"}}
 # Router Initialization
 router_assistant = APIRouter(prefix=ROUTER_PREFIX, tags=ROUTER_TAGS, responses=NOT_FOUND_RESPONSE)
 assistant_manager_dep = Annotated[AssistantManager, Depends(assistant_manager_provider)]
+async_assistant_manager_dep = Annotated[AssistantManager, Depends(async_assistant_manager_provider)]
 conversation_repository_dep = Annotated[ConversationRepository, Depends(conversation_dao_provider)]
 
 
@@ -33,8 +36,8 @@ def build_response_content(result):
 
 
 @router_assistant.post("/command/")
-def execute_command(assistant_command: AssistantCommand,
-                    assistant_manager: assistant_manager_dep) -> JSONResponse:
+async def execute_command(assistant_command: AssistantCommand,
+                          assistant_manager: async_assistant_manager_dep) -> JSONResponse:
     """
     Executes a command using the assistant manager and returns the result as a JSON response.
 
@@ -44,11 +47,31 @@ def execute_command(assistant_command: AssistantCommand,
     :return: Result of the command execution, wrapped in a JSON response.
     :rtype: JSONResponse
     """
-    result = assistant_manager.execute_command(assistant_command.conversation_id,
-                                               assistant_command.command)
+    result = await assistant_manager.aexecute_command(assistant_command.conversation_id,
+                                                      assistant_command.command)
     return JSONResponse(content=build_response_content(result))
 
 
+@router_assistant.post("/command/stream/")
+async def stream_command(assistant_command: AssistantCommand,
+                         assistant_manager: async_assistant_manager_dep) -> StreamingResponse:
+    """
+    Executes a command like /command/ but streams the answer as Server-Sent Events.
+
+    The stream is made of "token" events carrying the generated text as it arrives, followed by an "end"
+    event carrying the sources of the answer.
+
+    :param assistant_command: Contains the conversation ID and the command to be executed.
+    :type assistant_command: AssistantCommand
+    :param assistant_manager: Dependency that manages the execution of commands.
+    :return: The event stream of the command execution.
+    :rtype: StreamingResponse
+    """
+    events = assistant_manager.stream_command(assistant_command.conversation_id,
+                                              assistant_command.command)
+    return StreamingResponse(encode_events(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @router_assistant.post("/voicecommand/")
 def upload_voice_command(
         assistant_manager: assistant_manager_dep,
@@ -68,7 +91,7 @@ def upload_voice_command(
 
 @router_assistant.get("/command/")
 async def execute_get_command(command: str, conversation_id: str,
-                              assistant_manager: assistant_manager_dep, perimeter: str = None):
+                              assistant_manager: async_assistant_manager_dep, perimeter: str = None):
     """
     This function handles a GET request to execute a command using the assistant manager
     within a specific conversation context.
@@ -87,7 +110,7 @@ async def execute_get_command(command: str, conversation_id: str,
     :return: JSONResponse containing the result of the command execution.
     :rtype: JSONResponse
     """
-    result = assistant_manager.execute_command(conversation_id, command)
+    result = await assistant_manager.aexecute_command(conversation_id, command)
     return JSONResponse(content=build_response_content(result))
 
 
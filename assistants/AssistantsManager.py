@@ -1,4 +1,7 @@
+from typing import AsyncIterator, Tuple
+
 from langchain.agents import create_openai_tools_agent, AgentExecutor
+from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.documents.base import Blob
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
@@ -7,9 +10,11 @@ from langchain_core.runnables import RunnableWithMessageHistory
 from assistants.Assistant import Assistant, AssistantCreate
 from assistants.AssistantsRepository import AssistantsRepository
 from assistants.ToolManager import ToolManager, ToolName
-from chat.azure_openai import get_model_and_set_env
+from assistants.ToolSession import bind_async_session, bind_session
+from chat.AnswerTokens import AnswerTokens
+from chat.azure_openai import get_model
 from message.MessageRepository import MessageRepository
-from message.SqlMessageHistory import build_agent_memory
+from message.SqlMessageHistory import build_agent_memory, build_async_agent_memory
 
 
 class AssistantManager:
@@ -74,7 +79,7 @@ class AssistantManager:
 
     def execute_voice_command(self, conversation_id: str, tmp_path: str):
         audio_blob = Blob(path=tmp_path)
-        whisper = get_model_and_set_env("whisper")
+        whisper = get_model("whisper")
         documents = whisper.lazy_parse(blob=audio_blob)
 
         content = ""
@@ -104,11 +109,126 @@ class AssistantManager:
         :param gpt_model_number: str - The model number of the GPT to be used
         :return: dict - A dictionary containing the output and optionally the sources
         """
-        # Get the current conversation and build document memory
+        memory = build_agent_memory(self.message_repository, conversation_id)
+        conversational_agent_executor = self.build_agent_executor(memory, assistant_id,
+                                                                  assistant_description, use_document,
+                                                                  gpt_model_number)
 
-        local_chat = get_model_and_set_env(gpt_model_number)
+        # The tools use the session of the request rather than opening their own
+        with bind_session(self.message_repository.db):
+            result = conversational_agent_executor.invoke(
+                {"messages": [HumanMessage(command)]},
+                {"configurable": {"session_id": "unused"}},
+            )
 
-        memory = build_agent_memory(self.message_repository, conversation_id)
+        return self.build_result(result)
+
+    async def aexecute_command(self, conversation_id: str, command: str):
+        """
+        Asynchronous version of execute_command. The manager must be built with the async repositories, the
+        lookups, the history and the agent run are then awaited instead of holding a worker thread.
+
+        :param conversation_id: Unique identifier for the conversation
+        :type conversation_id: str
+        :param command: Command to be executed within the context of the conversation
+        :type command: str
+        :return: dict - A dictionary containing the output and optionally the sources
+        :rtype: dict
+        """
+        assistant: AssistantCreate = await self.assistants_repository.get_assistant_by_conversation_id(
+            conversation_id)
+        memory = build_async_agent_memory(self.message_repository, conversation_id)
+        conversational_agent_executor = self.build_agent_executor(memory, int(assistant.id),
+                                                                  assistant.description,
+                                                                  assistant.use_documents,
+                                                                  assistant.gpt_model_number)
+
+        with bind_async_session(self.message_repository.db):
+            result = await conversational_agent_executor.ainvoke(
+                {"messages": [HumanMessage(command)]},
+                {"configurable": {"session_id": "unused"}},
+            )
+
+        return self.build_result(result)
+
+    def build_result(self, result: dict) -> dict:
+        """
+        Keeps the output of the agent run, with its sources if intermediate steps are present.
+
+        :param result: dict - The result of the agent executor
+        :return: dict - A dictionary containing the output and optionally the sources
+        """
+        if "intermediate_steps" in result:
+            sources = self.extract_sources(result)
+            return {"output": result["output"], "sources": sources}
+        else:
+            return {"output": result["output"]}
+
+    async def stream_command(self, conversation_id: str, command: str) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streams the answer of the assistant linked to the conversation.
+
+        Yields ("token", {"token": ...}) events while the final answer is generated, then a single
+        ("end", {"sources": [...]}) event whose sources have the same shape as the ones returned by
+        execute_command. The turn is stored in the conversation history once the agent run completes.
+        Like aexecute_command, the manager must be built with the async repositories.
+
+        :param conversation_id: Unique identifier for the conversation
+        :type conversation_id: str
+        :param command: Command to be executed within the context of the conversation
+        :type command: str
+        :return: Asynchronous iterator of (event, data) tuples
+        :rtype: AsyncIterator[Tuple[str, dict]]
+        """
+        assistant: AssistantCreate = await self.assistants_repository.get_assistant_by_conversation_id(
+            conversation_id)
+        memory = build_async_agent_memory(self.message_repository, conversation_id)
+        conversational_agent_executor = self.build_agent_executor(memory, int(assistant.id),
+                                                                  assistant.description,
+                                                                  assistant.use_documents,
+                                                                  assistant.gpt_model_number)
+
+        # No session bound: the generator may be closed outside of the context it was iterated in, the tools
+        # take a session of the pool for each call
+        sources = []
+        streamed = False
+        output = None
+        answer_tokens = AnswerTokens()
+        async for event in conversational_agent_executor.astream_events(
+                {"messages": [HumanMessage(command)]},
+                {"configurable": {"session_id": "unused"}},
+                version="v2"):
+            if event["event"] == "on_chat_model_stream":
+                # Only the final answer is streamed, not the content of the tool selection steps
+                token = answer_tokens.token(event)
+                if token:
+                    streamed = True
+                    yield "token", {"token": token}
+            elif event["event"] == "on_chain_end" and not event["parent_ids"]:
+                result = event["data"]["output"]
+                output = result.get("output")
+                if "intermediate_steps" in result:
+                    sources = self.extract_sources(result)
+
+        # Models that do not support streaming only report the answer at the end of the run
+        if not streamed and output:
+            yield "token", {"token": output}
+
+        yield "end", {"sources": sources}
+
+    def build_agent_executor(self, memory: BaseChatMessageHistory, assistant_id: int, assistant_description: str,
+                             use_document: bool, gpt_model_number: str) -> RunnableWithMessageHistory:
+        """
+        Builds the tools agent of the assistant, wrapped with the history of the conversation.
+
+        :param memory: BaseChatMessageHistory - The history of the conversation
+        :param assistant_id: int - The identifier for the assistant being used
+        :param assistant_description: str - A description of the assistant
+        :param use_document: bool - Indicator whether to use a document
+        :param gpt_model_number: str - The model number of the GPT to be used
+        :return: RunnableWithMessageHistory - The agent executor bound to the conversation memory
+        """
+        local_chat = get_model(gpt_model_number)
 
         prompt, tools = self.create_prompt_and_tools(assistant_id, assistant_description, use_document)
         agent = create_openai_tools_agent(llm=local_chat, tools=tools, prompt=prompt)
@@ -116,7 +236,7 @@ class AssistantManager:
                                        return_intermediate_steps=True,
                                        verbose=True)
 
-        conversational_agent_executor = RunnableWithMessageHistory(
+        return RunnableWithMessageHistory(
             agent_executor,
             lambda session_id: memory,
             input_messages_key="messages",
@@ -124,17 +244,6 @@ class AssistantManager:
             output_messages_key="output",
         )
 
-        result = conversational_agent_executor.invoke(
-            {"messages": [HumanMessage(command)]},
-            {"configurable": {"session_id": "unused"}},
-        )
-
-        if "intermediate_steps" in result:
-            sources = self.extract_sources(result)
-            return {"output": result["output"], "sources": sources}
-        else:
-            return {"output": result["output"]}
-
     def create_prompt_and_tools(self, assistant_id: int, assistant_description: str, use_document: bool):
         """
         Generates a chat prompt template and retrieves the appropriate tools based
@@ -2,7 +2,7 @@ from typing import Sequence
 
 from sqlalchemy import select
 
-from BaseAlchemyRepository import BaseAlchemyRepository
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
 from assistants.Assistant import Assistant, AssistantCreate
 
 
@@ -117,7 +117,8 @@ class AssistantsRepository(BaseAlchemyRepository):
         self.db.commit()
         return affected_rows
 
-    def map_to_assistant(self, db_assistant: Assistant) -> AssistantCreate:
+    @staticmethod
+    def map_to_assistant(db_assistant: Assistant) -> AssistantCreate:
         """
         Maps a database Assistant object to an AssistantCreate object.
 
@@ -144,3 +145,24 @@ class AssistantsRepository(BaseAlchemyRepository):
 
         return assistant
 
+
+class AsyncAssistantsRepository(BaseAsyncAlchemyRepository):
+    """
+    Asynchronous counterpart of AssistantsRepository for the command execution path.
+
+    :ivar db: The async database session used for performing operations.
+    :type db: AsyncSession
+    """
+    async def get_assistant_by_conversation_id(self, conversation_id: str) -> AssistantCreate:
+        """
+        Retrieve an assistant by the given conversation ID without blocking the event loop.
+
+        :param conversation_id: The ID of the conversation to find the assistant for.
+        :type conversation_id: str
+        :return: An AssistantCreate object representing the found assistant.
+        :rtype: AssistantCreate
+        """
+        stmt = select(Assistant).where(Assistant.conversation_id == int(conversation_id))
+        assistant: Assistant = (await self.db.execute(stmt)).scalars().first()
+
+        return AssistantsRepository.map_to_assistant(assistant)
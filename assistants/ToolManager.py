@@ -1,26 +1,27 @@
 # ToolManager.py
-import asyncio
-import io
 import logging
 import time
 from datetime import datetime
 from enum import Enum
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional
 
-import tiktoken
 from duckduckgo_search import DDGS
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
 from pydantic import BaseModel
-from pypdf import PdfReader
 
-import config
-from assistants.AssistantDocumentRepository import AssistantDocumentRepository
+from assistants.AssistantDocumentRepository import AssistantDocumentRepository, AsyncAssistantDocumentRepository
+from assistants.AssistantsDocument import AssistantsDocumentList
+from assistants.ToolSession import async_tool_session, tool_session
 from document.Document import LangChainDocument
 from document.DocumentManager import DocumentManager
 from document.DocumentsRepository import DocumentsRepository
+from document.TemplatePlaceholders import format_placeholder, format_placeholders
 from embeddings.CustomAzurePGVectorRetriever import CustomAzurePGVectorRetriever
 from embeddings.QueryType import QueryType
 
+# Maximum number of tokens of library chunks handed to the model by search_library
+SEARCH_LIBRARY_TOKEN_BUDGET = 100000
+
 
 class ToolName(str, Enum):
     WEB_SEARCH = "web_search"
@@ -84,98 +85,103 @@ def get_date() -> datetime:
     return datetime.now()
 
 
-async def fetch_sessions():
-    async for session in config.get_db():
-        yield session
-
-
-async def async_fetch_and_prepare_sessions():
-    db_sessions = []
-    async for session in fetch_sessions():
-        db_sessions.append(session)
-    return db_sessions
+def get_document_text(document_manager: DocumentManager, document_id: int) -> str:
+    # Extracted on the first call only, see document/DocumentText.py
+    text = document_manager.get_document_text(document_id)
+    if text is None:
+        return "Error: Document not found."
+    return text
 
 
-def fetch_and_prepare_sessions_sync():
-    return asyncio.run(async_fetch_and_prepare_sessions())
+def get_template_placeholders(document_manager: DocumentManager, document_id: int,
+                              placeholder_id: Optional[int] = None) -> str:
+    placeholders = document_manager.get_template_placeholders(document_id)
+    if placeholders is None:
+        return "Error: Document not found."
+    if not placeholders:
+        # No @@@ placeholder, the whole template is needed
+        return get_document_text(document_manager, document_id)
 
+    if placeholder_id is None:
+        return format_placeholders(placeholders)
 
-def get_document_text(document_manager: DocumentManager, document_id: int) -> str:
-    pdf_stream = document_manager.get_stream_by_id(document_id)
-    pdf_reader = PdfReader(io.BytesIO(pdf_stream.document))
-    text_content = ""
-    for page in pdf_reader.pages:
-        text_content += page.extract_text()
-    return text_content
+    selected = [placeholder for placeholder in placeholders if placeholder.id == placeholder_id]
+    if not selected:
+        return (f"Error: Unknown placeholder {placeholder_id}, "
+                f"the template has placeholders 1 to {len(placeholders)}.")
+    # On its own, a placeholder is given its whole window
+    return format_placeholder(selected[0])
 
 
 @tool
-def template(document_id) -> []:
-    """This tool is used to load a document content"""
+def template(document_id, placeholder_id: Optional[int] = None) -> str:
+    """
+    This tool is used to load the placeholders of a template document, each with the text around it.
 
+    :param document_id: The id of the template document.
+    :param placeholder_id: The number of a single placeholder to load, all of them when not set.
+    :return: The placeholders with their position and surrounding text, or the whole template text when it
+     has no placeholder.
+    """
+
+    # The session of the agent run, see assistants/ToolSession.py
     try:
-        sessions = fetch_and_prepare_sessions_sync()
+        with tool_session() as session:
+            return get_template_placeholders(DocumentManager(DocumentsRepository(session)), int(document_id),
+                                             placeholder_id)
     except Exception as e:
-        logging.error(f"Failed to fetch sessions: {e}")
-        return "Error fetching sessions."
+        logging.error(f"Failed to load template {document_id}: {e}")
+        return "Error loading the template."
 
-    if not sessions:
-        logging.error("No repositories found.")
-        return "Error: No repositories found."
 
-    document_manager = DocumentManager(DocumentsRepository(sessions[0]))
+def search_library_retriever(assistant_id: str,
+                             assistants_document: List[AssistantsDocumentList]) -> Optional[CustomAzurePGVectorRetriever]:
+    logging.debug("Assistant id: %s", assistant_id)
+    document_ids = [doc.document_id for doc in assistants_document]
+    if not document_ids:
+        return None
 
-    return get_document_text(document_manager, int(document_id))
+    # Nearest chunks first, stopping at the budget, instead of loading the whole library
+    return CustomAzurePGVectorRetriever(QueryType.DOCUMENTS, ",".join(map(str, document_ids)), -1,
+                                        token_budget=SEARCH_LIBRARY_TOKEN_BUDGET)
 
 
-@tool
-def search_library(assistant_id: str, query: str) -> List[LangChainDocument]:
+def to_langchain_documents(docs) -> List[LangChainDocument]:
+    return [LangChainDocument(page_content=doc.page_content, metadata=doc.metadata) for doc in docs]
+
+
+def search_library_sync(assistant_id: str, query: str) -> List[LangChainDocument]:
     """This tool is used to search documents in the user's library."""
 
     try:
-        sessions = fetch_and_prepare_sessions_sync()
+        with tool_session() as session:
+            assistants_document = AssistantDocumentRepository(session).list_by_assistant_id(int(assistant_id))
     except Exception as e:
-        logging.error(f"Failed to fetch sessions: {e}")
+        logging.error(f"Failed to list the documents of assistant {assistant_id}: {e}")
         return []
 
-    if not sessions:
-        logging.error("No repositories found.")
+    rag_retriever = search_library_retriever(assistant_id, assistants_document)
+    if rag_retriever is None:
         return []
+    return to_langchain_documents(rag_retriever.invoke(query))
 
-    assistant_document_manager = AssistantDocumentRepository(sessions[0])
-
-    logging.debug("Assistant id: %s", assistant_id)
-    assistants_document = assistant_document_manager.list_by_assistant_id(int(assistant_id))
-
-    document_ids = [doc.document_id for doc in assistants_document]
 
-    xls_present = any(
-        doc.document_name.lower().endswith(('.xls', '.xlsx', '.xlsm', '.xlsb')) for doc in assistants_document)
+async def asearch_library(assistant_id: str, query: str) -> List[LangChainDocument]:
+    """Async variant of search_library, run by the async agent executions"""
 
+    try:
+        async with async_tool_session() as session:
+            assistants_document = await AsyncAssistantDocumentRepository(session).list_by_assistant_id(
+                int(assistant_id))
+    except Exception as e:
+        logging.error(f"Failed to list the documents of assistant {assistant_id}: {e}")
+        return []
 
-    if not document_ids:
+    rag_retriever = search_library_retriever(assistant_id, assistants_document)
+    if rag_retriever is None:
         return []
+    return to_langchain_documents(await rag_retriever.ainvoke(query))
+
 
-    rag_retriever = CustomAzurePGVectorRetriever(QueryType.DOCUMENTS, ",".join(map(str, document_ids)), -1)
-    docs = rag_retriever.invoke(query)
-    documents: list[LangChainDocument] = []
-    for document in docs:
-        current_doc = LangChainDocument(
-            page_content=document.page_content,
-            metadata=document.metadata
-        )
-        documents.append(current_doc)
-    encoding = tiktoken.get_encoding("o200k_base")
-
-    total_token: int = 0
-
-    for document in documents:
-        total_token += len(encoding.encode(document.model_dump_json()))
-
-    if total_token > 100000:
-        logging.info(f'Too much token : {total_token}, defaulting to standard RAG')
-        rag_retriever = CustomAzurePGVectorRetriever(QueryType.DOCUMENTS, ",".join(map(str, document_ids)), 10)
-        docs = rag_retriever.invoke(query)
-        return [LangChainDocument(page_content=doc.page_content, metadata=doc.metadata) for doc in docs]
-
-    return documents
+search_library = StructuredTool.from_function(func=search_library_sync, coroutine=asearch_library,
+                                              name=ToolName.SEARCH_LIBRARY.value)
@@ -0,0 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import config
+
+# Sessions of the request running the agent, seen by its tools through the context of the run. LangChain
+# copies the context into the threads and the tasks running the tool calls.
+_session: ContextVar[Optional[Session]] = ContextVar("tool_session", default=None)
+_async_session: ContextVar[Optional[tuple[AsyncSession, asyncio.Lock]]] = ContextVar("async_tool_session",
+                                                                                     default=None)
+
+
+@contextmanager
+def bind_session(session: Session) -> Iterator[None]:
+    """
+    Makes the session of the request the one of the tools of a sync agent run, whose tool calls are
+    made one after the other.
+    """
+    token = _session.set(session)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+@contextmanager
+def bind_async_session(session: AsyncSession) -> Iterator[None]:
+    """
+    Makes the async session of the request the one of the async tools of an agent run. The tool calls of
+    a step run concurrently, they take turns on the session.
+    """
+    token = _async_session.set((session, asyncio.Lock()))
+    try:
+        yield
+    finally:
+        _async_session.reset(token)
+
+
+@contextmanager
+def tool_session() -> Iterator[Session]:
+    """
+    :return: The session bound to the agent run, else a session of the pool closed at the end of the block.
+    """
+    session = _session.get()
+    if session is not None:
+        yield session
+        return
+    with config.SessionLocal() as session:
+        yield session
+
+
+@asynccontextmanager
+async def async_tool_session() -> AsyncIterator[AsyncSession]:
+    """
+    :return: The async session bound to the agent run, held for the block, else a session of the pool
+     closed at the end of the block.
+    """
+    bound = _async_session.get()
+    if bound is not None:
+        session, lock = bound
+        async with lock:
+            yield session
+        return
+    async with config.AsyncSessionLocal() as session:
+        yield session
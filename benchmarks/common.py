@@ -0,0 +1,32 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+
+def load_environment():
+    """Loads the same .env file as main.py"""
+    if os.getenv("ENVIRONNEMENT") == "PROD":
+        load_dotenv("config/.env")
+    else:
+        load_dotenv("devenv/.env")
+
+
+@contextmanager
+def timed(samples: list[float]):
+    """Appends the elapsed time of the block, in milliseconds, to samples"""
+    start = time.perf_counter()
+    yield
+    samples.append((time.perf_counter() - start) * 1000)
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
@@ -0,0 +1,89 @@
+"""
+Measures the post-retrieval diversity stage (embeddings/Diversity.py): prompt tokens spent on
+near-duplicate chunks in the top-k, with and without the stage, and the CPU cost of the stage per query.
+
+The candidates are synthetic, so the benchmark runs without a database: each query gets a ranked list of
+candidate embeddings in which a share are perturbed copies of better ranked chunks, like adjacent pages or
+boilerplate repeated in several uploads.
+
+    python -m benchmarks.diversity --k 10 --fetch-factor 4 --duplicates 0.3 --queries 500
+"""
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.common import summarize
+from embeddings.Diversity import diversify
+
+DIMENSIONS = 1536
+
+
+def candidates(rng: np.random.Generator, count: int, duplicate_share: float, tokens: int):
+    query = rng.normal(size=DIMENSIONS)
+    rows = []
+    for i in range(count):
+        if rows and rng.random() < duplicate_share:
+            original = rows[rng.integers(len(rows))]
+            embedding = original.embedding + rng.normal(scale=0.02, size=DIMENSIONS)
+            rows.append(SimpleNamespace(embedding=embedding, token_count=tokens, copy_of=original.copy_of))
+        else:
+            # Decreasing relevance along the ranking
+            embedding = query * (1 - i / count) + rng.normal(size=DIMENSIONS)
+            rows.append(SimpleNamespace(embedding=embedding, token_count=tokens, copy_of=i))
+    return query, rows
+
+
+def duplicate_tokens(rows) -> int:
+    seen, wasted = set(), 0
+    for row in rows:
+        if row.copy_of in seen:
+            wasted += row.token_count
+        seen.add(row.copy_of)
+    return wasted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fetch-factor", type=int, default=4)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of candidates that are copies")
+    parser.add_argument("--tokens", type=int, default=400, help="tokens per chunk")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    parser.add_argument("--threshold", type=float, default=0.95)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    stages = {
+        "none": {},
+        "dedupe": {"duplicate_threshold": args.threshold},
+        "mmr": {"mmr_lambda": args.mmr_lambda},
+        "dedupe+mmr": {"duplicate_threshold": args.threshold, "mmr_lambda": args.mmr_lambda},
+    }
+    latencies = {name: [] for name in stages}
+    wasted = {name: 0 for name in stages}
+
+    for _ in range(args.queries):
+        query, rows = candidates(rng, args.k * args.fetch_factor, args.duplicates, args.tokens)
+        for name, options in stages.items():
+            start = time.process_time()
+            selected = diversify(rows, query, args.k, **options) if options else rows[:args.k]
+            latencies[name].append((time.process_time() - start) * 1000)
+            wasted[name] += duplicate_tokens(selected)
+
+    report = {
+        name: {
+            "cpu": summarize(latencies[name]),
+            "duplicate_tokens_per_query": round(wasted[name] / args.queries, 1),
+            "tokens_saved_per_query": round((wasted["none"] - wasted[name]) / args.queries, 1),
+        }
+        for name in stages
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
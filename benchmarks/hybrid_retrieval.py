@@ -0,0 +1,73 @@
+"""
+Compares dense-only and hybrid (dense + full-text, fused with RRF) retrieval on a labelled query set.
+
+The query set is a JSON list of objects:
+
+    {"query": "penalty clause of contract 2023-117", "ids": ["12", "15"], "perimeter": "",
+     "expected": ["2023-117"]}
+
+"ids" or "perimeter" select the filter like POST /document/search/ does, "expected" lists the snippets the
+relevant chunks contain. Recall@k is the share of expected snippets found in the returned chunks.
+
+    python -m benchmarks.hybrid_retrieval queries.json --k 10 --runs 5
+"""
+import argparse
+import json
+
+from benchmarks.common import load_environment, summarize, timed
+
+
+def recall(documents, expected: list[str]) -> float:
+    if not expected:
+        return 1.0
+    contents = [document.page_content.lower() for document in documents]
+    found = sum(1 for snippet in expected if any(snippet.lower() in content for content in contents))
+    return found / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", help="JSON file with the labelled queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per query and mode")
+    args = parser.parse_args()
+
+    load_environment()
+
+    import config
+    from embeddings import PGVectorStore
+    from embeddings.CustomAzurePGVectorRetriever import CustomAzurePGVectorRetriever
+    from embeddings.QueryType import QueryType
+
+    config.init_db()
+    PGVectorStore.init_vector_store()
+
+    with open(args.queries) as file:
+        queries = json.load(file)
+
+    report = {}
+    for mode, hybrid in (("dense", False), ("hybrid", True)):
+        latencies, recalls = [], []
+        for item in queries:
+            if item.get("perimeter"):
+                retriever = CustomAzurePGVectorRetriever(QueryType.PERIMETER, item["perimeter"], args.k, hybrid=hybrid)
+            else:
+                retriever = CustomAzurePGVectorRetriever(QueryType.DOCUMENTS, ",".join(item["ids"]), args.k,
+                                                         hybrid=hybrid)
+            # Warm the embedding cache so that only the database query is timed
+            PGVectorStore.get_embeddings().embed_query(item["query"])
+
+            documents = []
+            for _ in range(args.runs):
+                # _search bypasses the retrieval cache
+                with timed(latencies):
+                    documents = retriever._search(item["query"])
+            recalls.append(recall(documents, item.get("expected", [])))
+
+        report[mode] = {**summarize(latencies), f"recall@{args.k}": round(sum(recalls) / len(recalls), 3)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
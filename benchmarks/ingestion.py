@@ -0,0 +1,100 @@
+"""
+Measures the throughput of the ingestion pipeline (embeddings/IngestionPipeline.py) in pages/sec and
+chunks/sec, to size bulk library imports.
+
+Parsing and chunking only, on local files, without database nor embedding model:
+
+    python -m benchmarks.ingestion parse ./library --workers 4
+
+End to end on documents already stored in the database (parse, embed, COPY, status updates):
+
+    python -m benchmarks.ingestion ingest 12 13 14
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import time
+
+from benchmarks.common import load_environment
+
+
+def report(pages: int, chunks: int, seconds: float, **extra):
+    print(json.dumps({
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(seconds, 2),
+        "pages_per_second": round(pages / seconds, 1) if seconds else None,
+        "chunks_per_second": round(chunks / seconds, 1) if seconds else None,
+        **extra,
+    }, indent=2))
+
+
+async def parse(args):
+    from embeddings.IngestionPipeline import IngestionPipeline
+
+    pipeline = IngestionPipeline(workers=args.workers, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                 embed_batch_size=64, embed_concurrency=4)
+    files = sorted(path for path in pathlib.Path(args.directory).rglob("*") if path.is_file())
+    try:
+        # Starts the workers outside of the measure
+        await pipeline.parse("warmup.txt", b"warmup")
+
+        pages = chunks = 0
+        start = time.perf_counter()
+        for path in files:
+            file_pages, file_chunks = await pipeline.parse(path.name, path.read_bytes())
+            pages += file_pages
+            chunks += len(file_chunks)
+        report(pages, chunks, time.perf_counter() - start, files=len(files), workers=args.workers)
+    finally:
+        pipeline.close()
+
+
+async def ingest(args):
+    import config
+    from embeddings import PGVectorStore, IngestionPipeline
+
+    config.init_db()
+    PGVectorStore.init_vector_store()
+    IngestionPipeline.init_ingestion()
+    try:
+        pages = chunks = 0
+        stages = {"parse_seconds": 0.0, "embed_seconds": 0.0, "store_seconds": 0.0}
+        start = time.perf_counter()
+        for blob_id in args.blob_ids:
+            stats = await IngestionPipeline.get_ingestion_pipeline().ingest(blob_id)
+            if stats is None:
+                print(f"Ingestion of document {blob_id} failed, see the logs")
+                continue
+            pages += stats["pages"]
+            chunks += stats["chunks"]
+            for stage in stages:
+                stages[stage] += stats[stage]
+        report(pages, chunks, time.perf_counter() - start,
+               **{stage: round(seconds, 2) for stage, seconds in stages.items()})
+    finally:
+        IngestionPipeline.close_ingestion()
+        await config.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parse_command = commands.add_parser("parse", help="parse and chunk local files")
+    parse_command.add_argument("directory")
+    parse_command.add_argument("--workers", type=int, default=4)
+    parse_command.add_argument("--chunk-size", type=int, default=1000)
+    parse_command.add_argument("--chunk-overlap", type=int, default=200)
+
+    ingest_command = commands.add_parser("ingest", help="ingest stored documents end to end")
+    ingest_command.add_argument("blob_ids", type=int, nargs="+")
+
+    args = parser.parse_args()
+    load_environment()
+    asyncio.run(parse(args) if args.command == "parse" else ingest(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+class AnswerTokens:
+    """
+    Picks the tokens of the answer among the on_chat_model_stream events of an agent run. The model runs
+    calling tools are steps of the agent: once one of their chunks carries tool_call_chunks, the rest of
+    their content is left out of the answer.
+    """
+
+    def __init__(self):
+        self.tool_runs = set()
+
+    def token(self, event: dict) -> str:
+        """
+        :param event: An on_chat_model_stream event of astream_events
+        :return: The content of the chunk, empty when it belongs to a tool calling step
+        """
+        chunk = event["data"]["chunk"]
+        if getattr(chunk, "tool_call_chunks", None):
+            self.tool_runs.add(event["run_id"])
+        if event["run_id"] in self.tool_runs:
+            return ""
+        return chunk.content
@@ -3,9 +3,11 @@ import tempfile
 from typing import Annotated, Iterable
 
 from fastapi import APIRouter, Query, Depends, Form, UploadFile, File
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
-from ProviderManager import conversation_dao_provider, document_manager_provider, chat_manager_provider
+from ProviderManager import conversation_dao_provider, document_manager_provider, chat_manager_provider, \
+    async_chat_manager_provider
+from SseEncoder import encode_events, SSE_HEADERS
 from chat.ChatManager import ChatManager
 from conversation.ConversationRepository import ConversationRepository
 from document.DocumentManager import DocumentManager
@@ -24,6 +26,7 @@ Command entry point
 '''
 
 chat_manager_dep = Annotated[ChatManager, Depends(chat_manager_provider)]
+async_chat_manager_dep = Annotated[ChatManager, Depends(async_chat_manager_provider)]
 conversation_repository_dep = Annotated[ConversationRepository, Depends(conversation_dao_provider)]
 document_manager_dep = Annotated[DocumentManager, Depends(document_manager_provider)]
 
@@ -33,12 +36,21 @@ def format_docs(docs):
 
 
 @chat_ai.get("/command/")
-def message(chat_manager: chat_manager_dep,
-            command: str, conversation_id: str, perimeter: str = Query(None)):
-    result = chat_manager.message(command, conversation_id, perimeter)
+async def message(chat_manager: async_chat_manager_dep,
+                  command: str, conversation_id: str, perimeter: str = Query(None)):
+    result = await chat_manager.amessage(command, conversation_id, perimeter)
     return JSONResponse(content=build_response_content(result))
 
 
+@chat_ai.get("/command/stream/")
+async def stream_message(chat_manager: async_chat_manager_dep,
+                         command: str, conversation_id: str, perimeter: str = Query(None)):
+    """
+    Same as /command/ but the answer is sent as Server-Sent Events: one "token" event per generated token,
+    then an "end" event carrying the sources of the answer.
+    """
+    events = chat_manager.stream_message(command, conversation_id, perimeter)
+    return StreamingResponse(encode_events(events), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 @chat_ai.post("/voicecommand/")
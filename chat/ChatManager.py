@@ -1,14 +1,18 @@
 from http.client import HTTPException
+from typing import AsyncIterator, Tuple, Optional
 
 from langchain.agents import create_openai_tools_agent, AgentExecutor
 from langchain_core.documents.base import Blob
+from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableWithMessageHistory, RunnablePassthrough
 
 from assistants.ToolManager import ToolManager, ToolName
-from chat.azure_openai import get_model_and_set_env
+from assistants.ToolSession import bind_async_session, bind_session
+from chat.AnswerTokens import AnswerTokens
+from chat.azure_openai import get_model
 from conversation.Conversation import ConversationCreate
 from conversation.ConversationRepository import ConversationRepository
 from document.Document import DocumentCreate, DocumentType
@@ -16,7 +20,7 @@ from document.DocumentManager import DocumentManager
 from embeddings.CustomAzurePGVectorRetriever import CustomAzurePGVectorRetriever
 from embeddings.QueryType import QueryType
 from message.MessageRepository import MessageRepository
-from message.SqlMessageHistory import SqlMessageHistory, build_agent_memory
+from message.SqlMessageHistory import build_agent_memory, build_async_agent_memory
 
 
 def format_docs(docs):
@@ -34,30 +38,118 @@ class ChatManager:
         self.conversation_repository = conversation_repository
 
     def message(self, command: str, conversation_id: str, perimeter: str):
+        conversational_chain, chain_input = self.build_conversational_chain(command, conversation_id, perimeter)
+
+        # Invoke the chain with the command/query
+        try:
+            # The tools of the template agent use the session of the request
+            with bind_session(self.message_repository.db):
+                result = conversational_chain.invoke(chain_input, {"configurable": {"session_id": "unused"}})
+        except Exception as e:
+            print(f"Error occurred: {e}")
+            raise
+        return result
+
+    async def amessage(self, command: str, conversation_id: str, perimeter: str):
+        """ Asynchronous version of message(), the manager must be built with the async repositories """
+        conversational_chain, chain_input = await self.abuild_conversational_chain(command, conversation_id,
+                                                                                   perimeter)
+
+        try:
+            # Bound like the other agent runs. The template tool is sync and runs in a worker thread, where it
+            # can not use the async session: it takes a session of the pool for the call
+            with bind_async_session(self.message_repository.db):
+                result = await conversational_chain.ainvoke(chain_input, {"configurable": {"session_id": "unused"}})
+        except Exception as e:
+            print(f"Error occurred: {e}")
+            raise
+        return result
+
+    async def stream_message(self, command: str, conversation_id: str,
+                             perimeter: str) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Runs the same turn as amessage() but yields ("token", {"token": ...}) events as the model produces
+        them, followed by one ("end", {"sources": [...]}) event. The turn is stored in the conversation
+        history by RunnableWithMessageHistory once the stream completes.
+        """
+        conversational_chain, chain_input = await self.abuild_conversational_chain(command, conversation_id,
+                                                                                   perimeter)
+
+        # No session bound: the generator may be closed outside of the context it was iterated in, the tools
+        # take a session of the pool for each call
+        sources = []
+        streamed = False
+        answer = None
+        answer_tokens = AnswerTokens()
+        async for event in conversational_chain.astream_events(chain_input,
+                                                              {"configurable": {"session_id": "unused"}},
+                                                              version="v2"):
+            if event["event"] == "on_chat_model_stream":
+                token = answer_tokens.token(event)
+                if token:
+                    streamed = True
+                    yield "token", {"token": token}
+            elif event["event"] == "on_retriever_end":
+                sources = format_docs(event["data"]["output"])
+            elif event["event"] == "on_chain_end" and not event["parent_ids"]:
+                output = event["data"]["output"]
+                answer = output.get("answer", output.get("output"))
+
+        # Models that do not support streaming only report the answer at the end of the run
+        if not streamed and answer:
+            yield "token", {"token": answer}
+
+        yield "end", {"sources": sources}
+
+    def build_conversational_chain(self, command: str, conversation_id: str, perimeter: str):
         # Get the current conversation and build document memory
         cur_conversation: ConversationCreate = self.conversation_repository.get_conversation_by_id(int(conversation_id))
         memory = build_agent_memory(self.message_repository, conversation_id)
 
-        # Determine the appropriate retriever based on the perimeter or conversation PDF ID
+        document = None
         if cur_conversation.pdf_id is not None and cur_conversation.pdf_id != 0:
             document: DocumentCreate = self.document_manager.get_by_id(cur_conversation.pdf_id)
+
+        return self.select_chain(command, document, perimeter, memory)
+
+    async def abuild_conversational_chain(self, command: str, conversation_id: str, perimeter: str):
+        # Same lookups as build_conversational_chain, awaited on the async repositories
+        cur_conversation: ConversationCreate = await self.conversation_repository.get_conversation_by_id(
+            int(conversation_id))
+        memory = build_async_agent_memory(self.message_repository, conversation_id)
+
+        document = None
+        if cur_conversation.pdf_id is not None and cur_conversation.pdf_id != 0:
+            document: DocumentCreate = await self.document_manager.get_by_id(cur_conversation.pdf_id)
+
+        return self.select_chain(command, document, perimeter, memory)
+
+    def select_chain(self, command: str, document: Optional[DocumentCreate], perimeter: str,
+                     memory: BaseChatMessageHistory):
+        """
+        Selects the chain matching the conversation: the template agent for template documents, a RAG chain
+        on the conversation document or on the perimeter otherwise.
+
+        :return: the chain wrapped with its message history and the input to invoke it with
+        """
+        # Determine the appropriate retriever based on the perimeter or conversation PDF ID
+        if document is not None:
             if document.document_type == DocumentType.TEMPLATE:
-                return self.do_template(memory, command, cur_conversation, document)
+                return (self.build_template_agent(memory, document),
+                        {"messages": [HumanMessage(command)]})
             else:
-                rag_retriever = CustomAzurePGVectorRetriever(QueryType.DOCUMENT, str(cur_conversation.pdf_id))
+                rag_retriever = CustomAzurePGVectorRetriever(QueryType.DOCUMENT, str(document.id))
 
         elif perimeter:
             rag_retriever = CustomAzurePGVectorRetriever(QueryType.PERIMETER, perimeter)
         else:
             raise HTTPException(status_code=400, detail="You need to set a document search perimeter")
 
-        return self.do_rag(rag_retriever, memory, command)
+        return self.build_rag_chain(rag_retriever, memory), {"input": command}
 
-    def do_template(self,
-                    memory: SqlMessageHistory,
-                    command: str,
-                    conversation: ConversationCreate,
-                    document: DocumentCreate):
+    def build_template_agent(self,
+                             memory: BaseChatMessageHistory,
+                             document: DocumentCreate) -> RunnableWithMessageHistory:
         tool_manager = ToolManager()
         prompt = ChatPromptTemplate.from_messages(
             [
@@ -70,7 +162,9 @@ class ChatManager:
                     Steps for Updating the Template:
 
                     -Read and carefully follow the user instruction or any response he may have given. 
-                    - The placeholders to replace are surrounded with @@@, locate them within the template provided. 
+                    - The placeholders to replace are surrounded with @@@, the template tool returns each of them with 
+                    its number and the text around it. Ask the tool for a single placeholder number when you only 
+                    need that one again. 
                     - Carefully read the text surrounding the boilerplates in the template to fully grasp the context. 
                     Understanding the context is crucial to ensure the new text will integrate smoothly.
 
@@ -86,9 +180,8 @@ class ChatManager:
                 ("placeholder", "{agent_scratchpad}"),
             ]
         ).partial(document_id=document.id)
-        memory = build_agent_memory(self.message_repository, conversation.id)
         template_doc_tools = tool_manager.get_tools([ToolName.TEMPLATE])
-        chat_gpt_4o = get_model_and_set_env("4o")
+        chat_gpt_4o = get_model("4o")
         agent = create_openai_tools_agent(llm=chat_gpt_4o, tools=template_doc_tools, prompt=prompt)
         agent_executor = AgentExecutor(agent=agent, tools=template_doc_tools, verbose=True)
 
@@ -98,17 +191,11 @@ class ChatManager:
             input_messages_key="messages",
             output_messages_key="output",
         )
+        return conversational_agent_executor
 
-        result = conversational_agent_executor.invoke(
-            {"messages": [HumanMessage(command)]},
-            {"configurable": {"session_id": "unused"}},
-        )
-        return result
-
-    def do_rag(self,
-               rag_retriever: CustomAzurePGVectorRetriever,
-               memory: SqlMessageHistory,
-               command: str):
+    def build_rag_chain(self,
+                        rag_retriever: CustomAzurePGVectorRetriever,
+                        memory: BaseChatMessageHistory) -> RunnableWithMessageHistory:
         system_prompt = (
             "You are an assistant for question-answering tasks. "
             "Use the following pieces of retrieved context to answer "
@@ -125,7 +212,7 @@ class ChatManager:
                 ("human", "{input}"),
             ]
         )
-        chat_gpt_4o = get_model_and_set_env("4o")
+        chat_gpt_4o = get_model("4o")
         rag_chain_from_docs = (
                 {
                     "input": lambda x: x["input"],  # input query
@@ -153,21 +240,11 @@ class ChatManager:
             history_messages_key="chat_history",
             output_messages_key="answer",
         )
-        # Invoke the chain with the command/query
-        try:
-            # result = chain.invoke({"query": command})
-
-            result = conversational_rag_chain.invoke({"input": command}, {"configurable": {"session_id": "unused"}})
-            # print(result)  # Or whatever logging mechanism you prefer
-        except Exception as e:
-            print(f"Error occurred: {e}")
-            raise
-        return result
-        # Return response with results and possibly source metadata
+        return conversational_rag_chain
 
     def execute_voice_command(self, conversation_id, perimeter, tmp_path):
         audio_blob = Blob(path=tmp_path)
-        whisper = get_model_and_set_env("whisper")
+        whisper = get_model("whisper")
         documents = whisper.lazy_parse(blob=audio_blob)
 
         content = ""
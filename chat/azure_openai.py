@@ -1,71 +1,113 @@
+import logging
 import os
+from typing import Dict, Optional
 
+import httpx
 from langchain_community.document_loaders.parsers.audio import AzureOpenAIWhisperParser
 from langchain_openai import AzureChatOpenAI
 
+# Deployments served by the Sweden endpoint, every other model goes to the CH endpoint
+SWEDEN_MODELS = ("o1", "o3-mini")
 
-def get_model_and_set_env(model_name: str) -> AzureChatOpenAI | AzureOpenAIWhisperParser:
-    # Set environment variables for Sweden deployment if 'o1' or 'o3-mini'
-    if model_name in ("o1", "o3-mini"):
-        os.environ["AZURE_OPENAI_API_KEY"] = os.environ["AZURE_OPENAI_SWEDEN_API_KEY"]
-        os.environ["AZURE_OPENAI_ENDPOINT"] = os.environ["AZURE_OPENAI_SWEDEN_ENDPOINT"]
-    else:
-        # Reset to initial values
-        os.environ["AZURE_OPENAI_API_KEY"] = os.environ["AZURE_OPENAI_API_CH_KEY"]
-        os.environ["AZURE_OPENAI_ENDPOINT"] = os.environ["AZURE_OPENAI_CH_ENDPOINT"]
-
-    chat_gpt_4o_mini = AzureChatOpenAI(
-        openai_api_version=os.environ["AZURE_GPT_4o_MINI_API_VERSION"],
-        azure_deployment=os.environ["AZURE_GPT_4o_MINI_CHAT_DEPLOYMENT_NAME"],
-        tiktoken_model_name=os.environ["AZURE_GPT_4o_MINI_CHAT_MODEL_NAME"],
-
-    )
-
-    chat_gpt_4 = AzureChatOpenAI(
-        openai_api_version=os.environ["AZURE_GPT_4_API_VERSION"],
-        azure_deployment=os.environ["AZURE_GPT_4_CHAT_DEPLOYMENT_NAME"],
-        tiktoken_model_name=os.environ["AZURE_GPT_4_CHAT_MODEL_NAME"],
-    )
-
-    chat_gpt_4o = AzureChatOpenAI(
-        openai_api_version=os.environ["AZURE_GPT_4o_API_VERSION"],
-        azure_deployment=os.environ["AZURE_GPT_4o_CHAT_DEPLOYMENT_NAME"],
-        tiktoken_model_name=os.environ["AZURE_GPT_4o_CHAT_MODEL_NAME"],
-    )
-
-    chat_gpt_o1 = AzureChatOpenAI(
-        openai_api_version=os.environ["AZURE_GPT_01_API_VERSION"],
-        azure_deployment=os.environ["AZURE_GPT_01_CHAT_DEPLOYMENT_NAME"],
-        tiktoken_model_name=os.environ["AZURE_GPT_01_CHAT_MODEL_NAME"],
-        temperature=1
-    )
-
-    chat_gpt_o3_mini = AzureChatOpenAI(
-        openai_api_version=os.environ["AZURE_GPT_03_MINI_API_VERSION"],
-        azure_deployment=os.environ["AZURE_GPT_03_MINI_CHAT_DEPLOYMENT_NAME"],
-        tiktoken_model_name=os.environ["AZURE_GPT_03_MINI_CHAT_MODEL_NAME"],
-        temperature=1
-    )
-
-    whisper = AzureOpenAIWhisperParser(
-        api_version=os.environ["AZURE_WHISPER_API_VERSION"],
-        deployment_name=os.environ["AZURE_WHISPER_DEPLOYMENT_NAME"],
-    )
-
-    # Dictionary of supported models
-    chat_models = {
-        "4": chat_gpt_4,
-        "4o": chat_gpt_4o,
-        "4o-mini": chat_gpt_4o_mini,
-        "whisper": whisper,
-        "o1": chat_gpt_o1,
-        "o3-mini": chat_gpt_o3_mini,
-    }
-
-    # Validate model_name and retrieve model
-    if model_name not in chat_models:
-        raise ValueError(f"Invalid model name '{model_name}'. Available models: {', '.join(chat_models.keys())}.")
-
-    model = chat_models[model_name]
-
-    return model
+# Environment variable prefix and extra arguments of each chat deployment
+CHAT_DEPLOYMENTS = {
+    "4": ("AZURE_GPT_4", {}),
+    "4o": ("AZURE_GPT_4o", {}),
+    "4o-mini": ("AZURE_GPT_4o_MINI", {}),
+    "o1": ("AZURE_GPT_01", {"temperature": 1}),
+    "o3-mini": ("AZURE_GPT_03_MINI", {"temperature": 1}),
+}
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of the Azure OpenAI clients.
+
+    Every deployment gets exactly one client, built once with its own endpoint and key, so no request
+    has to rewrite ``AZURE_OPENAI_ENDPOINT`` / ``AZURE_OPENAI_API_KEY``. All chat clients share one
+    pooled sync and one pooled async HTTP client, which keeps TLS connections alive between turns.
+    """
+
+    def __init__(self):
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "50")),
+            max_keepalive_connections=int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        )
+        timeout = httpx.Timeout(float(os.getenv("AZURE_OPENAI_TIMEOUT", "120")), connect=10.0)
+
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+
+        self.models: Dict[str, AzureChatOpenAI | AzureOpenAIWhisperParser] = {
+            model_name: self._build_chat_model(model_name) for model_name in CHAT_DEPLOYMENTS
+        }
+        self.models["whisper"] = self._build_whisper()
+
+    @staticmethod
+    def credentials(model_name: str) -> tuple[str, str]:
+        """Returns the (endpoint, api key) pair of the region serving the given model"""
+        if model_name in SWEDEN_MODELS:
+            return os.environ["AZURE_OPENAI_SWEDEN_ENDPOINT"], os.environ["AZURE_OPENAI_SWEDEN_API_KEY"]
+        return os.environ["AZURE_OPENAI_CH_ENDPOINT"], os.environ["AZURE_OPENAI_API_CH_KEY"]
+
+    def _build_chat_model(self, model_name: str) -> AzureChatOpenAI:
+        prefix, extra_args = CHAT_DEPLOYMENTS[model_name]
+        endpoint, api_key = self.credentials(model_name)
+
+        return AzureChatOpenAI(
+            azure_endpoint=endpoint,
+            api_key=api_key,
+            openai_api_version=os.environ[f"{prefix}_API_VERSION"],
+            azure_deployment=os.environ[f"{prefix}_CHAT_DEPLOYMENT_NAME"],
+            tiktoken_model_name=os.environ[f"{prefix}_CHAT_MODEL_NAME"],
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            **extra_args
+        )
+
+    def _build_whisper(self) -> AzureOpenAIWhisperParser:
+        endpoint, api_key = self.credentials("whisper")
+
+        return AzureOpenAIWhisperParser(
+            azure_endpoint=endpoint,
+            api_key=api_key,
+            api_version=os.environ["AZURE_WHISPER_API_VERSION"],
+            deployment_name=os.environ["AZURE_WHISPER_DEPLOYMENT_NAME"],
+        )
+
+    def get(self, model_name: str) -> AzureChatOpenAI | AzureOpenAIWhisperParser:
+        # Validate model_name and retrieve model
+        if model_name not in self.models:
+            raise ValueError(
+                f"Invalid model name '{model_name}'. Available models: {', '.join(self.models.keys())}.")
+
+        return self.models[model_name]
+
+    async def close(self):
+        self.http_client.close()
+        await self.http_async_client.aclose()
+
+
+registry: Optional[ModelRegistry] = None
+
+
+def init_models():
+    global registry
+
+    registry = ModelRegistry()
+    logging.info("Model registry initialized with: %s", ", ".join(registry.models.keys()))
+
+
+async def close_models():
+    global registry
+
+    if registry is not None:
+        await registry.close()
+        registry = None
+
+
+def get_model(model_name: str) -> AzureChatOpenAI | AzureOpenAIWhisperParser:
+    if registry is None:
+        raise RuntimeError("Model registry is not initialized. Call init_models() first.")
+
+    return registry.get(model_name)
@@ -4,8 +4,11 @@ import time
 from functools import wraps
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from PoolMetrics import MeteredAsyncQueuePool, MeteredQueuePool
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
@@ -26,6 +29,8 @@ access_logger.addFilter(ExcludePathFilter())
 Base = declarative_base()
 SessionLocal = None
 engine = None
+AsyncSessionLocal = None
+async_engine = None
 
 os.environ["PGVECTOR_CONNECTION_STRING"] = (
     f"postgresql+psycopg://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
@@ -33,12 +38,55 @@ os.environ["PGVECTOR_CONNECTION_STRING"] = (
 )
 
 
+def engine_options() -> dict:
+    """
+    Pool settings shared by the sync and the async engine. Each engine has its own pool, so a replica opens
+    at most 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections, to be kept under the max_connections of
+    Postgres divided by the number of replicas.
+    """
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        # Seconds a request waits for a free connection before failing
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # Seconds after which a connection is replaced, -1 to keep them, below the idle timeout of the network
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    if statement_timeout > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
 def init_db():
-    global engine, SessionLocal
+    global engine, SessionLocal, async_engine, AsyncSessionLocal
 
-    engine = create_engine(os.getenv("PGVECTOR_CONNECTION_STRING"))
+    # The only engines of the process, the vector store and the ingestion use them too
+    engine = create_engine(os.getenv("PGVECTOR_CONNECTION_STRING"), poolclass=MeteredQueuePool, **engine_options())
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+    # psycopg 3 serves both engines, the async one is used by the chat pipeline
+    async_engine = create_async_engine(os.getenv("PGVECTOR_CONNECTION_STRING"), poolclass=MeteredAsyncQueuePool,
+                                       **engine_options())
+    AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=async_engine,
+                                           expire_on_commit=False)
+
+
+async def close_db():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+
+
+def pool_stats() -> dict:
+    """Live state of the connection pools and the time spent waiting for their connections"""
+    return {
+        "sync": engine.pool.stats() if engine is not None else None,
+        "async": async_engine.pool.stats() if async_engine is not None else None,
+    }
+
 
 # Dependency to get DB session
 async def get_db():
@@ -52,6 +100,15 @@ async def get_db():
         db.close()
 
 
+# Dependency to get an async DB session
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("AsyncSessionLocal is not initialized. Call init_db() first.")
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def load_config():
     global ldap_url
     logging.info("--------------------------------------------------------")
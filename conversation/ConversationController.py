@@ -1,5 +1,5 @@
 import json
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi import APIRouter, Query, Depends
 from fastapi import Response
@@ -31,13 +31,21 @@ document_manager_dep = Annotated[DocumentManager, Depends(document_manager_provi
 
 
 @router_conversation.get("/perimeter/{perimeter}/")
-async def conversations(conversation_repository: conversation_repository_dep, perimeter: str):
+async def conversations(conversation_repository: conversation_repository_dep, perimeter: str, response: Response,
+                        before: Optional[int] = None, limit: Optional[int] = Query(default=None, ge=1, le=500),
+                        with_total: bool = False):
     """
     :param conversation_repository: The repository instance used to retrieve conversation data.
     :param perimeter: The specific perimeter used to filter conversations.
-    :return: A JSON object containing conversations filtered by the given perimeter.
+    :param response: The response, carries the X-Total-Count header.
+    :param before: Only the conversations older than this id, the last id of the previous page.
+    :param limit: The size of the page, all the conversations if not set.
+    :param with_total: Whether to count all the conversations of the perimeter in X-Total-Count.
+    :return: A JSON object containing conversations filtered by the given perimeter, newest first.
     """
-    res = conversation_repository.get_conversation_by_perimeter(perimeter)
+    res = conversation_repository.get_conversation_by_perimeter(perimeter, before, limit)
+    if with_total:
+        response.headers["X-Total-Count"] = str(conversation_repository.count_conversation_by_perimeter(perimeter))
     return res
 
 
@@ -1,8 +1,8 @@
 from typing import List, Tuple, Sequence, Optional
 
-from sqlalchemy import and_, select, delete
+from sqlalchemy import and_, select, delete, func
 
-from BaseAlchemyRepository import BaseAlchemyRepository
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
 from assistants.Assistant import Assistant
 from conversation.Conversation import Conversation, ConversationCreate
 from document.Document import Document
@@ -44,36 +44,36 @@ class ConversationRepository(BaseAlchemyRepository):
 
         return new_conversation
 
-    # Function to get all messages  by conversation_id data from SQLite
-    def get_conversation_by_perimeter(self, perimeter) -> List[ConversationCreate]:
-
-        stmt = (select(Conversation, Document, Assistant).join(Document,
-                                                               Conversation.document_id == Document.id,
-                                                               isouter=True)
-                .join(Assistant,
-                      Assistant.conversation_id == Conversation.id,
-                      isouter=True).where(Conversation.perimeter == perimeter))
-        results: Sequence[Tuple[Conversation, Document, Assistant]] = [
-            (row.Conversation, row.Document, row.Assistant) for row in self.db.execute(stmt).all()
-        ]
-
-        conversations = []
-        for row in results:
-
-            conversation: Conversation = row[0]
-            document: Document = row[1]
-            assistant: Assistant = row[2]
-
-            if assistant is not None:
-                continue
-
-            document_name = document.name if document else ""
-
-            new_conversation = self.map_to_conversation(conversation, document_name)
-            conversations.append(new_conversation)
-        # map conversation create
-
-        return conversations
+    @staticmethod
+    def perimeter_filter(perimeter):
+        # Conversations of an assistant are listed with the assistant, anti-join on assistants.conversation_id
+        has_assistant = select(Assistant.id).where(Assistant.conversation_id == Conversation.id).exists()
+        return and_(Conversation.perimeter == perimeter, ~has_assistant)
+
+    def get_conversation_by_perimeter(self, perimeter, before: Optional[int] = None,
+                                      limit: Optional[int] = None) -> List[ConversationCreate]:
+        """
+        Lists the conversations of a perimeter that do not belong to an assistant, newest first.
+        :param perimeter: The perimeter of the conversations.
+        :param before: Only the conversations with a lower id, the last id of the previous page.
+        :param limit: The maximum number of conversations, all of them if not set.
+        :return: The conversations.
+        """
+        stmt = (select(Conversation, Document.name)
+                .join(Document, Conversation.document_id == Document.id, isouter=True)
+                .where(self.perimeter_filter(perimeter))
+                .order_by(Conversation.id.desc()))
+        if before is not None:
+            stmt = stmt.where(Conversation.id < before)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        return [self.map_to_conversation(conversation, document_name or "")
+                for conversation, document_name in self.db.execute(stmt).all()]
+
+    def count_conversation_by_perimeter(self, perimeter) -> int:
+        stmt = select(func.count()).select_from(Conversation).where(self.perimeter_filter(perimeter))
+        return self.db.execute(stmt).scalar_one()
 
     def delete(self, conversation_id: int):
         stmt = delete(Conversation).where(Conversation.id == conversation_id)
@@ -103,7 +103,8 @@ class ConversationRepository(BaseAlchemyRepository):
 
         return conversations
 
-    def map_to_conversation(self, conversation: Conversation, pdf_name: str) -> ConversationCreate:
+    @staticmethod
+    def map_to_conversation(conversation: Conversation, pdf_name: str) -> ConversationCreate:
         return ConversationCreate(
             id=str(conversation.id),
             perimeter=conversation.perimeter,
@@ -112,3 +113,22 @@ class ConversationRepository(BaseAlchemyRepository):
             description=conversation.description,
             created_on=conversation.created_on.strftime("%d.%m.%Y")
         )
+
+
+class AsyncConversationRepository(BaseAsyncAlchemyRepository):
+
+    async def get_conversation_by_id(self, conversation_id: int) -> ConversationCreate:
+
+        stmt = select(Conversation, Document).join(Document, Conversation.document_id == Document.id,
+                                                   isouter=True).where(Conversation.id == conversation_id)
+
+        conversation_tuple: Optional[Tuple[Conversation, Document]] = (await self.db.execute(stmt)).first()
+
+        if conversation_tuple is None:
+            raise Exception("Error selecting conversation !")
+
+        conversation: Conversation = conversation_tuple[0]
+        document: Document = conversation_tuple[1]
+        document_name = document.name if document else ""
+
+        return ConversationRepository.map_to_conversation(conversation, document_name)
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import os
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import BigInteger, Column, Integer, String, cast, func, select
+from sqlalchemy.dialects.postgresql import OID, insert
+
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
+from document.Document import Base, ContentInfo
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD = "zstd"
+
+
+class MissingContentError(LookupError):
+    """A document references a content hash that has no row in blob_content"""
+
+
+class BlobContent(Base):
+    __tablename__ = 'blob_content'
+
+    content_hash = Column(String, primary_key=True)
+    content_oid = Column(OID, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    stored_size = Column(BigInteger, nullable=False)
+    compression = Column(String, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=1)
+
+
+def blob_compression() -> Optional[str]:
+    compression = os.getenv("BLOB_COMPRESSION", "").lower() or None
+    if compression == ZSTD and zstandard is None:
+        logging.warning("BLOB_COMPRESSION=zstd but zstandard is not installed, contents are stored uncompressed")
+        return None
+    return compression
+
+
+def decompress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == ZSTD:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+class BlobStore(BaseAlchemyRepository):
+
+    def read(self, content_hash: str) -> Optional[bytes]:
+        """
+        :return: The whole content stored under the hash, None if there is none.
+        """
+        blob = self.db.execute(select(BlobContent).where(BlobContent.content_hash == content_hash)).scalars().first()
+        if blob is None:
+            return None
+        data = self.db.execute(select(func.lo_get(cast(blob.content_oid, OID)))).scalar_one()
+        return decompress(data, blob.compression)
+
+
+class AsyncBlobStore(BaseAsyncAlchemyRepository):
+    """
+    Content addressed store of the document contents. Each distinct content, keyed by its sha256, is stored
+    once as a large object, zstd compressed when BLOB_COMPRESSION=zstd, along with the number of documents
+    referencing it. The reference is released by a trigger when a document is deleted, see
+    12_create_blob_content_table.sql.
+
+    Nothing is committed here, the writes belong to the transaction of the caller.
+    """
+
+    def __init__(self, db, compression: Optional[str] = None):
+        super().__init__(db)
+        self.compression = compression
+
+    async def put(self, chunks: AsyncIterator[bytes]) -> ContentInfo:
+        """
+        Stores a content and takes a reference on it. The content is streamed into a new large object while
+        it is hashed, which is dropped at the end if the same content is already stored.
+        :return: The size and the hash of the content.
+        """
+        oid = (await self.db.execute(select(func.lo_create(0)))).scalar_one()
+        compressor = zstandard.ZstdCompressor().compressobj() if self.compression == ZSTD else None
+        content_hash = hashlib.sha256()
+        size = 0
+        stored_size = 0
+
+        async def write(data: bytes):
+            nonlocal stored_size
+            if data:
+                await self.db.execute(select(func.lo_put(cast(oid, OID), stored_size, data)))
+                stored_size += len(data)
+
+        async for chunk in chunks:
+            size += len(chunk)
+            content_hash.update(chunk)
+            await write(compressor.compress(chunk) if compressor else chunk)
+        if compressor:
+            await write(compressor.flush())
+
+        stmt = (
+            insert(BlobContent)
+            .values(content_hash=content_hash.hexdigest(), content_oid=oid, size=size, stored_size=stored_size,
+                    compression=self.compression, ref_count=1)
+            .on_conflict_do_update(index_elements=[BlobContent.content_hash],
+                                   set_={"ref_count": BlobContent.ref_count + 1})
+            .returning(BlobContent.content_oid)
+        )
+        if (await self.db.execute(stmt)).scalar_one() != oid:
+            await self.db.execute(select(func.lo_unlink(cast(oid, OID))))
+        return ContentInfo(size, content_hash.hexdigest())
+
+    async def read(self, content_hash: str) -> Optional[bytes]:
+        blob = (await self.db.execute(
+            select(BlobContent).where(BlobContent.content_hash == content_hash))).scalars().first()
+        if blob is None:
+            return None
+        data = (await self.db.execute(select(func.lo_get(cast(blob.content_oid, OID))))).scalar_one()
+        return decompress(data, blob.compression)
+
+    async def iter_range(self, content_oid: int, compression: Optional[str], start: int, stop: int,
+                         chunk_size: int) -> AsyncIterator[bytes]:
+        """
+        Reads the bytes [start, stop) of a stored content chunk by chunk. A compressed content can not be
+        seeked into, it is decompressed from its beginning and the bytes before start are dropped.
+        """
+        if compression != ZSTD:
+            for offset in range(start, stop, chunk_size):
+                length = min(chunk_size, stop - offset)
+                yield (await self.db.execute(select(func.lo_get(cast(content_oid, OID), offset, length)))).scalar_one()
+            return
+
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        position = 0
+        stored_offset = 0
+        while position < stop:
+            data = (await self.db.execute(
+                select(func.lo_get(cast(content_oid, OID), stored_offset, chunk_size)))).scalar_one()
+            if not data:
+                return
+            stored_offset += len(data)
+            data = decompressor.decompress(data)
+            part = data[max(0, start - position):max(0, stop - position)]
+            position += len(data)
+            if part:
+                yield part
@@ -0,0 +1,53 @@
+from typing import Optional
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parses a Range header of a single byte range.
+    :param header: The Range header, "bytes=0-99", "bytes=100-" or "bytes=-100".
+    :param size: The size of the content.
+    :return: The first and last byte of the range, both included, None when the whole content is to be sent:
+     no header, an unknown unit, a malformed value or several ranges.
+    :raise RangeNotSatisfiable: When the range starts after the end of the content.
+    """
+    if not header:
+        return None
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range, the last bytes of the content
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def make_etag(content_hash: str) -> str:
+    return f'"{content_hash}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag, compared weakly as RFC 9110 asks for this header"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
@@ -1,10 +1,11 @@
 import enum
 from datetime import datetime
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import pytz
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Enum, LargeBinary, Date, Boolean
+from sqlalchemy import Column, Integer, String, Enum, LargeBinary, Date, Boolean, BigInteger
+from sqlalchemy.dialects.postgresql import OID
 from sqlalchemy.orm import declarative_base, deferred
 
 
@@ -47,6 +48,11 @@ class Document(Base):
     created_on = Column(Date, nullable=True, default=datetime.now(pytz.utc))
     perimeter = Column(String, nullable=False, )
     document = deferred(Column(LargeBinary))  # Use deferred
+    # Content of the documents uploaded since 10_create_document_large_object.sql, document is then NULL
+    content_oid = Column(OID, nullable=True)
+    content_size = Column(BigInteger, nullable=True)
+    # sha256 of the content, hex encoded
+    content_hash = Column(String, nullable=True)
     owner = Column(String, nullable=False)
     summary_id = Column(Integer, nullable=True, default=0)
     summary_status = Column(Enum(Jobstatus), nullable=True, default=Jobstatus.NONE)
@@ -72,6 +78,11 @@ class DocumentCreate(BaseModel):
         use_enum_values = True  # This will use enum values when serializing/deserializing
 
 
+class ContentInfo(NamedTuple):
+    size: int
+    content_hash: Optional[str]
+
+
 class CategoryDocumentCreate(DocumentCreate):
     category_id: str = None
     category_name: str = None
@@ -1,7 +1,10 @@
 import os
+from typing import AsyncIterator, Optional
 
 from document.Document import DocumentType, DocumentCreate, DocumentStatus
+from document.DocumentText import load_document_text
 from document.DocumentsRepository import DocumentsRepository
+from document.TemplatePlaceholders import Placeholder, load_template_placeholders
 
 
 class DocumentManager:
@@ -9,8 +12,12 @@ class DocumentManager:
     def __init__(self, document_repository: DocumentsRepository):
         self.document_repository = document_repository
 
-    async def upload_file(self, owner: str, filename: str, contents: bytes,
+    async def upload_file(self, owner: str, filename: str, chunks: AsyncIterator[bytes],
                           document_type: DocumentType = DocumentType.DOCUMENT, ):
+        """
+        Stores an uploaded file, its content is streamed to the database chunk by chunk.
+        Needs the async documents repository.
+        """
 
         if not filename.endswith("pdf"):
             focus_only = True
@@ -21,12 +28,11 @@ class DocumentManager:
             owner=owner,
             name=filename,
             perimeter=owner,
-            document=contents,
             document_type=document_type,
             focus_only=focus_only
         )
 
-        return self.document_repository.save(new_document)
+        return await self.document_repository.save_stream(new_document, chunks)
 
     '''
         This method deletes a temporary file on the HD
@@ -54,5 +60,17 @@ class DocumentManager:
     def get_stream_by_id(self, blob_id: int) -> DocumentCreate:
         return self.document_repository.get_document_by_id(blob_id)
 
+    def get_document_text(self, document_id: int) -> Optional[str]:
+        return load_document_text(self.document_repository, document_id)
+
+    def get_template_placeholders(self, document_id: int) -> Optional[list[Placeholder]]:
+        return load_template_placeholders(self.document_repository, document_id)
+
+    def get_content_info(self, blob_id: int):
+        return self.document_repository.get_content_info(blob_id)
+
+    def iter_content(self, blob_id: int, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        return self.document_repository.iter_content(blob_id, start, end)
+
     def update_document_status(self, document_id: int, status: DocumentStatus) -> None:
         return self.document_repository.update_document_status(document_id, status)
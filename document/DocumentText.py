@@ -0,0 +1,81 @@
+import io
+import os
+from datetime import datetime
+from typing import Optional
+
+import pytz
+from pypdf import PdfReader
+from sqlalchemy import Column, DateTime, String, Text, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
+from BaseAlchemyRepository import BaseAlchemyRepository
+from LRUCache import LRUCache
+from document.Document import Base
+from document.DocumentsRepository import DocumentsRepository
+
+
+class DocumentText(Base):
+    __tablename__ = 'document_text'
+
+    content_hash = Column(String, primary_key=True)
+    pages = Column(ARRAY(Text), nullable=False)
+    extracted_on = Column(DateTime, nullable=False, default=lambda: datetime.now(pytz.utc))
+
+
+class DocumentTextRepository(BaseAlchemyRepository):
+
+    def get_pages(self, content_hash: str) -> Optional[list[str]]:
+        stmt = select(DocumentText.pages).where(DocumentText.content_hash == content_hash)
+        return self.db.execute(stmt).scalars().first()
+
+    def save_pages(self, content_hash: str, pages: list[str]):
+        # Two first uses of the same content may race, both extract the same text
+        stmt = insert(DocumentText).values(content_hash=content_hash, pages=pages).on_conflict_do_nothing()
+        self.db.execute(stmt)
+        self.db.commit()
+
+
+def extract_pages(name: str, content: bytes) -> list[str]:
+    if not name.lower().endswith(".pdf"):
+        return [content.decode("utf-8", errors="replace")]
+    # Postgres text can not hold NUL characters, some PDF extractions have them
+    return [(page.extract_text() or "").replace("\x00", "") for page in PdfReader(io.BytesIO(content)).pages]
+
+
+# Extracted texts by content hash, in front of the document_text table
+text_cache = LRUCache(int(os.getenv("DOCUMENT_TEXT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))))
+
+
+def load_document_text(repository: DocumentsRepository, document_id: int) -> Optional[str]:
+    """
+    Returns the text of a document, extracted from its content on first use only. The pages are stored
+    in document_text under the hash of the content, so that identical uploads share them, and the text
+    is kept in an in-process LRU.
+    :param repository: The documents repository, its session is used for the document_text table.
+    :param document_id: The id of the document.
+    :return: The text of the document, None if the document does not exist.
+    """
+    content_hash = repository.get_content_hash(document_id)
+    if content_hash is not None:
+        text = text_cache.get(content_hash)
+        if text is not None:
+            return text
+        pages = DocumentTextRepository(repository.db).get_pages(content_hash)
+        if pages is not None:
+            return _remember(content_hash, pages)
+
+    document = repository.get_document_by_id(document_id)
+    if document is None or document.document is None:
+        return None
+    pages = extract_pages(document.name, document.document)
+    if content_hash is None:
+        return "".join(pages)
+
+    DocumentTextRepository(repository.db).save_pages(content_hash, pages)
+    return _remember(content_hash, pages)
+
+
+def _remember(content_hash: str, pages: list[str]) -> str:
+    text = "".join(pages)
+    text_cache.put(content_hash, text, len(text) + 64)
+    return text
@@ -1,18 +1,27 @@
+import logging
+import os
 from dataclasses import field
-from typing import Annotated, List
+from typing import Annotated, Dict, List, Optional
 
-from fastapi import UploadFile, File, APIRouter, Form, Depends, Query, HTTPException
+from fastapi import UploadFile, File, APIRouter, Form, Depends, Query, HTTPException, BackgroundTasks, Header
 from fastapi.openapi.models import Response
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response as HttpResponse
 from langchain_core.documents import Document
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from ProviderManager import document_manager_provider, user_manager_provider
+from ProviderManager import document_manager_provider, user_manager_provider, async_document_manager_provider
 from document.Document import DocumentType, DocumentCreate, CategoryDocumentCreate, \
     DocumentStatus
+from document.BlobStore import MissingContentError
+from document.ContentRange import RangeNotSatisfiable, etag_matches, make_etag, parse_range
 from document.DocumentManager import DocumentManager
+from document.DocumentsRepository import CONTENT_CHUNK_SIZE
+from embeddings.BatchSearch import abatch_search
 from embeddings.CustomAzurePGVectorRetriever import CustomAzurePGVectorRetriever
+from embeddings.IngestionPipeline import get_ingestion_pipeline
+from embeddings.PGVectorStore import get_embeddings
 from embeddings.QueryType import QueryType
+from embeddings.RetrievalCache import retrieval_cache
 from rights import UserManager
 
 router_file = APIRouter(
@@ -22,19 +31,40 @@ router_file = APIRouter(
 )
 
 document_manager_dep = Annotated[DocumentManager, Depends(document_manager_provider)]
+async_document_manager_dep = Annotated[DocumentManager, Depends(async_document_manager_provider)]
 user_manager_dep = Annotated[UserManager, Depends(user_manager_provider)]
 
 
+async def read_chunks(file: UploadFile, chunk_size: int = CONTENT_CHUNK_SIZE):
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
 @router_file.post("/")
 async def upload_file(
-        document_manager: document_manager_dep,
+        document_manager: async_document_manager_dep,
+        background_tasks: BackgroundTasks,
         owner: str = Form(...),
         document_type: DocumentType = Form(default=DocumentType.DOCUMENT, alias='type'),
         file: UploadFile = File(...)
 ):
-    contents = await file.read()
+    # The multipart parser spools large files to disk, they are then copied to the database chunk by chunk
+    document = await document_manager.upload_file(owner, file.filename, read_chunks(file),
+                                                   document_type=document_type)
+    # Only the documents the embedding jobs handle, their queued job is taken over by the pipeline
+    if os.getenv("INGESTION_IN_PROCESS", "false").lower() == "true" and document_type == DocumentType.DOCUMENT:
+        background_tasks.add_task(get_ingestion_pipeline().ingest, int(document.id))
+    return document
 
-    return await document_manager.upload_file(owner, file.filename, contents, document_type=document_type)
+
+@router_file.post("/{blob_id}/ingest/")
+async def ingest_document(blob_id: str, background_tasks: BackgroundTasks):
+    """
+    Parses, chunks and embeds a stored document in the background, replacing its previous chunks.
+    The progress is followed through its document_status.
+    """
+    background_tasks.add_task(get_ingestion_pipeline().ingest, int(blob_id))
+    return Response(description="Document ingestion requested")
 
 
 @router_file.delete("/{blob_id}/")
@@ -73,49 +103,134 @@ class SearchQuery(BaseModel):
     ids: List[str] = field(default_factory=list)
     perimeter: str = ""
     k: int = 0
+    hybrid: Optional[bool] = None
+    # pgvector recall/latency knobs, applied to this search only
+    ef_search: Optional[int] = Field(default=None, ge=1, le=1000)
+    probes: Optional[int] = Field(default=None, ge=1, le=1000)
+    # post-retrieval diversity stage, see CustomAzurePGVectorRetriever
+    mmr_lambda: Optional[float] = Field(default=None, ge=0, le=1)
+    duplicate_threshold: Optional[float] = Field(default=None, ge=0, le=1)
 
 
-@router_file.post("/search/")
-async def list_documents(query: SearchQuery) -> List[Document]:
+def build_search_retriever(query: SearchQuery) -> Optional[CustomAzurePGVectorRetriever]:
     k_value = query.k if query.k and query.k != 0 else 10
+    options = dict(hybrid=query.hybrid, ef_search=query.ef_search, probes=query.probes,
+                   mmr_lambda=query.mmr_lambda, duplicate_threshold=query.duplicate_threshold)
 
     if query.perimeter:
-        rag_retriever = CustomAzurePGVectorRetriever(QueryType.PERIMETER, query.perimeter, k_value)
+        return CustomAzurePGVectorRetriever(QueryType.PERIMETER, query.perimeter, k_value, **options)
     elif query.ids:
-        rag_retriever = CustomAzurePGVectorRetriever(QueryType.DOCUMENTS, ",".join(query.ids), k_value)
-    else:
+        return CustomAzurePGVectorRetriever(QueryType.DOCUMENTS, ",".join(query.ids), k_value, **options)
+    return None
+
+
+@router_file.post("/search/")
+async def list_documents(query: SearchQuery) -> List[Document]:
+    rag_retriever = build_search_retriever(query)
+    if rag_retriever is None:
         return []
-    return rag_retriever.invoke(query.query)
+    return await rag_retriever.ainvoke(query.query)
+
+
+class BatchSearchItem(SearchQuery):
+    id: str
+
+
+class BatchSearchQuery(BaseModel):
+    queries: List[BatchSearchItem] = Field(max_length=100)
+
+
+@router_file.post("/search/batch/")
+async def batch_search(batch: BatchSearchQuery) -> Dict[str, List[Document]]:
+    """
+    Runs many searches in one call, with a single embedding request for all the query texts and the
+    vector queries running concurrently.
+    :return: The documents found for each query id, an empty list for a query without ids nor perimeter.
+    """
+    ids = [item.id for item in batch.queries]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Query ids must be unique")
+
+    searches = []
+    for item in batch.queries:
+        rag_retriever = build_search_retriever(item)
+        if rag_retriever is not None:
+            searches.append((item.id, rag_retriever, item.query))
+
+    results = await abatch_search(searches)
+    return {item.id: results.get(item.id, []) for item in batch.queries}
+
+
+@router_file.get("/search/stats/")
+async def search_stats():
+    """
+    :return: The hit and miss counters of the search caches.
+    """
+    return {"embeddings": get_embeddings().stats(), "retrieval": retrieval_cache.stats()}
 
 
 @router_file.get("/{blob_id}/")
-async def download_blob(document_manager: document_manager_dep, blob_id: str):
-    document_data: DocumentCreate = document_manager.get_stream_by_id(int(blob_id))
-
-    if document_data:
-        # Set headers for the response
-
-        def sanitize_to_latin1(input_str):
-            return input_str.encode('latin-1', errors='ignore').decode('latin-1')
-
-        headers = {
-            "Content-Disposition": f"attachment; filename={sanitize_to_latin1(document_data.name)}",
-            "Content-Type": "application/octet-stream",
-            "X-Perimeter": sanitize_to_latin1(document_data.perimeter),
-            "X-Owner": sanitize_to_latin1(document_data.owner),
-            "X-Created-On": sanitize_to_latin1(document_data.created_on) if document_data.created_on else "",
-            "X-File-Name": sanitize_to_latin1(document_data.name),
-            "X-Document-Type": sanitize_to_latin1(document_data.document_type),
-        }
-
-        def stream_generator():
-            yield document_data.document
-
-        # Stream the content
-        return StreamingResponse(stream_generator(), media_type="application/octet-stream", headers=headers)
-    else:
+async def download_blob(document_manager: async_document_manager_dep, blob_id: str,
+                        range_header: Optional[str] = Header(default=None, alias="Range"),
+                        if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+                        if_range: Optional[str] = Header(default=None, alias="If-Range")):
+    """
+    Streams the content of a document. A single byte range is served as 206 partial content, and an
+    If-None-Match matching the content hash is answered 304 without reading the document.
+    """
+    try:
+        info = await document_manager.get_content_info(int(blob_id))
+    except MissingContentError as e:
+        logging.error(e)
+        raise HTTPException(status_code=404, detail="Blob content not found")
+    if info is None:
         raise HTTPException(status_code=404, detail="Blob not found")
 
+    # The browser may keep the content but has to revalidate it, the documents are not public
+    cache_headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, no-cache"}
+    etag = make_etag(info.content_hash) if info.content_hash else None
+    if etag:
+        cache_headers["ETag"] = etag
+        if etag_matches(if_none_match, etag):
+            return HttpResponse(status_code=304, headers=cache_headers)
+
+    byte_range = None
+    # A range is only valid on the representation the client already has part of
+    if not if_range or (etag and if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, info.size)
+        except RangeNotSatisfiable:
+            raise HTTPException(status_code=416, detail="Range not satisfiable",
+                                headers={"Content-Range": f"bytes */{info.size}"})
+
+    document_data: DocumentCreate = await document_manager.get_by_id(int(blob_id))
+
+    def sanitize_to_latin1(input_str):
+        return input_str.encode('latin-1', errors='ignore').decode('latin-1')
+
+    headers = {
+        **cache_headers,
+        "Content-Disposition": f"attachment; filename={sanitize_to_latin1(document_data.name)}",
+        "Content-Type": "application/octet-stream",
+        "X-Perimeter": sanitize_to_latin1(document_data.perimeter),
+        "X-Owner": sanitize_to_latin1(document_data.owner),
+        "X-Created-On": sanitize_to_latin1(document_data.created_on) if document_data.created_on else "",
+        "X-File-Name": sanitize_to_latin1(document_data.name),
+        "X-Document-Type": sanitize_to_latin1(document_data.document_type),
+    }
+
+    # Stream the content, one chunk in memory at a time
+    if byte_range is None:
+        headers["Content-Length"] = str(info.size)
+        return StreamingResponse(document_manager.iter_content(int(blob_id)),
+                                 media_type="application/octet-stream", headers=headers)
+
+    start, end = byte_range
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    return StreamingResponse(document_manager.iter_content(int(blob_id), start, end), status_code=206,
+                             media_type="application/octet-stream", headers=headers)
+
 
 @router_file.put("/{blob_id}/status")
 async def update_document_status(
@@ -1,44 +1,23 @@
-from typing import Sequence
+import os
+from typing import AsyncIterator, Optional, Sequence
 
-from sqlalchemy import and_, select, delete
+from sqlalchemy import and_, cast, func, select, delete, update
+from sqlalchemy.dialects.postgresql import OID
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from BaseAlchemyRepository import BaseAlchemyRepository
-from document.Document import Document, DocumentType, DocumentCreate, DocumentStatus
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
+from document.BlobStore import AsyncBlobStore, BlobContent, BlobStore, MissingContentError, blob_compression
+from document.Document import Document, DocumentType, DocumentCreate, DocumentStatus, ContentInfo
+from embeddings.RetrievalCache import retrieval_cache
+
+# Bytes read or written per round trip when streaming the content of a document
+CONTENT_CHUNK_SIZE = int(os.getenv("DOCUMENT_CONTENT_CHUNK_SIZE", str(1024 * 1024)))
 
 
 class DocumentsRepository(BaseAlchemyRepository):
     SELECT_DOCUMENT_STREAM_QUERY = """SELECT * FROM document WHERE id=%s """
 
-    # Function to store blob data in SQLite
-    def save(self, document: DocumentCreate) -> DocumentCreate:
-
-        try:
-            new_document = Document(
-                name=document.name,
-                perimeter=document.perimeter,
-                owner=document.owner,
-                document_type=document.document_type,
-                document=document.document,  # Saving the binary content
-                document_status=document.document_status,
-                focus_only=document.focus_only
-            )
-
-            self.db.add(new_document)
-            self.db.commit()
-            self.db.refresh(new_document)
-            self.db.close()
-            document.id = str(new_document.id)
-            document.document = None
-            return document
-        except SQLAlchemyError as e:
-            self.db.rollback()
-            print(f"Database error occurred: {e}")
-            raise
-        finally:
-            self.db.close()
-
     def update_document_status(self, document_id: int, new_status: DocumentStatus):
         """
         Update the status of a document.
@@ -57,7 +36,9 @@ class DocumentsRepository(BaseAlchemyRepository):
                 return False
 
             document.document_status = new_status
+            perimeter = document.perimeter
             self.db.commit()
+            retrieval_cache.invalidate(document_id, perimeter)
             return True
         except SQLAlchemyError as e:
             self.db.rollback()
@@ -73,6 +54,10 @@ class DocumentsRepository(BaseAlchemyRepository):
 
         return self.map_to_document(document)
 
+    def get_content_hash(self, blob_id: int) -> Optional[str]:
+        stmt = select(Document.content_hash).where(Document.id == blob_id)
+        return self.db.execute(stmt).scalars().first()
+
     def get_document_by_id(self, blob_id: int) -> DocumentCreate:
         with Session(self.db.connection()) as session:
             try:
@@ -82,12 +67,18 @@ class DocumentsRepository(BaseAlchemyRepository):
                 if not result:
                     return None
 
+                content = result.document
+                if content is None and result.content_oid is not None:
+                    content = session.execute(select(func.lo_get(cast(result.content_oid, OID)))).scalar_one()
+                elif content is None and result.content_hash is not None:
+                    content = BlobStore(session).read(result.content_hash)
+
                 return DocumentCreate(
                     id=str(result.id),
                     name=result.name,
                     created_on=result.created_on.strftime("%d.%m.%Y"),
                     perimeter=result.perimeter,
-                    document=result.document,
+                    document=content,
                     owner=result.owner,
                     summary_id=result.summary_id,
                     summary_status=result.summary_status,
@@ -113,12 +104,15 @@ class DocumentsRepository(BaseAlchemyRepository):
         return [self.map_to_document(doc) for doc in documents]
 
     def delete_by_id(self, blob_id: int):
-        stmt = delete(Document).where(Document.id == blob_id)
-        affected_rows = self.db.execute(stmt)
+        stmt = delete(Document).where(Document.id == blob_id).returning(Document.perimeter)
+        perimeters = self.db.execute(stmt).scalars().all()
         self.db.commit()
-        return affected_rows.rowcount
+        # Invalidate even when nothing was deleted, the chunks of the blob may still be cached
+        retrieval_cache.invalidate(blob_id, perimeters[0] if perimeters else None)
+        return len(perimeters)
 
-    def map_to_document(self, document: Document) -> DocumentCreate:
+    @staticmethod
+    def map_to_document(document: Document) -> DocumentCreate:
 
         return DocumentCreate(
             id=str(document.id),
@@ -132,3 +126,149 @@ class DocumentsRepository(BaseAlchemyRepository):
             document_status=document.document_status,
             focus_only=document.focus_only
         )
+
+
+class AsyncDocumentsRepository(BaseAsyncAlchemyRepository):
+
+    async def get_by_id(self, blob_id: int) -> DocumentCreate:
+
+        stmt = select(Document).where(Document.id == blob_id)
+        document: Document = (await self.db.execute(stmt)).scalars().first()
+
+        return DocumentsRepository.map_to_document(document)
+
+    async def get_content(self, blob_id: int) -> Optional[bytes]:
+        stmt = select(Document.document, Document.content_oid, Document.content_hash).where(Document.id == blob_id)
+        row = (await self.db.execute(stmt)).first()
+        if row is None or row.document is not None:
+            return row.document if row is not None else None
+        if row.content_oid is not None:
+            return (await self.db.execute(select(func.lo_get(cast(row.content_oid, OID))))).scalar_one()
+        return await AsyncBlobStore(self.db).read(row.content_hash)
+
+    async def get_content_info(self, blob_id: int) -> Optional[ContentInfo]:
+        """
+        :return: The size in bytes and the hash of the content of the document, None if the document does
+         not exist.
+        :raises MissingContentError: If the content is not in the blob store.
+        """
+        # octet_length of a BYTEA reads the size from its header, the value itself is not fetched
+        stmt = (select(func.coalesce(Document.content_size, func.octet_length(Document.document), 0).label("size"),
+                       Document.content_hash,
+                       (Document.document.is_(None)).label("external"),
+                       Document.content_oid,
+                       BlobContent.content_oid.label("blob_oid"))
+                .outerjoin(BlobContent, BlobContent.content_hash == Document.content_hash)
+                .where(Document.id == blob_id))
+        row = (await self.db.execute(stmt)).first()
+        if row is None:
+            return None
+        self._check_stored(blob_id, row)
+        return ContentInfo(row.size, row.content_hash)
+
+    @staticmethod
+    def _check_stored(blob_id: int, row):
+        """Raises MissingContentError when the content of the document should be in the blob store but is not"""
+        if row.external and row.content_oid is None and row.content_hash is not None and row.blob_oid is None:
+            raise MissingContentError(f"Content {row.content_hash} of document {blob_id} is not in blob_content")
+
+    async def save_stream(self, document: DocumentCreate, chunks: AsyncIterator[bytes]) -> DocumentCreate:
+        """
+        Saves a document whose content is streamed into the blob store, in the same transaction as the
+        row, so that only one chunk is held in memory at a time.
+        :param document: The document to save, its document field is ignored.
+        :param chunks: The content of the document.
+        :return: The saved document, without its content.
+        """
+        try:
+            content = await AsyncBlobStore(self.db, blob_compression()).put(chunks)
+
+            new_document = Document(
+                name=document.name,
+                perimeter=document.perimeter,
+                owner=document.owner,
+                document_type=document.document_type,
+                content_size=content.size,
+                content_hash=content.content_hash,
+                document_status=document.document_status,
+                focus_only=document.focus_only
+            )
+            self.db.add(new_document)
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Database error occurred: {e}")
+            raise
+
+        retrieval_cache.invalidate(new_document.id, new_document.perimeter)
+        document.id = str(new_document.id)
+        document.document = None
+        return document
+
+    async def iter_content(self, blob_id: int, start: int = 0, end: Optional[int] = None,
+                           chunk_size: int = CONTENT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Reads the content of a document chunk by chunk, from the blob store or, for the documents stored
+        before, from their own large object or BYTEA column. All the chunks are read in the same transaction.
+        :param blob_id: The id of the document.
+        :param start: The first byte to read.
+        :param end: The last byte to read, included, None to read up to the end.
+        :param chunk_size: The bytes read per round trip.
+        :raises MissingContentError: If the content is not in the blob store.
+        """
+        stmt = (
+            select(Document.content_oid,
+                   func.coalesce(Document.content_size, func.octet_length(Document.document), 0).label("size"),
+                   (Document.document.is_(None)).label("external"),
+                   Document.content_hash,
+                   BlobContent.content_oid.label("blob_oid"),
+                   BlobContent.compression)
+            .outerjoin(BlobContent, BlobContent.content_hash == Document.content_hash)
+            .where(Document.id == blob_id)
+        )
+        row = (await self.db.execute(stmt)).first()
+        if row is None:
+            return
+        self._check_stored(blob_id, row)
+
+        stop = row.size if end is None else min(end + 1, row.size)
+        if row.external and row.content_oid is None and row.blob_oid is not None:
+            async for chunk in AsyncBlobStore(self.db).iter_range(row.blob_oid, row.compression, start, stop,
+                                                                 chunk_size):
+                yield chunk
+            return
+
+        for offset in range(start, stop, chunk_size):
+            length = min(chunk_size, stop - offset)
+            if row.content_oid is not None:
+                stmt = select(func.lo_get(cast(row.content_oid, OID), offset, length))
+            else:
+                # substring of a BYTEA is 1-based
+                stmt = select(func.substring(Document.document, offset + 1, length)).where(Document.id == blob_id)
+            yield (await self.db.execute(stmt)).scalar_one()
+
+    async def update_document_status(self, document_id: int, new_status: DocumentStatus) -> bool:
+        """
+        Update the status of a document.
+        :param document_id: The ID of the document to update.
+        :param new_status: The new status to set.
+        :return: True if the update was successful, False otherwise.
+        """
+        stmt = (
+            update(Document)
+            .where(Document.id == document_id)
+            .values(document_status=new_status)
+            .returning(Document.perimeter)
+        )
+        try:
+            perimeter = (await self.db.execute(stmt)).scalars().first()
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            print(f"Database error occurred: {e}")
+            return False
+
+        if perimeter is None:
+            return False
+        retrieval_cache.invalidate(document_id, perimeter)
+        return True
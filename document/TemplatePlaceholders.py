@@ -0,0 +1,91 @@
+import os
+import re
+from typing import NamedTuple, Optional
+
+from LRUCache import LRUCache
+from document.DocumentText import load_document_text
+from document.DocumentsRepository import DocumentsRepository
+
+# Placeholders of the templates are surrounded with @@@
+PLACEHOLDER_PATTERN = re.compile(r"@@@(.*?)@@@", re.DOTALL)
+
+# Characters of text kept before and after each placeholder
+PLACEHOLDER_WINDOW = int(os.getenv("TEMPLATE_PLACEHOLDER_WINDOW", "500"))
+
+
+class Placeholder(NamedTuple):
+    id: int
+    name: str
+    start: int
+    end: int
+    before: str
+    after: str
+
+
+def index_placeholders(text: str, window: int) -> list[Placeholder]:
+    """
+    Locates the placeholders of a template with the text around them. Each placeholder keeps its whole
+    window, neighbouring placeholders included, so that it can be shown on its own.
+    :param text: The text of the template.
+    :param window: The characters kept on each side of a placeholder.
+    :return: The placeholders in reading order, numbered from 1.
+    """
+    return [Placeholder(
+        id=index + 1,
+        name=match.group(1).strip(),
+        start=match.start(),
+        end=match.end(),
+        before=text[max(0, match.start() - window):match.start()],
+        after=text[match.end():match.end() + window],
+    ) for index, match in enumerate(PLACEHOLDER_PATTERN.finditer(text))]
+
+
+def format_placeholder(placeholder: Placeholder) -> str:
+    return (f"Placeholder {placeholder.id} \"{placeholder.name}\" at characters {placeholder.start}-{placeholder.end}:\n"
+            f"...{placeholder.before}@@@{placeholder.name}@@@{placeholder.after}...")
+
+
+def format_placeholders(placeholders: list[Placeholder]) -> str:
+    """
+    Renders placeholders of a template in reading order. A window stops at the next placeholder and starts
+    after the previous window, so that no text is repeated from one to the next.
+    """
+    blocks = []
+    # End of the text already given by the previous window
+    covered = 0
+    for index, placeholder in enumerate(placeholders):
+        before_start = placeholder.start - len(placeholder.before)
+        before = placeholder.before[max(0, covered - before_start):]
+        after = placeholder.after
+        if index + 1 < len(placeholders):
+            after = after[:max(0, placeholders[index + 1].start - placeholder.end)]
+        covered = placeholder.end + len(after)
+        blocks.append(format_placeholder(placeholder._replace(before=before, after=after)))
+    return "\n\n".join(blocks)
+
+
+# Placeholder indexes by content hash and window
+placeholder_cache = LRUCache(int(os.getenv("TEMPLATE_PLACEHOLDER_CACHE_MAX_BYTES", str(8 * 1024 * 1024))))
+
+
+def load_template_placeholders(repository: DocumentsRepository, document_id: int,
+                               window: int = PLACEHOLDER_WINDOW) -> Optional[list[Placeholder]]:
+    """
+    :return: The placeholders of a template, None if the document does not exist. The index is computed
+     once per content and kept in an in-process LRU, the text itself comes from load_document_text.
+    """
+    content_hash = repository.get_content_hash(document_id)
+    key = (content_hash, window)
+    if content_hash is not None:
+        placeholders = placeholder_cache.get(key)
+        if placeholders is not None:
+            return placeholders
+
+    text = load_document_text(repository, document_id)
+    if text is None:
+        return None
+    placeholders = index_placeholders(text, window)
+    if content_hash is not None:
+        size = sum(len(p.name) + len(p.before) + len(p.after) + 64 for p in placeholders) + 64
+        placeholder_cache.put(key, placeholders, size)
+    return placeholders
@@ -0,0 +1,44 @@
+import asyncio
+import os
+from typing import Hashable, List
+
+from langchain_core.documents import Document
+
+from embeddings.CustomAzurePGVectorRetriever import CustomAzurePGVectorRetriever
+from embeddings.PGVectorStore import get_embeddings
+
+# Vector queries of a batch running at the same time, keep it under the pool size of the async engine
+BATCH_SEARCH_CONCURRENCY = int(os.getenv("BATCH_SEARCH_CONCURRENCY", "8"))
+
+
+async def abatch_search(searches: list[tuple[Hashable, CustomAzurePGVectorRetriever, str]]) \
+        -> dict[Hashable, List[Document]]:
+    """
+    Runs many searches at once: the queries missing from the retrieval cache are embedded in a single call,
+    then their vector queries fan out concurrently over the pooled connections of the async engine.
+    :param searches: (key, retriever, query) triples.
+    :return: The documents found for each key.
+    """
+    results: dict[Hashable, List[Document]] = {}
+    pending: list[tuple[Hashable, CustomAzurePGVectorRetriever, str]] = []
+    for key, retriever, query in searches:
+        documents = retriever.get_cached(query)
+        if documents is None:
+            pending.append((key, retriever, query))
+        else:
+            results[key] = documents
+
+    if pending:
+        embeddings = await get_embeddings().aembed_queries([query for _, _, query in pending])
+        semaphore = asyncio.Semaphore(BATCH_SEARCH_CONCURRENCY)
+
+        async def search(retriever: CustomAzurePGVectorRetriever, query: str, embedding: List[float]):
+            async with semaphore:
+                return await retriever.asearch_embedded(query, embedding)
+
+        found = await asyncio.gather(*[search(retriever, query, embedding)
+                                       for (_, retriever, query), embedding in zip(pending, embeddings)])
+        for (key, _, _), documents in zip(pending, found):
+            results[key] = documents
+
+    return {key: results[key] for key, _, _ in searches}
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import threading
+from array import array
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy.exc import SQLAlchemyError
+
+import config
+from LRUCache import LRUCache
+from embeddings.EmbeddingCacheRepository import EmbeddingCacheRepository, AsyncEmbeddingCacheRepository
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Caches the query embeddings of an underlying Embeddings model on two tiers:
+
+    - an in-process LRU bounded by the size of the stored vectors,
+    - the embedding_cache table, shared by all the replicas, keyed by model, deployment and text hash.
+
+    Only queries are cached, documents embedded at ingestion go straight to the underlying model. A failure
+    of the persistent tier is logged and the model is called as if it were a miss.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, deployment: str,
+                 max_bytes: int = 64 * 1024 * 1024, persistent: bool = True):
+        self.embeddings = embeddings
+        self.model = model
+        self.deployment = deployment
+        self.persistent = persistent
+        self.memory_cache = LRUCache(max_bytes)
+        self.persistent_hits = 0
+        self.persistent_misses = 0
+        self._counters_lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(vector: array) -> int:
+        return vector.itemsize * len(vector) + 64  # 64 bytes for the key
+
+    def _remember(self, text_hash: str, embedding: list[float]):
+        vector = array("d", embedding)
+        self.memory_cache.put(text_hash, vector, self._entry_size(vector))
+
+    def _lookup_memory(self, text_hashes: list[str]) -> dict[str, list[float]]:
+        found = {}
+        for text_hash in set(text_hashes):
+            vector = self.memory_cache.get(text_hash)
+            if vector is not None:
+                found[text_hash] = vector.tolist()
+        return found
+
+    def _count_persistent(self, hits: int, misses: int):
+        with self._counters_lock:
+            self.persistent_hits += hits
+            self.persistent_misses += misses
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a batch of queries, the texts missing from both tiers are embedded in a single
+        embed_documents call to the underlying model.
+        """
+        text_hashes = [hash_text(text) for text in texts]
+        found = self._lookup_memory(text_hashes)
+        missing = [text_hash for text_hash in set(text_hashes) if text_hash not in found]
+        if missing and self.persistent:
+            stored = self._load_persistent(missing)
+            self._count_persistent(len(stored), len(missing) - len(stored))
+            for text_hash, embedding in stored.items():
+                self._remember(text_hash, embedding)
+            found.update(stored)
+
+        to_embed = {text_hash: text for text_hash, text in zip(text_hashes, texts) if text_hash not in found}
+        if to_embed:
+            computed = dict(zip(to_embed.keys(), self.embeddings.embed_documents(list(to_embed.values()))))
+            for text_hash, embedding in computed.items():
+                self._remember(text_hash, embedding)
+            if self.persistent:
+                self._save_persistent(computed)
+            found.update(computed)
+
+        return [found[text_hash] for text_hash in text_hashes]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Same as embed_queries on the async engine and the async client of the underlying model"""
+        text_hashes = [hash_text(text) for text in texts]
+        found = self._lookup_memory(text_hashes)
+        missing = [text_hash for text_hash in set(text_hashes) if text_hash not in found]
+        if missing and self.persistent:
+            stored = await self._aload_persistent(missing)
+            self._count_persistent(len(stored), len(missing) - len(stored))
+            for text_hash, embedding in stored.items():
+                self._remember(text_hash, embedding)
+            found.update(stored)
+
+        to_embed = {text_hash: text for text_hash, text in zip(text_hashes, texts) if text_hash not in found}
+        if to_embed:
+            embedded = await self.embeddings.aembed_documents(list(to_embed.values()))
+            computed = dict(zip(to_embed.keys(), embedded))
+            for text_hash, embedding in computed.items():
+                self._remember(text_hash, embedding)
+            if self.persistent:
+                await self._asave_persistent(computed)
+            found.update(computed)
+
+        return [found[text_hash] for text_hash in text_hashes]
+
+    def _load_persistent(self, text_hashes: list[str]) -> dict[str, list[float]]:
+        try:
+            with config.SessionLocal() as session:
+                return EmbeddingCacheRepository(session).get_many(self.model, self.deployment, text_hashes)
+        except SQLAlchemyError as e:
+            logging.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+
+    def _save_persistent(self, embeddings: dict[str, list[float]]):
+        try:
+            with config.SessionLocal() as session:
+                EmbeddingCacheRepository(session).save_many(self.model, self.deployment, embeddings)
+        except SQLAlchemyError as e:
+            logging.warning(f"Embedding cache write failed: {e}")
+
+    async def _aload_persistent(self, text_hashes: list[str]) -> dict[str, list[float]]:
+        try:
+            async with config.AsyncSessionLocal() as session:
+                return await AsyncEmbeddingCacheRepository(session).get_many(self.model, self.deployment,
+                                                                             text_hashes)
+        except SQLAlchemyError as e:
+            logging.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+
+    async def _asave_persistent(self, embeddings: dict[str, list[float]]):
+        try:
+            async with config.AsyncSessionLocal() as session:
+                await AsyncEmbeddingCacheRepository(session).save_many(self.model, self.deployment, embeddings)
+        except SQLAlchemyError as e:
+            logging.warning(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            return {
+                "model": self.model,
+                "deployment": self.deployment,
+                "memory": self.memory_cache.stats(),
+                "persistent": {
+                    "enabled": self.persistent,
+                    "hits": self.persistent_hits,
+                    "misses": self.persistent_misses,
+                },
+            }
+
+
+def build_cached_embeddings(embeddings: Embeddings, model: str, deployment: str) -> CachedEmbeddings:
+    return CachedEmbeddings(
+        embeddings,
+        model=model,
+        deployment=deployment,
+        max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        persistent=os.getenv("EMBEDDING_CACHE_PERSISTENT", "true").lower() == "true",
+    )
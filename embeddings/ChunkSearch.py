@@ -0,0 +1,255 @@
+import json
+import math
+import os
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+from langchain_core.documents import Document
+from langchain_postgres.vectorstores import PGVector
+from sqlalchemy import Float, Integer, Select, Text, and_, cast, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+
+# Metadata key holding the number of tokens of a chunk, written at ingestion (embeddings/IngestionPipeline.py)
+TOKEN_COUNT_KEY = "token_count"
+
+# Tokens added per chunk for the structure of the document serialized in the tool answer
+CHUNK_TOKEN_OVERHEAD = 10
+
+# Estimate of the tokens of the serialized metadata, which repeats the text of the chunk under "text"
+METADATA_CHARS_PER_TOKEN = 4
+
+# Rows fetched per round trip while streaming chunks
+STREAM_BATCH_SIZE = 32
+
+# Constant of the reciprocal rank fusion, 60 is the value of the original paper
+RRF_K = 60
+
+# Candidates taken from each of the dense and lexical rankings when k is not set
+HYBRID_CANDIDATES = 500
+
+
+def build_chunk_statement(store: PGVector, embedding: list[float], search_filter: Optional[dict],
+                          limit: Optional[int], with_embedding: bool = False) -> Select:
+    """
+    Selects the chunks of the store collection matching the filter, nearest first.
+
+    Each row has the document, the metadata, the distance and the token count of the chunk, plus its
+    embedding if asked. Chunks ingested before the token count was stored fall back to an estimate of
+    four characters per token.
+    """
+    distance = store.distance_strategy(embedding).label("distance")
+
+    stmt = (
+        select(*_chunk_columns(store, with_embedding), distance)
+        .order_by(distance)
+    )
+    stmt = _restrict(store, stmt, search_filter)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _chunk_columns(store: PGVector, with_embedding: bool) -> list:
+    columns = [store.EmbeddingStore.document, store.EmbeddingStore.cmetadata, _token_count(store)]
+    if with_embedding:
+        columns.append(store.EmbeddingStore.embedding)
+    return columns
+
+
+def _token_count(store: PGVector):
+    return func.coalesce(
+        store.EmbeddingStore.cmetadata[TOKEN_COUNT_KEY].astext.cast(Integer),
+        func.ceil(func.length(store.EmbeddingStore.document) / 4.0).cast(Integer),
+    ).label("token_count")
+
+
+def compile_filter(store: PGVector, search_filter: dict):
+    """
+    Compiles a metadata filter to a where clause.
+
+    {"perimeters": {"$in": [...]}} matches the chunks belonging to any of the perimeters of the list, through
+    the GIN indexed perimeters column. Every other filter is compiled by PGVector.
+    """
+    if "perimeters" in search_filter:
+        return _perimeters_clause(store, search_filter["perimeters"]["$in"])
+    return store._create_filter_clause(search_filter)
+
+
+def _perimeters_clause(store: PGVector, perimeters: list[str]):
+    """
+    Same matches as a '%/perimeter/%' LIKE on the metadata perimeter for each perimeter. A plain word is one
+    segment of the perimeters column; a perimeter with slashes needs all its segments, found with @> on the
+    index, then in that order in the metadata.
+    """
+    column = literal_column(f"{store.EmbeddingStore.__tablename__}.perimeters", type_=ARRAY(Text))
+    words = [perimeter for perimeter in perimeters if "/" not in perimeter]
+    clauses = [column.overlap(cast(words, ARRAY(Text)))]
+    for path in (perimeter for perimeter in perimeters if "/" in perimeter):
+        segments = [segment for segment in path.split("/") if segment]
+        clauses.append(and_(column.contains(cast(segments, ARRAY(Text))),
+                            store.EmbeddingStore.cmetadata["perimeter"].astext.like(f"%/{path}/%")))
+    return or_(*clauses) if len(clauses) > 1 else clauses[0]
+
+
+def _restrict(store: PGVector, stmt: Select, search_filter: Optional[dict]) -> Select:
+    """Restricts a statement on the embedding table to the store collection and the filter"""
+    stmt = (
+        stmt.join(store.CollectionStore, store.EmbeddingStore.collection_id == store.CollectionStore.uuid)
+        .where(store.CollectionStore.name == store.collection_name)
+    )
+    if search_filter:
+        stmt = stmt.where(compile_filter(store, search_filter))
+    return stmt
+
+
+def build_hybrid_statement(store: PGVector, embedding: list[float], query: str, search_filter: Optional[dict],
+                           limit: Optional[int], with_embedding: bool = False) -> Select:
+    """
+    Fuses the dense ranking and the full-text ranking of the chunks with reciprocal rank fusion.
+
+    Both rankings are computed on the same filter and cut to their best candidates, a chunk then scores
+    1 / (RRF_K + rank) for each ranking it appears in. The words of the query are OR-ed so that a single
+    exact term, like a contract number, is enough for a chunk to enter the lexical ranking.
+    """
+    candidates = limit * 4 if limit is not None else HYBRID_CANDIDATES
+    table = store.EmbeddingStore.__tablename__
+    document_tsv = literal_column(f"{table}.document_tsv", type_=TSVECTOR)
+    ts_query = func.to_tsquery("simple", func.replace(cast(func.plainto_tsquery("simple", query), Text), "&", "|"))
+
+    distance = store.distance_strategy(embedding)
+    dense = _restrict(store, select(
+        store.EmbeddingStore.id,
+        func.row_number().over(order_by=distance).label("rank"),
+    ).order_by(distance).limit(candidates), search_filter).cte("dense")
+
+    lexical_rank = func.ts_rank_cd(document_tsv, ts_query)
+    lexical = _restrict(store, select(
+        store.EmbeddingStore.id,
+        func.row_number().over(order_by=lexical_rank.desc()).label("rank"),
+    ).where(document_tsv.op("@@")(ts_query)).order_by(lexical_rank.desc()).limit(candidates),
+        search_filter).cte("lexical")
+
+    fused = (
+        select(
+            func.coalesce(dense.c.id, lexical.c.id).label("id"),
+            (func.coalesce(1.0 / (RRF_K + dense.c.rank), 0.0)
+             + func.coalesce(1.0 / (RRF_K + lexical.c.rank), 0.0)).cast(Float).label("score"),
+        )
+        .select_from(dense.join(lexical, dense.c.id == lexical.c.id, full=True))
+        .subquery("fused")
+    )
+
+    stmt = (
+        select(*_chunk_columns(store, with_embedding), fused.c.score)
+        .join(fused, store.EmbeddingStore.id == fused.c.id)
+        .order_by(fused.c.score.desc())
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def chunk_tokens(row: Any) -> int:
+    """
+    Tokens a chunk takes in the answer of a search: its text, its metadata and the structure around them.
+    """
+    metadata = json.dumps(row.cmetadata, ensure_ascii=False) if row.cmetadata else ""
+    return row.token_count + math.ceil(len(metadata) / METADATA_CHARS_PER_TOKEN) + CHUNK_TOKEN_OVERHEAD
+
+
+def take_within_budget(rows: Iterable[Any], token_budget: int) -> list[Document]:
+    """
+    Returns the rows as documents until the next one would go over the token budget.
+    The first chunk is always returned so that a small budget never ends up with nothing.
+    """
+    documents = []
+    total = 0
+    for row in rows:
+        total += chunk_tokens(row)
+        if total > token_budget and documents:
+            break
+        documents.append(Document(page_content=row.document, metadata=row.cmetadata))
+    return documents
+
+
+async def atake_within_budget(rows: AsyncIterator[Any], token_budget: int) -> list[Document]:
+    documents = []
+    total = 0
+    async for row in rows:
+        total += chunk_tokens(row)
+        if total > token_budget and documents:
+            break
+        documents.append(Document(page_content=row.document, metadata=row.cmetadata))
+    return documents
+
+
+def vector_search_settings(ef_search: Optional[int] = None, probes: Optional[int] = None) -> dict[str, str]:
+    """
+    Returns the pgvector settings of a search: hnsw.ef_search for the HNSW index, ivfflat.probes for an
+    IVFFlat one. Higher values raise recall at the cost of latency. VECTOR_ITERATIVE_SCAN (pgvector 0.8+)
+    keeps scanning the HNSW graph when the filter discards too many candidates.
+    """
+    settings = {}
+    if ef_search is not None:
+        settings["hnsw.ef_search"] = str(ef_search)
+    if probes is not None:
+        settings["ivfflat.probes"] = str(probes)
+    if os.getenv("VECTOR_ITERATIVE_SCAN"):
+        settings["hnsw.iterative_scan"] = os.environ["VECTOR_ITERATIVE_SCAN"]
+    return settings
+
+
+def build_settings_statement(settings: dict[str, str]) -> Select:
+    # set_config(..., true) is SET LOCAL: the value only lasts until the end of the search transaction
+    return select(*[func.set_config(name, value, True) for name, value in settings.items()])
+
+
+def _to_documents(rows: Iterable[Any]) -> list[Document]:
+    return [Document(page_content=row.document, metadata=row.cmetadata) for row in rows]
+
+
+def run_chunk_statement(store: PGVector, stmt: Select, token_budget: Optional[int] = None,
+                        settings: Optional[dict[str, str]] = None,
+                        rerank: Optional[Callable[[list], list]] = None) -> list[Document]:
+    """
+    Runs a chunk statement. With a token budget the rows are streamed through a server side cursor and
+    reading stops as soon as the budget is reached, so only the chunks that are returned are transferred.
+    The settings, see vector_search_settings, are applied to the transaction of the search only.
+    A rerank stage needs all the candidates, their rows are then fetched at once before the budget applies.
+    """
+    with store.session_maker() as session:
+        if settings:
+            session.execute(build_settings_statement(settings))
+        if rerank is not None:
+            rows = rerank(session.execute(stmt).all())
+            return _to_documents(rows) if token_budget is None else take_within_budget(rows, token_budget)
+        if token_budget is None:
+            return _to_documents(session.execute(stmt))
+
+        result = session.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        try:
+            return take_within_budget(result, token_budget)
+        finally:
+            result.close()
+
+
+async def arun_chunk_statement(async_store: PGVector, stmt: Select, token_budget: Optional[int] = None,
+                               settings: Optional[dict[str, str]] = None,
+                               rerank: Optional[Callable[[list], list]] = None) -> list[Document]:
+    """
+    Same as run_chunk_statement on the async engine. Statements are built from the sync store, whose ORM
+    classes are set up at init, while those of the async store are only after its first query.
+    """
+    async with async_store.session_maker() as session:
+        if settings:
+            await session.execute(build_settings_statement(settings))
+        if rerank is not None:
+            rows = rerank((await session.execute(stmt)).all())
+            return _to_documents(rows) if token_budget is None else take_within_budget(rows, token_budget)
+        if token_budget is None:
+            return _to_documents(await session.execute(stmt))
+
+        result = await session.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        try:
+            return await atake_within_budget(result, token_budget)
+        finally:
+            await result.close()
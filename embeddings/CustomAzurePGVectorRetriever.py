@@ -1,21 +1,67 @@
 import logging
+import os
 from dataclasses import field
-from typing import List, Any, Optional
+from typing import List, Any, Optional, Callable
 
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 
-from embeddings.PGVectorStore import vector_store
+from sqlalchemy import Select
+
+from embeddings.ChunkSearch import build_chunk_statement, build_hybrid_statement, run_chunk_statement, \
+    arun_chunk_statement, vector_search_settings
+from embeddings.Diversity import diversify
+from embeddings.PGVectorStore import get_vector_store, get_async_vector_store, get_embeddings
 from embeddings.QueryType import QueryType
+from embeddings.RetrievalCache import retrieval_cache
+
+# Candidates fetched per returned chunk when a diversity stage is on, and in total when k is not set
+DIVERSITY_FETCH_FACTOR = int(os.getenv("RETRIEVAL_DIVERSITY_FETCH_FACTOR", "4"))
+DIVERSITY_CANDIDATES = 200
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
 
 
 class CustomAzurePGVectorRetriever(BaseRetriever):
     filter: dict = field(default_factory=dict)
     k: Optional[int] = 10
-
-    def __init__(self, query_type: QueryType, value: str, k: int = 10, **kwargs: Any):
+    token_budget: Optional[int] = None
+    hybrid: bool = False
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+    mmr_lambda: Optional[float] = None
+    duplicate_threshold: Optional[float] = None
+
+    def __init__(self, query_type: QueryType, value: str, k: int = 10, token_budget: Optional[int] = None,
+                 hybrid: Optional[bool] = None, ef_search: Optional[int] = None, probes: Optional[int] = None,
+                 mmr_lambda: Optional[float] = None, duplicate_threshold: Optional[float] = None, **kwargs: Any):
+        """
+        :param query_type: Whether value is a document id, a comma separated list of ids or a perimeter.
+        :param k: The maximum number of chunks, -1 for no limit.
+        :param token_budget: When set, the nearest chunks are returned until their stored token counts
+            reach the budget.
+        :param hybrid: Fuse the vector search with a full-text search, defaults to HYBRID_SEARCH_ENABLED.
+        :param ef_search: Size of the HNSW candidate list, trades latency for recall. Server default if None.
+        :param probes: Number of IVFFlat lists scanned, same trade-off for an IVFFlat index.
+        :param mmr_lambda: Reorders over-fetched candidates by maximal marginal relevance, 1 is pure
+            relevance, lower values favour diversity. Defaults to RETRIEVAL_MMR_LAMBDA, off if unset.
+        :param duplicate_threshold: Drops candidates whose cosine similarity with a better ranked one is
+            above it. Defaults to RETRIEVAL_DUPLICATE_THRESHOLD, off if unset.
+        """
         super().__init__(**kwargs)
+        self.mmr_lambda = mmr_lambda if mmr_lambda is not None else _env_float("RETRIEVAL_MMR_LAMBDA")
+        self.duplicate_threshold = duplicate_threshold if duplicate_threshold is not None \
+            else _env_float("RETRIEVAL_DUPLICATE_THRESHOLD")
+        self.token_budget = token_budget
+        self.ef_search = ef_search
+        self.probes = probes
+        if hybrid is None:
+            hybrid = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+        self.hybrid = hybrid
 
         if k != -1:
             self.k = k
@@ -29,15 +75,6 @@ class CustomAzurePGVectorRetriever(BaseRetriever):
         else:
             self.filter = self.create_combined_filter(value)
 
-    def create_like_query_array(self, input_string):
-        # Split the input string into a list of words
-        words = input_string.split()
-
-        # Create a list of dictionaries based on the required format
-        query_array = [{'perimeter': {"$like": f"%/{word}/%"}} for word in words]
-
-        return query_array
-
     def create_in_query_filter(self, input_string):
         # Split the input string into a list of words
         words = input_string.split(",")
@@ -48,16 +85,60 @@ class CustomAzurePGVectorRetriever(BaseRetriever):
         return query_array
 
     def create_combined_filter(self, input_string):
-        # Create the array of dictionaries as before
-        query_array = self.create_like_query_array(input_string)
-
-        # Encapsulate the array in a dictionary under the $or key
-        combined_filter = {"$or": query_array}
-
-        return combined_filter
+        # Chunks belonging to any of the perimeters, served by the GIN index on langchain_pg_embedding.perimeters
+        return {'perimeters': {"$in": input_string.split()}}
+
+    @property
+    def diversified(self) -> bool:
+        return self.mmr_lambda is not None or self.duplicate_threshold is not None
+
+    def build_statement(self, query: str, embedding: List[float]) -> Select:
+        limit = self.k
+        if self.diversified:
+            limit = self.k * DIVERSITY_FETCH_FACTOR if self.k is not None else DIVERSITY_CANDIDATES
+        if self.hybrid:
+            return build_hybrid_statement(get_vector_store(), embedding, query, self.filter, limit, self.diversified)
+        return build_chunk_statement(get_vector_store(), embedding, self.filter, limit, self.diversified)
+
+    def build_rerank(self, embedding: List[float]) -> Optional[Callable[[list], list]]:
+        if not self.diversified:
+            return None
+        return lambda rows: diversify(rows, embedding, self.k, self.mmr_lambda, self.duplicate_threshold)
+
+    @property
+    def cache_limit(self) -> tuple:
+        """Every parameter changing the result for a given query and filter, part of the retrieval cache key"""
+        return (self.k, self.token_budget, self.hybrid, self.ef_search, self.probes, self.mmr_lambda,
+                self.duplicate_threshold)
+
+    def get_cached(self, query: str) -> Optional[List[Document]]:
+        return retrieval_cache.get(query, self.filter, self.cache_limit)
+
+    def _search(self, query: str) -> List[Document]:
+        embedding = get_embeddings().embed_query(query)
+        return run_chunk_statement(get_vector_store(), self.build_statement(query, embedding), self.token_budget,
+                                   vector_search_settings(self.ef_search, self.probes), self.build_rerank(embedding))
+
+    async def asearch_embedded(self, query: str, embedding: List[float]) -> List[Document]:
+        """Searches with an already computed query embedding and caches the result"""
+        generation = retrieval_cache.generation
+        documents = await arun_chunk_statement(get_async_vector_store(), self.build_statement(query, embedding),
+                                               self.token_budget, vector_search_settings(self.ef_search, self.probes),
+                                               self.build_rerank(embedding))
+        retrieval_cache.put(query, self.filter, self.cache_limit, documents, generation)
+        return documents
 
     def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
-        return vector_store.similarity_search(query=query, filter=self.filter, k=self.k)
-
-    def _aget_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
-        return vector_store.similarity_search(query=query, filter=self.filter, k=self.k)
+        documents = self.get_cached(query)
+        if documents is None:
+            generation = retrieval_cache.generation
+            documents = self._search(query)
+            retrieval_cache.put(query, self.filter, self.cache_limit, documents, generation)
+        return documents
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        documents = self.get_cached(query)
+        if documents is None:
+            documents = await self.asearch_embedded(query, await get_embeddings().aembed_query(query))
+        return documents
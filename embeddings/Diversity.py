@@ -0,0 +1,68 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def suppress_near_duplicates(vectors: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Returns the indexes of the vectors to keep, in their original order. A vector is dropped when its cosine
+    similarity with an earlier kept vector is above the threshold, so the best ranked copy survives.
+    """
+    unit = _unit_rows(vectors)
+    duplicates = np.triu(unit @ unit.T > threshold, k=1)
+    keep = np.ones(len(vectors), dtype=bool)
+    for i in range(len(vectors)):
+        if keep[i]:
+            keep &= ~duplicates[i]
+    return np.flatnonzero(keep)
+
+
+def maximal_marginal_relevance(query: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float) -> list[int]:
+    """
+    Selects k vectors by maximal marginal relevance: each step takes the candidate maximizing
+    lambda_mult * similarity to the query - (1 - lambda_mult) * highest similarity to the already selected.
+    lambda_mult = 1 is the plain similarity order, lower values favour diversity.
+    """
+    unit = _unit_rows(vectors)
+    relevance = unit @ (query / (np.linalg.norm(query) or 1.0))
+    similarities = unit @ unit.T
+
+    selected: list[int] = []
+    redundancy = np.full(len(vectors), -1.0)
+    available = np.ones(len(vectors), dtype=bool)
+    for _ in range(min(k, len(vectors))):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarities[best])
+    return selected
+
+
+def diversify(rows: Sequence, query_embedding: Sequence[float], k: Optional[int],
+              mmr_lambda: Optional[float] = None, duplicate_threshold: Optional[float] = None) -> list:
+    """
+    Post-retrieval stage over over-fetched chunk rows carrying their embedding: drops near-duplicates, then
+    reorders by MMR and keeps the k first (all of them when k is None).
+    """
+    if not rows:
+        return []
+
+    vectors = np.asarray([row.embedding for row in rows], dtype=np.float32)
+    indexes = np.arange(len(rows))
+
+    if duplicate_threshold is not None:
+        indexes = suppress_near_duplicates(vectors, duplicate_threshold)
+
+    if mmr_lambda is not None:
+        picked = maximal_marginal_relevance(np.asarray(query_embedding, dtype=np.float32), vectors[indexes],
+                                            k if k is not None else len(indexes), mmr_lambda)
+        indexes = indexes[picked]
+
+    return [rows[i] for i in indexes[:k]]
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+import pytz
+from sqlalchemy import Column, String, DateTime, Float
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+class EmbeddingCache(Base):
+    __tablename__ = 'embedding_cache'
+
+    model = Column(String, primary_key=True)
+    deployment = Column(String, primary_key=True)
+    text_hash = Column(String, primary_key=True)  # sha256 of the embedded text
+    embedding = Column(postgresql.ARRAY(Float), nullable=False)
+    created_on = Column(DateTime, nullable=True, default=lambda: datetime.now(pytz.utc))
@@ -0,0 +1,60 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
+from embeddings.EmbeddingCache import EmbeddingCache
+
+
+class EmbeddingCacheRepository(BaseAlchemyRepository):
+
+    def get(self, model: str, deployment: str, text_hash: str) -> Optional[list[float]]:
+        stmt = select(EmbeddingCache.embedding).where(EmbeddingCache.model == model,
+                                                      EmbeddingCache.deployment == deployment,
+                                                      EmbeddingCache.text_hash == text_hash)
+        return self.db.execute(stmt).scalars().first()
+
+    def get_many(self, model: str, deployment: str, text_hashes: list[str]) -> dict[str, list[float]]:
+        stmt = select(EmbeddingCache.text_hash, EmbeddingCache.embedding).where(
+            EmbeddingCache.model == model,
+            EmbeddingCache.deployment == deployment,
+            EmbeddingCache.text_hash.in_(text_hashes))
+        return {row.text_hash: row.embedding for row in self.db.execute(stmt).all()}
+
+    def save_many(self, model: str, deployment: str, embeddings: dict[str, list[float]]):
+        if not embeddings:
+            return
+        # Concurrent workers may embed the same text, the first insert wins
+        stmt = insert(EmbeddingCache).values([
+            {"model": model, "deployment": deployment, "text_hash": text_hash, "embedding": embedding}
+            for text_hash, embedding in embeddings.items()
+        ]).on_conflict_do_nothing()
+        self.db.execute(stmt)
+        self.db.commit()
+
+
+class AsyncEmbeddingCacheRepository(BaseAsyncAlchemyRepository):
+
+    async def get(self, model: str, deployment: str, text_hash: str) -> Optional[list[float]]:
+        stmt = select(EmbeddingCache.embedding).where(EmbeddingCache.model == model,
+                                                      EmbeddingCache.deployment == deployment,
+                                                      EmbeddingCache.text_hash == text_hash)
+        return (await self.db.execute(stmt)).scalars().first()
+
+    async def get_many(self, model: str, deployment: str, text_hashes: list[str]) -> dict[str, list[float]]:
+        stmt = select(EmbeddingCache.text_hash, EmbeddingCache.embedding).where(
+            EmbeddingCache.model == model,
+            EmbeddingCache.deployment == deployment,
+            EmbeddingCache.text_hash.in_(text_hashes))
+        return {row.text_hash: row.embedding for row in (await self.db.execute(stmt)).all()}
+
+    async def save_many(self, model: str, deployment: str, embeddings: dict[str, list[float]]):
+        if not embeddings:
+            return
+        stmt = insert(EmbeddingCache).values([
+            {"model": model, "deployment": deployment, "text_hash": text_hash, "embedding": embedding}
+            for text_hash, embedding in embeddings.items()
+        ]).on_conflict_do_nothing()
+        await self.db.execute(stmt)
+        await self.db.commit()
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Optional, TypeVar
+
+from sqlalchemy import Text, delete, literal_column, select, text
+
+import config
+from document.Document import DocumentStatus, DocumentType
+from document.DocumentsRepository import AsyncDocumentsRepository
+from embeddings.ChunkSearch import TOKEN_COUNT_KEY
+from embeddings.PGVectorStore import get_embeddings, get_vector_store
+from embeddings.PageParser import Chunk, count_pdf_pages, parse_pdf_pages, parse_text
+from job.Job import JobStatus, JobType
+from job.JobRepository import AsyncJobRepository
+
+# Pages below which a PDF is not split further between the workers
+MIN_PAGES_PER_TASK = 4
+
+T = TypeVar("T")
+
+_END = object()
+
+
+async def prefetch(items: AsyncIterator[T], size: int) -> AsyncIterator[T]:
+    """
+    Runs an async iterator ahead of its consumer in a task of its own, up to size items, so that both
+    overlap. An error of the iterator is raised to the consumer, the task is cancelled when the consumer
+    stops.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+
+    async def produce():
+        try:
+            async for item in items:
+                await queue.put((item, None))
+            await queue.put((_END, None))
+        except Exception as e:
+            await queue.put((None, e))
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        task.cancel()
+
+
+class IngestionPipeline:
+    """
+    Turns a stored document into chunks of the vector store, in four stages:
+
+    - parsing and chunking in a process pool, each worker taking a contiguous range of pages,
+    - embedding in batches, with a bounded number of requests in flight, reusing the stored vectors of
+      identical chunk contents,
+    - replacing the chunks of the document with a single COPY into langchain_pg_embedding, fed batch by
+      batch while the next window is embedded,
+    - updating document_status: IN_PROGRESS, then COMPLETED or FAILED.
+    """
+
+    def __init__(self, workers: int, chunk_size: int, chunk_overlap: int, embed_batch_size: int,
+                 embed_concurrency: int, reuse_vectors: bool = True):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.reuse_vectors = reuse_vectors
+        # spawn rather than fork, the service process holds an event loop, threads and open connections
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def parse(self, name: str, content: bytes) -> tuple[int, list[Chunk]]:
+        """
+        :return: The number of pages and the chunks of the document, in page order.
+        """
+        loop = asyncio.get_running_loop()
+        if not name.lower().endswith(".pdf"):
+            chunks = await loop.run_in_executor(self.executor, partial(
+                parse_text, content, self.chunk_size, self.chunk_overlap))
+            return 1, chunks
+
+        pages = await loop.run_in_executor(self.executor, count_pdf_pages, content)
+        tasks = max(1, min(self.workers, math.ceil(pages / MIN_PAGES_PER_TASK)))
+        step = math.ceil(pages / tasks)
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, partial(
+                parse_pdf_pages, content, start, start + step, self.chunk_size, self.chunk_overlap))
+            for start in range(0, pages, step)
+        ])
+        return pages, [chunk for part in parts for chunk in part]
+
+    async def find_vectors(self, collection_id, content_hashes: list[str]) -> dict[str, list[float]]:
+        """
+        Returns the vectors already stored in the collection for the given chunk contents. The collection
+        is bound to one embedding model, so a vector found there can be reused as is.
+        """
+        store = get_vector_store()
+        content_hash = literal_column(f"{store.EmbeddingStore.__tablename__}.content_hash", type_=Text)
+        stmt = (
+            select(content_hash, store.EmbeddingStore.embedding)
+            .where(store.EmbeddingStore.collection_id == collection_id,
+                   content_hash.in_(content_hashes))
+            .distinct(content_hash)
+        )
+        # A connection of its own, the one of store() is busy with the COPY
+        async with config.async_engine.connect() as conn:
+            return {row[0]: [float(value) for value in row[1]] for row in (await conn.execute(stmt)).all()}
+
+    async def embed(self, chunks: list[Chunk], collection_id, stats: dict) \
+            -> AsyncIterator[list[tuple[Chunk, list[float]]]]:
+        """
+        Embeds the chunks window by window and yields them with their vectors batch by batch, in order.
+        Only one window of vectors is held in memory at a time.
+
+        The vectors of contents already in the collection are reused, a text repeated in the window is only
+        embedded once, the rest is sent in batches, embed_concurrency requests at a time. stats counts the
+        embedded and reused chunks.
+        """
+        embeddings = get_embeddings()
+        window = self.embed_batch_size * self.embed_concurrency
+        stats.setdefault("embedded_chunks", 0)
+        stats.setdefault("reused_chunks", 0)
+        for window_start in range(0, len(chunks), window):
+            window_chunks = chunks[window_start:window_start + window]
+            content_hashes = list(dict.fromkeys(chunk.content_hash for chunk in window_chunks))
+
+            vectors = await self.find_vectors(collection_id, content_hashes) if self.reuse_vectors else {}
+            texts = {chunk.content_hash: chunk.text for chunk in window_chunks if chunk.content_hash not in vectors}
+            missing = list(texts.keys())
+            batches = [missing[i:i + self.embed_batch_size] for i in range(0, len(missing), self.embed_batch_size)]
+            embedded = await asyncio.gather(*[embeddings.aembed_documents([texts[h] for h in batch])
+                                              for batch in batches])
+            for batch, batch_vectors in zip(batches, embedded):
+                vectors.update(zip(batch, batch_vectors))
+
+            stats["embedded_chunks"] += len(missing)
+            stats["reused_chunks"] += len(window_chunks) - len(missing)
+            for batch_start in range(0, len(window_chunks), self.embed_batch_size):
+                yield [(chunk, vectors[chunk.content_hash])
+                       for chunk in window_chunks[batch_start:batch_start + self.embed_batch_size]]
+
+    async def collection_id(self):
+        store = get_vector_store()
+        async with config.async_engine.connect() as conn:
+            return (await conn.execute(
+                select(store.CollectionStore.uuid).where(store.CollectionStore.name == store.collection_name)
+            )).scalar_one()
+
+    @staticmethod
+    def build_metadata(blob_id: int, name: str, perimeter: str, chunk: Chunk) -> dict:
+        return {
+            "blob_id": str(blob_id),
+            "file_name": name,
+            "page": chunk.page,
+            # Read by the RAG prompt and by the sources of the answers
+            "text": chunk.text,
+            # "/a/ /b/" is the perimeter format of the chunks, see 7_create_chunk_perimeters.sql
+            "perimeter": " ".join(f"/{word}/" for word in perimeter.split()),
+            TOKEN_COUNT_KEY: chunk.token_count,
+        }
+
+    async def store(self, blob_id: int, name: str, perimeter: str, collection_id,
+                    batches: AsyncIterator[list[tuple[Chunk, list[float]]]]) -> dict:
+        """
+        Replaces the chunks of the document in one transaction, the new ones are written with COPY as their
+        batches come out of the embedding stage. The previous chunks are deleted once the new ones are
+        written, so that their vectors can be reused until then.
+        :return: The time spent waiting for the embeddings and writing the rows.
+        """
+        store = get_vector_store()
+        timings = {"embed_seconds": 0.0, "store_seconds": 0.0}
+        async with config.async_engine.begin() as conn:
+            # The COPY lasts as long as the embedding stage, DB_STATEMENT_TIMEOUT_MS is meant for the queries
+            await conn.execute(text("SET LOCAL statement_timeout = 0"))
+            previous_ids = (await conn.execute(select(store.EmbeddingStore.id).where(
+                store.EmbeddingStore.collection_id == collection_id,
+                store.EmbeddingStore.cmetadata["blob_id"].astext == str(blob_id)))).scalars().all()
+
+            raw_connection = await conn.get_raw_connection()
+            async with raw_connection.driver_connection.cursor() as cursor:
+                async with cursor.copy("COPY langchain_pg_embedding"
+                                       " (id, collection_id, embedding, document, cmetadata, content_hash)"
+                                       " FROM STDIN") as copy:
+                    start = time.perf_counter()
+                    async for batch in batches:
+                        written = time.perf_counter()
+                        timings["embed_seconds"] += written - start
+                        for chunk, vector in batch:
+                            await copy.write_row((
+                                str(uuid.uuid4()),
+                                str(collection_id),
+                                json.dumps(vector),
+                                chunk.text,
+                                json.dumps(self.build_metadata(blob_id, name, perimeter, chunk)),
+                                chunk.content_hash,
+                            ))
+                        start = time.perf_counter()
+                        timings["store_seconds"] += start - written
+
+            if previous_ids:
+                await conn.execute(delete(store.EmbeddingStore).where(store.EmbeddingStore.id.in_(previous_ids)))
+        return timings
+
+    async def set_status(self, blob_id: int, status: DocumentStatus, job_ids: list[int]):
+        async with config.AsyncSessionLocal() as session:
+            await AsyncDocumentsRepository(session).update_document_status(blob_id, status)
+            await AsyncJobRepository(session).update_status(job_ids, JobStatus(status.value))
+
+    async def claim_embedding_jobs(self, blob_id: int) -> list[int]:
+        """
+        Takes over the LONG_EMBEDDINGS jobs queued for the document by add_embedding_job_trigger, see
+        4_create_job_table.sql, so that the job worker does not embed it a second time.
+        """
+        async with config.AsyncSessionLocal() as session:
+            return await AsyncJobRepository(session).claim(str(blob_id), JobType.LONG_EMBEDDINGS)
+
+    async def ingest(self, blob_id: int) -> Optional[dict]:
+        """
+        Ingests a stored document.
+        :param blob_id: The id of the document.
+        :return: The page and chunk counts and the time spent in each stage, None if the ingestion failed.
+        """
+        async with config.AsyncSessionLocal() as session:
+            repository = AsyncDocumentsRepository(session)
+            content = await repository.get_content(blob_id)
+            document = await repository.get_by_id(blob_id) if content is not None else None
+
+        if document is None:
+            logging.error(f"Ingestion of document {blob_id} skipped: document not found")
+            return None
+        # Same documents as the embedding jobs, templates and summaries are not searched
+        if document.document_type not in (None, DocumentType.DOCUMENT):
+            logging.info(f"Ingestion of document {blob_id} skipped: {document.document_type} documents are not "
+                         f"embedded")
+            return None
+
+        job_ids = await self.claim_embedding_jobs(blob_id)
+        await self.set_status(blob_id, DocumentStatus.IN_PROGRESS, job_ids)
+        stats = {"blob_id": blob_id}
+        try:
+            start = time.perf_counter()
+            stats["pages"], chunks = await self.parse(document.name, content)
+            stats["chunks"] = len(chunks)
+            stats["parse_seconds"] = time.perf_counter() - start
+
+            collection_id = await self.collection_id()
+            # The next window is embedded while the current one is written
+            batches = prefetch(self.embed(chunks, collection_id, stats), self.embed_concurrency)
+            stats.update(await self.store(blob_id, document.name, document.perimeter, collection_id, batches))
+        except Exception as e:
+            logging.exception(f"Ingestion of document {blob_id} failed: {e}")
+            await self.set_status(blob_id, DocumentStatus.FAILED, job_ids)
+            return None
+
+        await self.set_status(blob_id, DocumentStatus.COMPLETED, job_ids)
+        logging.info("Ingested document %s: %s", blob_id, stats)
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+pipeline: Optional[IngestionPipeline] = None
+
+
+def init_ingestion():
+    global pipeline
+
+    pipeline = IngestionPipeline(
+        workers=int(os.getenv("INGESTION_WORKERS", str(os.cpu_count() or 2))),
+        chunk_size=int(os.getenv("INGESTION_CHUNK_SIZE", "1000")),
+        chunk_overlap=int(os.getenv("INGESTION_CHUNK_OVERLAP", "200")),
+        embed_batch_size=int(os.getenv("INGESTION_EMBED_BATCH_SIZE", "64")),
+        embed_concurrency=int(os.getenv("INGESTION_EMBED_CONCURRENCY", "4")),
+        reuse_vectors=os.getenv("INGESTION_REUSE_VECTORS", "true").lower() == "true",
+    )
+
+
+def close_ingestion():
+    global pipeline
+
+    if pipeline is not None:
+        pipeline.close()
+        pipeline = None
+
+
+def get_ingestion_pipeline() -> IngestionPipeline:
+    if pipeline is None:
+        raise RuntimeError("Ingestion pipeline is not initialized. Call init_ingestion() first.")
+
+    return pipeline
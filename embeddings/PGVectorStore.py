@@ -1,19 +1,63 @@
 import json
 import os
+from typing import Optional
 
 from langchain_postgres.vectorstores import PGVector
 
-from embeddings.azure_openai import get_embeddings_and_set_env
+import config
+from embeddings.CachedEmbeddings import CachedEmbeddings
+from embeddings.azure_openai import build_embeddings
 
 # We use postgresql rather than postgres in the conn string since LangChain uses sqlalchemy under the hood
 # You can remove the ?sslmode=require if you have a local PostgreSQL instance running without SSL
 
-vector_store = PGVector.from_existing_index(
-    collection_name=os.getenv("POSTGRES_INDEX_NAME"),
-    embedding=get_embeddings_and_set_env(),
-    connection=os.getenv("PGVECTOR_CONNECTION_STRING"),
-    use_jsonb=True,
-)
+embeddings: Optional[CachedEmbeddings] = None
+vector_store: Optional[PGVector] = None
+async_vector_store: Optional[PGVector] = None
+
+
+def init_vector_store():
+    global embeddings, vector_store, async_vector_store
+
+    embeddings = build_embeddings()
+
+    vector_store = PGVector.from_existing_index(
+        collection_name=os.getenv("POSTGRES_INDEX_NAME"),
+        embedding=embeddings,
+        # The engine of config.init_db(), not a pool of its own
+        connection=config.engine,
+        use_jsonb=True,
+    )
+
+    # Same collection, queried through the async engine of config.init_db()
+    async_vector_store = PGVector(
+        embeddings=embeddings,
+        collection_name=os.getenv("POSTGRES_INDEX_NAME"),
+        connection=config.async_engine,
+        use_jsonb=True,
+        async_mode=True,
+    )
+
+
+def get_embeddings() -> CachedEmbeddings:
+    if embeddings is None:
+        raise RuntimeError("embeddings are not initialized. Call init_vector_store() first.")
+
+    return embeddings
+
+
+def get_vector_store() -> PGVector:
+    if vector_store is None:
+        raise RuntimeError("vector_store is not initialized. Call init_vector_store() first.")
+
+    return vector_store
+
+
+def get_async_vector_store() -> PGVector:
+    if async_vector_store is None:
+        raise RuntimeError("async_vector_store is not initialized. Call init_vector_store() first.")
+
+    return async_vector_store
 
 
 def build_all_documents_retriever(perimeter: str):
@@ -28,7 +72,7 @@ def build_all_documents_retriever(perimeter: str):
     }
 
     # Construct the retriever with the search kwargs
-    retriever = vector_store.as_retriever(search_kwargs=search_kwargs)
+    retriever = get_vector_store().as_retriever(search_kwargs=search_kwargs)
 
     # Print for debugging
     print(retriever.search_kwargs)
@@ -0,0 +1,61 @@
+# CPU bound stages of the ingestion, run in the worker processes of embeddings/IngestionPipeline.py.
+# Only light dependencies are imported here, so that spawning a worker stays cheap.
+import hashlib
+import io
+from functools import lru_cache
+from typing import NamedTuple
+
+import tiktoken
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+
+class Chunk(NamedTuple):
+    page: int
+    text: str
+    token_count: int
+    # sha256 of the text, same as the content_hash column of langchain_pg_embedding
+    content_hash: str
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> tiktoken.Encoding:
+    return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode(text))
+
+
+@lru_cache(maxsize=4)
+def _splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def count_pdf_pages(content: bytes) -> int:
+    return len(PdfReader(io.BytesIO(content)).pages)
+
+
+def hash_content(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_page(page: int, text: str, chunk_size: int, chunk_overlap: int) -> list[Chunk]:
+    # Postgres text can not hold NUL characters, some PDF extractions have them
+    text = text.replace("\x00", "")
+    return [Chunk(page, part, count_tokens(part), hash_content(part))
+            for part in _splitter(chunk_size, chunk_overlap).split_text(text) if part.strip()]
+
+
+def parse_pdf_pages(content: bytes, start: int, end: int, chunk_size: int, chunk_overlap: int) -> list[Chunk]:
+    """Extracts the text of the pages [start, end) of a PDF, numbered from 1, and chunks it"""
+    reader = PdfReader(io.BytesIO(content))
+    chunks = []
+    for index in range(start, min(end, len(reader.pages))):
+        chunks.extend(chunk_page(index + 1, reader.pages[index].extract_text() or "", chunk_size, chunk_overlap))
+    return chunks
+
+
+def parse_text(content: bytes, chunk_size: int, chunk_overlap: int) -> list[Chunk]:
+    """Chunks a plain text file as a single page"""
+    return chunk_page(1, content.decode("utf-8", errors="replace"), chunk_size, chunk_overlap)
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from typing import Hashable, Optional
+
+from langchain_core.documents import Document
+
+from LRUCache import LRUCache
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _filter_blob_ids(search_filter: dict) -> Optional[frozenset[str]]:
+    """Returns the blob_ids a blob_id filter is restricted to, None for any other filter"""
+    blob_id = search_filter.get("blob_id")
+    if not blob_id:
+        return None
+    if "$eq" in blob_id:
+        return frozenset([str(blob_id["$eq"])])
+    return frozenset(str(value) for value in blob_id.get("$in", []))
+
+
+def _filter_perimeters(search_filter: dict) -> frozenset[str]:
+    """
+    Returns the perimeter segments of a filter built by CustomAzurePGVectorRetriever.create_combined_filter,
+    a document sharing none of them cannot enter its results
+    """
+    perimeters = search_filter.get("perimeters", {}).get("$in", [])
+    return frozenset(segment for perimeter in perimeters for segment in perimeter.split("/") if segment)
+
+
+class RetrievalEntry:
+
+    def __init__(self, documents: list[Document], search_filter: dict):
+        self.created_at = time.monotonic()
+        self.documents = documents
+        self.blob_ids = frozenset(str(document.metadata.get("blob_id")) for document in documents)
+        self.filter_blob_ids = _filter_blob_ids(search_filter)
+        self.filter_perimeters = _filter_perimeters(search_filter)
+
+    def is_affected_by(self, blob_id: str, perimeter: Optional[str]) -> bool:
+        if blob_id in self.blob_ids:
+            return True
+        if self.filter_blob_ids is not None:
+            return blob_id in self.filter_blob_ids
+        # Perimeter filter: a document may enter the results if one of its perimeters matches,
+        # when the perimeter is unknown the entry is dropped to stay on the safe side
+        if perimeter is None:
+            return True
+        # Perimeters are stored either as "/a/ /b/" in the chunk metadata or as plain words on the document
+        return not self.filter_perimeters.isdisjoint(perimeter.replace("/", " ").split())
+
+
+class RetrievalCache:
+    """
+    Bounded cache of similarity search results keyed by normalized query, filter and limit (k, token budget).
+
+    Entries are dropped by invalidate() whenever a document they contain, or could now contain, is
+    saved, deleted or changes status. The cache is per process, so entries also expire after ttl
+    seconds to bound the staleness left by writes handled by another replica.
+
+    A search reads the generation before it queries and hands it to put(): every invalidation moves the
+    generation, so the result of a search that overlapped one is not cached.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.cache = LRUCache(max_bytes)
+        self.ttl = ttl
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str, search_filter: dict, limit: Hashable) -> tuple:
+        return normalize_query(query), json.dumps(search_filter, sort_keys=True), limit
+
+    @staticmethod
+    def _copy(documents: list[Document]) -> list[Document]:
+        # Callers may mutate the metadata of the returned documents, never hand out the cached instances
+        return [Document(page_content=document.page_content, metadata=dict(document.metadata))
+                for document in documents]
+
+    def get(self, query: str, search_filter: dict, limit: Hashable) -> Optional[list[Document]]:
+        key = self.key(query, search_filter, limit)
+        entry: Optional[RetrievalEntry] = self.cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at > self.ttl:
+            self.cache.pop(key)
+            return None
+        return self._copy(entry.documents)
+
+    def put(self, query: str, search_filter: dict, limit: Hashable, documents: list[Document],
+            generation: Optional[int] = None) -> bool:
+        """
+        :param generation: The generation read before the search ran, None for the current one.
+        :return: False if the result was dropped, an invalidation having happened during the search.
+        """
+        size = sum(len(document.page_content) + len(json.dumps(document.metadata, default=str))
+                   for document in documents) + 256
+        entry = RetrievalEntry(self._copy(documents), search_filter)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self.cache.put(self.key(query, search_filter, limit), entry, size)
+        return True
+
+    def invalidate(self, blob_id, perimeter: Optional[str] = None) -> int:
+        """
+        Drops the entries affected by a change of the given document.
+        :param blob_id: The id of the saved, deleted or updated document.
+        :param perimeter: The perimeter of the document, None if unknown.
+        :return: The number of dropped entries.
+        """
+        blob_id = str(blob_id)
+        with self._lock:
+            self.generation += 1
+            return self.cache.remove_if(lambda key, entry: entry.is_affected_by(blob_id, perimeter))
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.cache.clear()
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "ttl": self.ttl}
+
+
+retrieval_cache = RetrievalCache(
+    max_bytes=int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "300")),
+)
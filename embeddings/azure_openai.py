@@ -2,14 +2,20 @@ import os
 
 from langchain_openai import AzureOpenAIEmbeddings
 
+from chat.azure_openai import ModelRegistry
+from embeddings.CachedEmbeddings import CachedEmbeddings, build_cached_embeddings
 
-def get_embeddings_and_set_env() -> AzureOpenAIEmbeddings:
-    os.environ["AZURE_OPENAI_API_KEY"] = os.environ["AZURE_OPENAI_API_CH_KEY"]
-    os.environ["AZURE_OPENAI_ENDPOINT"] = os.environ["AZURE_OPENAI_CH_ENDPOINT"]
+
+def build_embeddings() -> CachedEmbeddings:
+    # Same region as the chat models, the credentials are given to the client rather than set in the environment
+    endpoint, api_key = ModelRegistry.credentials("embeddings")
 
     embeddings = AzureOpenAIEmbeddings(
+        azure_endpoint=endpoint,
+        api_key=api_key,
         azure_deployment=os.environ["AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT_NAME"],
         openai_api_version=os.environ["AZURE_OPENAI_EMBEDDINGS_API_VERSION"]
     )
 
-    return embeddings
+    # Repeated questions and agent retries reuse the embedding of the query text
+    return build_cached_embeddings(embeddings, model=embeddings.model, deployment=embeddings.deployment)
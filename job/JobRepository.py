@@ -3,9 +3,9 @@ from datetime import datetime
 from typing import Sequence
 
 import pytz
-from sqlalchemy import select
+from sqlalchemy import select, update
 
-from BaseAlchemyRepository import BaseAlchemyRepository
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
 from job.Job import JobCreate, Job, JobUpdate, JobRead, JobType, JobStatus
 
 
@@ -59,3 +59,28 @@ class JobRepository(BaseAlchemyRepository):
 
             payload=json.loads(job.payload) if job.payload else {}
         )
+
+
+class AsyncJobRepository(BaseAsyncAlchemyRepository):
+
+    async def claim(self, source: str, job_type: JobType) -> list[int]:
+        """
+        Takes the requested jobs of a source, so that the job workers leave them alone.
+        :return: The ids of the claimed jobs, now IN_PROGRESS.
+        """
+        stmt = (
+            update(Job)
+            .where(Job.source == source, Job.job_type == job_type, Job.status == JobStatus.REQUESTED)
+            .values(status=JobStatus.IN_PROGRESS, last_update=datetime.now(pytz.utc))
+            .returning(Job.id)
+        )
+        job_ids = list((await self.db.execute(stmt)).scalars().all())
+        await self.db.commit()
+        return job_ids
+
+    async def update_status(self, job_ids: list[int], status: JobStatus):
+        if not job_ids:
+            return
+        await self.db.execute(update(Job).where(Job.id.in_(job_ids))
+                              .values(status=status, last_update=datetime.now(pytz.utc)))
+        await self.db.commit()
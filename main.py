@@ -27,9 +27,11 @@ import config
 # Ensure import of config module
 from assistants.AssistantsController import router_assistant
 from assistants.AssistantsDocumentController import router_assistant_document
+from chat import azure_openai
 from chat.ChatController import chat_ai
 from conversation.ConversationController import router_conversation
 from document.DocumentsController import router_file
+from embeddings import PGVectorStore, IngestionPipeline
 from message.MessageController import router_message
 from rights.UserController import router_user
 
@@ -45,10 +47,12 @@ origins = [
 ]
 
 
-# Middleware to disable caching
+# Middleware to disable caching, except for the responses setting their own policy (document downloads)
 class NoCacheMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
         response = await call_next(request)
+        if 'Cache-Control' in response.headers:
+            return response
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0, post-check=0, pre-check=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
@@ -95,8 +99,14 @@ async def lifespan(app: FastAPI):
     logging.debug("Lifespan startup")
     config.load_config()  # Ensure config is loaded, including SessionLocal initialization
     config.init_db()  # Initialize the database connection after loading config
+    PGVectorStore.init_vector_store()  # Needs the engines of init_db()
+    azure_openai.init_models()  # Build the Azure OpenAI clients once for the whole process
+    IngestionPipeline.init_ingestion()  # Process pool of the document ingestion
     yield
     logging.debug("Lifespan shutdown")
+    IngestionPipeline.close_ingestion()
+    await azure_openai.close_models()
+    await config.close_db()
 
 
 # FastAPI application instance
@@ -128,13 +138,21 @@ async def ping():
     return {"date": date.today()}
 
 
+@app.get("/pool/stats")
+async def pool_stats():
+    return config.pool_stats()
+
+
 # Middleware for CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["Authorization", "Content-Type"],  # Explicitly allow Authorization header
+    # Explicitly allow Authorization header, plus the conditional and range requests of the document downloads
+    allow_headers=["Authorization", "Content-Type", "Range", "If-None-Match", "If-Range"],
+    # Total of the paginated conversation list, validators and ranges of the document downloads
+    expose_headers=["X-Total-Count", "ETag", "Content-Range", "Accept-Ranges"],
 )
 
 # Custom middleware
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+import pytz
+from sqlalchemy import Column, Integer, Text, DateTime
+
+from message.Message import Base
+
+
+class ConversationSummary(Base):
+    __tablename__ = 'conversation_summary'
+
+    conversation_id = Column(Integer, primary_key=True)
+    summary = Column(Text, nullable=False)
+    # Id of the last message folded into the summary
+    last_message_id = Column(Integer, nullable=False)
+    updated_on = Column(DateTime, nullable=False, default=lambda: datetime.now(pytz.utc))
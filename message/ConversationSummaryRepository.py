@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Optional
+
+import pytz
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
+from message.ConversationSummary import ConversationSummary
+
+
+class ConversationSummaryRepository(BaseAlchemyRepository):
+
+    def get(self, conversation_id) -> Optional[ConversationSummary]:
+        stmt = select(ConversationSummary).where(ConversationSummary.conversation_id == int(conversation_id))
+        return self.db.execute(stmt).scalars().first()
+
+    def save(self, conversation_id, summary: str, last_message_id: int):
+        """
+        Stores the summary of a conversation, unless a summary going further is already stored.
+        :param conversation_id: The id of the conversation.
+        :param summary: The summary.
+        :param last_message_id: The id of the last message folded into the summary.
+        """
+        stmt = insert(ConversationSummary).values(conversation_id=int(conversation_id), summary=summary,
+                                                  last_message_id=last_message_id,
+                                                  updated_on=datetime.now(pytz.utc))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ConversationSummary.conversation_id],
+            set_={"summary": stmt.excluded.summary, "last_message_id": stmt.excluded.last_message_id,
+                  "updated_on": stmt.excluded.updated_on},
+            where=ConversationSummary.last_message_id < stmt.excluded.last_message_id,
+        )
+        self.db.execute(stmt)
+        self.db.commit()
+
+
+class AsyncConversationSummaryRepository(BaseAsyncAlchemyRepository):
+
+    async def get(self, conversation_id) -> Optional[ConversationSummary]:
+        stmt = select(ConversationSummary).where(ConversationSummary.conversation_id == int(conversation_id))
+        return (await self.db.execute(stmt)).scalars().first()
@@ -1,11 +1,13 @@
-import json
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 
-from ProviderManager import message_dao_provider
+from ProviderManager import message_dao_provider, async_message_dao_provider
 from message import MessageRepository
+from message.MessagePage import encode_message_page
+from message.MessageRepository import AsyncMessageRepository
 
 router_message = APIRouter(
     prefix="/message",
@@ -15,6 +17,7 @@ router_message = APIRouter(
 
 
 message_repository_dep = Annotated[MessageRepository, Depends(message_dao_provider)]
+async_message_repository_dep = Annotated[AsyncMessageRepository, Depends(async_message_dao_provider)]
 
 
 '''
@@ -32,6 +35,22 @@ async def conversation(message_repository: message_repository_dep, conversation_
     return res
 
 
+@router_message.get("/page/")
+async def message_page(message_repository: async_message_repository_dep, conversation_id: str,
+                       before: Optional[int] = None, after: Optional[int] = None,
+                       limit: int = Query(default=50, ge=1, le=500)):
+    """
+    Returns a page of messages of a conversation, oldest first: the last ones by default, the ones
+    preceding before or following after otherwise. The "before" and "after" of the answer are the
+    cursors of the neighbouring pages.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Only one of before and after can be set")
+
+    rows = message_repository.stream_page(conversation_id, before, after, limit)
+    return StreamingResponse(encode_message_page(rows, limit), media_type="application/json")
+
+
 @router_message.delete("/")
 async def conversation(message_repository: message_repository_dep,conversation_id: str):
     message_repository.delete_by_conversation_id(conversation_id)
@@ -0,0 +1,36 @@
+import json
+from typing import Any, AsyncIterator
+
+
+def encode_row(row: Any) -> str:
+    return json.dumps({
+        "id": row.id,
+        "type": row.role,
+        "content": row.content,
+        "created_on": row.created_on.isoformat() if row.created_on else None,
+    })
+
+
+async def encode_message_page(rows: AsyncIterator[Any], limit: int) -> AsyncIterator[str]:
+    """
+    Encodes a page of message rows (see MessageRepository.page_statement) as a JSON document, one row at a
+    time, so that no page is ever built in memory:
+
+    {"messages": [...], "has_more": true, "before": 120, "after": 169}
+
+    has_more tells whether there are messages beyond the page in the direction it was read, before and
+    after are the cursors of the previous and next pages.
+    """
+    yield '{"messages": ['
+    has_more = False
+    first_id = None
+    last_id = None
+    async for row in rows:
+        if row.rank > limit:
+            has_more = True
+            continue
+        yield ("" if first_id is None else ", ") + encode_row(row)
+        if first_id is None:
+            first_id = row.id
+        last_id = row.id
+    yield f'], "has_more": {json.dumps(has_more)}, "before": {json.dumps(first_id)}, "after": {json.dumps(last_id)}}}'
@@ -1,11 +1,11 @@
 import logging
 from datetime import datetime
-from typing import Sequence
+from typing import Any, AsyncIterator, Optional, Sequence
 
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert, func
 
-from BaseAlchemyRepository import BaseAlchemyRepository
+from BaseAlchemyRepository import BaseAlchemyRepository, BaseAsyncAlchemyRepository
 from message.Message import Message
 
 
@@ -26,6 +26,34 @@ class MessageRepository(BaseAlchemyRepository):
         message.id = new_message.id
         return message
 
+    @staticmethod
+    def insert_messages(conversation_id, messages: Sequence[BaseMessage]):
+        """
+        :return: The statement inserting the messages and returning their ids in the same order, run as a
+         single multi-row INSERT, and its parameters.
+        """
+        created_on = datetime.now()
+        stmt = insert(Message).returning(Message.id, sort_by_parameter_order=True)
+        parameters = [dict(conversation_id=int(conversation_id), role=message.type, content=message.content,
+                           created_on=created_on) for message in messages]
+        return stmt, parameters
+
+    def save_many(self, conversation_id, messages: Sequence[BaseMessage]) -> Sequence[BaseMessage]:
+        """
+        Stores the messages of a turn with one INSERT and one commit.
+        :param conversation_id: The id of the conversation.
+        :param messages: The messages, their id is set to the one of their row.
+        :return: The messages.
+        """
+        if not messages:
+            return messages
+        stmt, parameters = self.insert_messages(conversation_id, messages)
+        ids = self.db.execute(stmt, parameters).scalars().all()
+        self.db.commit()
+        for message, message_id in zip(messages, ids):
+            message.id = message_id
+        return messages
+
     def get_all_messages_by_conversation_id(self, conversation_id) -> list[BaseMessage]:
 
         stmt = select(Message).where(Message.conversation_id == int(conversation_id)).order_by(Message.id.asc())
@@ -33,13 +61,63 @@ class MessageRepository(BaseAlchemyRepository):
 
         return [self.as_lc_message(message) for message in messages]
 
+    @staticmethod
+    def last_messages_statement(conversation_id, limit: int):
+        # Newest first to be served by the (conversation_id, id) index, put back in order by the callers
+        return (select(Message).where(Message.conversation_id == int(conversation_id))
+                .order_by(Message.id.desc()).limit(limit))
+
+    @staticmethod
+    def page_statement(conversation_id, before: Optional[int], after: Optional[int], limit: int):
+        """
+        Selects a page of messages of a conversation as plain rows, oldest first: the messages following
+        after, or else the ones preceding before, or else the last ones. One more message is selected
+        than asked, with a rank over limit, to tell whether there are more beyond the page.
+        """
+        newer = after is not None
+        rank = func.row_number().over(order_by=Message.id.asc() if newer else Message.id.desc()).label("rank")
+        page = (select(Message.id, Message.role, Message.content, Message.created_on, rank)
+                .where(Message.conversation_id == int(conversation_id)))
+        if newer:
+            page = page.where(Message.id > after).order_by(Message.id.asc())
+        else:
+            if before is not None:
+                page = page.where(Message.id < before)
+            page = page.order_by(Message.id.desc())
+        page = page.limit(limit + 1).subquery("page")
+        return select(page).order_by(page.c.id.asc())
+
+    def get_last_messages_by_conversation_id(self, conversation_id, limit: int) -> list[BaseMessage]:
+        """
+        Finds the last messages of a conversation.
+        :param conversation_id: The id of the conversation.
+        :param limit: The number of messages to return.
+        :return: The messages, oldest first.
+        """
+        messages: Sequence[Message] = self.db.execute(
+            self.last_messages_statement(conversation_id, limit)).scalars().all()
+
+        return [self.as_lc_message(message) for message in reversed(messages)]
+
+    def get_messages_between(self, conversation_id, after_id: int, before_id: int, limit: int) -> list[BaseMessage]:
+        """
+        :return: The last messages of a conversation with an id in ]after_id, before_id[, oldest first.
+        """
+        stmt = (select(Message)
+                .where(Message.conversation_id == int(conversation_id), Message.id > after_id, Message.id < before_id)
+                .order_by(Message.id.desc()).limit(limit))
+        messages: Sequence[Message] = self.db.execute(stmt).scalars().all()
+
+        return [self.as_lc_message(message) for message in reversed(messages)]
+
     def delete_by_conversation_id(self, conversation_id):
         stmt = delete(Message).where(Message.conversation_id == int(conversation_id))
         affected_rows = self.db.execute(stmt)
         self.db.commit()
         return affected_rows.rowcount
 
-    def as_lc_message(self, message: Message) -> HumanMessage | AIMessage | SystemMessage:
+    @staticmethod
+    def as_lc_message(message: Message) -> HumanMessage | AIMessage | SystemMessage:
         if message.role == "human":
             return HumanMessage(id=message.id, content=message.content)
         elif message.role == "ai":
@@ -49,3 +127,56 @@ class MessageRepository(BaseAlchemyRepository):
         else:
             logging.error(message.role)
             raise ValueError(f"Unknown message role: {message.role}")
+
+
+class AsyncMessageRepository(BaseAsyncAlchemyRepository):
+
+    async def save(self, conversation_id, message: BaseMessage):
+
+        new_message = Message(
+            conversation_id=int(conversation_id),
+            role=message.type,
+            content=message.content,
+            created_on=datetime.now(),
+
+        )
+        self.db.add(new_message)
+        await self.db.commit()
+        await self.db.refresh(new_message)
+        message.id = new_message.id
+        return message
+
+    async def save_many(self, conversation_id, messages: Sequence[BaseMessage]) -> Sequence[BaseMessage]:
+        if not messages:
+            return messages
+        stmt, parameters = MessageRepository.insert_messages(conversation_id, messages)
+        ids = (await self.db.execute(stmt, parameters)).scalars().all()
+        await self.db.commit()
+        for message, message_id in zip(messages, ids):
+            message.id = message_id
+        return messages
+
+    async def get_all_messages_by_conversation_id(self, conversation_id) -> list[BaseMessage]:
+
+        stmt = select(Message).where(Message.conversation_id == int(conversation_id)).order_by(Message.id.asc())
+        messages: Sequence[Message] = (await self.db.execute(stmt)).scalars().all()
+
+        return [MessageRepository.as_lc_message(message) for message in messages]
+
+    async def get_last_messages_by_conversation_id(self, conversation_id, limit: int) -> list[BaseMessage]:
+        messages: Sequence[Message] = (await self.db.execute(
+            MessageRepository.last_messages_statement(conversation_id, limit))).scalars().all()
+
+        return [MessageRepository.as_lc_message(message) for message in reversed(messages)]
+
+    async def stream_page(self, conversation_id, before: Optional[int], after: Optional[int],
+                          limit: int) -> AsyncIterator[Any]:
+        """
+        Streams a page of messages, see MessageRepository.page_statement.
+        """
+        result = await self.db.stream(MessageRepository.page_statement(conversation_id, before, after, limit))
+        try:
+            async for row in result:
+                yield row
+        finally:
+            await result.close()
@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+import config
+from message.ConversationSummary import ConversationSummary
+from message.ConversationSummaryRepository import ConversationSummaryRepository
+from message.MessageRepository import MessageRepository
+
+# Tokens added per message for its role and separators in the prompt
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# Most recent messages considered for the window, the older ones are only known through the summary
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "50"))
+
+# Model folding the evicted messages into the summary
+SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "4o-mini")
+
+# Messages folded by one update, older ones left out of a first summary are dropped
+SUMMARY_BATCH_SIZE = int(os.getenv("HISTORY_SUMMARY_BATCH_SIZE", "100"))
+
+# Size asked of the summary, it is part of the history budget
+SUMMARY_MAX_WORDS = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "300"))
+
+# Summaries updated at the same time, each conversation still has at most one update running
+SUMMARY_WORKERS = int(os.getenv("HISTORY_SUMMARY_WORKERS", "4"))
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a user and an assistant.
+Update the summary with the new messages below. Keep the facts, decisions, names, figures and open questions
+that later turns may need, drop the small talk. Answer with the updated summary only, in at most {max_words} words,
+in the language of the conversation.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+def message_id(message: BaseMessage) -> int:
+    return int(message.id)
+
+
+def message_tokens(message: BaseMessage, count_tokens: Callable[[str], int]) -> int:
+    return count_tokens(message.content) + MESSAGE_TOKEN_OVERHEAD
+
+
+def fit_to_budget(messages: Sequence[BaseMessage], token_budget: int, count_tokens: Callable[[str], int]) \
+        -> tuple[list[BaseMessage], list[BaseMessage]]:
+    """
+    Keeps the most recent messages fitting in the token budget.
+    :param messages: The messages, oldest first.
+    :param token_budget: The tokens the kept messages may use.
+    :param count_tokens: Counts the tokens of a text.
+    :return: The kept messages and the evicted ones, both oldest first. The last message is always kept,
+     truncated if it does not fit on its own.
+    """
+    kept = []
+    total = 0
+    for index in range(len(messages) - 1, -1, -1):
+        tokens = message_tokens(messages[index], count_tokens)
+        if total + tokens > token_budget:
+            if not kept:
+                kept.append(truncate(messages[index], tokens, token_budget))
+                index -= 1
+            return kept[::-1], list(messages[:index + 1])
+        kept.append(messages[index])
+        total += tokens
+    return kept[::-1], []
+
+
+def truncate(message: BaseMessage, tokens: int, token_budget: int) -> BaseMessage:
+    keep = max(0, int(len(message.content) * (token_budget - MESSAGE_TOKEN_OVERHEAD) / tokens))
+    return message.model_copy(update={"content": message.content[:keep] + " [truncated]"})
+
+
+def summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+
+def format_messages(messages: Sequence[BaseMessage]) -> str:
+    return "\n".join(f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+                     for message in messages)
+
+
+class RollingSummarizer:
+    """
+    Folds the messages gone out of the history window into the summary of their conversation, in
+    background threads so that no request waits for the model. Each conversation has at most one update
+    queued or running, so its updates never race, while a slow one does not hold back the other
+    conversations. An update takes every message not summarized yet up to its bound.
+    """
+
+    def __init__(self, workers: int = SUMMARY_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rolling-summary")
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, conversation_id: str, before_id: int):
+        """
+        Requests the summary of a conversation to cover its messages older than before_id.
+        """
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+        self.executor.submit(self._run, conversation_id, before_id)
+
+    def _run(self, conversation_id: str, before_id: int):
+        try:
+            self.update(conversation_id, before_id)
+        except Exception as e:
+            logging.exception(f"Summary of conversation {conversation_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
+
+    @staticmethod
+    def update(conversation_id: str, before_id: int) -> Optional[str]:
+        """
+        :return: The updated summary, None if there was nothing to fold in.
+        """
+        # Imported here, the model registry is only needed by the background thread
+        from chat.azure_openai import get_model
+
+        with config.SessionLocal() as session:
+            summary_repository = ConversationSummaryRepository(session)
+            current = summary_repository.get(conversation_id)
+            after_id = current.last_message_id if current is not None else 0
+            messages = MessageRepository(session).get_messages_between(conversation_id, after_id, before_id,
+                                                                    SUMMARY_BATCH_SIZE)
+            if not messages:
+                return None
+
+            prompt = SUMMARY_PROMPT.format(max_words=SUMMARY_MAX_WORDS,
+                                           summary=current.summary if current is not None else "(none)",
+                                           messages=format_messages(messages))
+            summary = get_model(SUMMARY_MODEL).invoke(prompt).content
+            summary_repository.save(conversation_id, summary, message_id(messages[-1]))
+            return summary
+
+
+summarizer = RollingSummarizer()
+
+
+def history_token_budget() -> Optional[int]:
+    """Token budget of the history, None to keep the last messages whatever their size"""
+    budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "0"))
+    return budget if budget > 0 else None
+
+
+def build_window(conversation_id: str, candidates: Sequence[BaseMessage], summary: Optional[ConversationSummary],
+                 token_budget: int, count_tokens: Callable[[str], int],
+                 rolling_summarizer: RollingSummarizer = summarizer) -> list[BaseMessage]:
+    """
+    Builds the history of a turn within the token budget: the summary of the conversation, then the most
+    recent messages fitting in what is left. When messages are left out that the summary does not cover
+    yet, its update is scheduled for a later turn.
+    :param conversation_id: The id of the conversation.
+    :param candidates: The last HISTORY_MAX_MESSAGES messages of the conversation, oldest first.
+    :param summary: The stored summary of the conversation, if any.
+    :param token_budget: The tokens the history may use.
+    :param count_tokens: Counts the tokens of a text.
+    :param rolling_summarizer: The summarizer to schedule the update on.
+    :return: The messages of the history.
+    """
+    prefix = []
+    budget = token_budget
+    if summary is not None:
+        prefix = [summary_message(summary.summary)]
+        budget -= message_tokens(prefix[0], count_tokens)
+
+    kept, evicted = fit_to_budget(candidates, max(budget, MESSAGE_TOKEN_OVERHEAD + 1), count_tokens)
+    if kept and (evicted or len(candidates) >= HISTORY_MAX_MESSAGES):
+        covered = summary.last_message_id if summary is not None else 0
+        if not evicted or message_id(evicted[-1]) > covered:
+            rolling_summarizer.schedule(conversation_id, message_id(kept[0]))
+    return prefix + kept
@@ -1,41 +1,136 @@
+from typing import Optional, Sequence
+
 from langchain.memory import ConversationBufferMemory
 from langchain.schema import BaseChatMessageHistory
 from langchain_core.messages import BaseMessage
 
-from message.MessageRepository import MessageRepository
+from embeddings.PageParser import count_tokens
+from message.ConversationSummaryRepository import ConversationSummaryRepository, \
+    AsyncConversationSummaryRepository
+from message.MessageRepository import MessageRepository, AsyncMessageRepository
+from message.RollingSummary import HISTORY_MAX_MESSAGES, build_window, history_token_budget
+
+# Number of past messages given to the model, when the history has no token budget
+HISTORY_WINDOW = 10
+
+ASYNC_ONLY = ("AsyncSqlMessageHistory goes through an AsyncMessageRepository and only works in async chains "
+              "(ainvoke, astream): use aget_messages() and aadd_messages(), or SqlMessageHistory for sync chains")
 
 
 class SqlMessageHistory(BaseChatMessageHistory):
     conversation_id: str
     message_repository: MessageRepository
 
-    def __init__(self, conversation_id: str, message_repository: MessageRepository):
+    def __init__(self, conversation_id: str, message_repository: MessageRepository,
+                 token_budget: Optional[int] = None):
+        """
+        :param token_budget: Tokens of the history, the messages that do not fit are folded into the rolling
+         summary of the conversation, see message/RollingSummary.py. None keeps the last HISTORY_WINDOW
+         messages.
+        """
         self.conversation_id = conversation_id
         self.message_repository = message_repository
+        self.token_budget = token_budget
+        # The history is built for one turn, the window is read once and then kept up to date
+        self._window: Optional[list[BaseMessage]] = None
 
     @property
     def messages(self):
-        """ Finds all messages that belong to the given conversation_id """
-        messages = self.message_repository.get_all_messages_by_conversation_id(self.conversation_id)
-        current_len = len(messages)
-        if current_len >= 10:
-            messages = messages[current_len-10:]
-
-        return messages
+        """ Finds the last messages that belong to the given conversation_id """
+        if self._window is None and self.token_budget is None:
+            self._window = self.message_repository.get_last_messages_by_conversation_id(self.conversation_id,
+                                                                                         HISTORY_WINDOW)
+        elif self._window is None:
+            candidates = self.message_repository.get_last_messages_by_conversation_id(self.conversation_id,
+                                                                                      HISTORY_MAX_MESSAGES)
+            summary = ConversationSummaryRepository(self.message_repository.db).get(self.conversation_id)
+            self._window = build_window(self.conversation_id, candidates, summary, self.token_budget, count_tokens)
+        return list(self._window)
 
     def add_message(self, message: BaseMessage):
         """ Creates and stores a new message tied to the given conversation_id  with the provided role and content """
-        return self.message_repository.save(self.conversation_id, message)
+        self.add_messages([message])
+        return message
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Stores the messages of the turn in one INSERT, RunnableWithMessageHistory hands them all at the end
+        of the turn
+        """
+        self.message_repository.save_many(self.conversation_id, messages)
+        if self.token_budget is not None:
+            # Fitted again on the next read
+            self._window = None
+        elif self._window is not None:
+            self._window = (self._window + list(messages))[-HISTORY_WINDOW:]
 
     def clear(self):
         # TODO NBL : not sure that it is required, but to check
-        pass
+        self._window = None
+
+
+class AsyncSqlMessageHistory(BaseChatMessageHistory):
+    """
+    Same history as SqlMessageHistory, read and written through an AsyncMessageRepository. The sync accessors
+    of BaseChatMessageHistory would have to block on the event loop, they fail with ASYNC_ONLY instead.
+    """
+    conversation_id: str
+    message_repository: AsyncMessageRepository
+
+    def __init__(self, conversation_id: str, message_repository: AsyncMessageRepository,
+                 token_budget: Optional[int] = None):
+        self.conversation_id = conversation_id
+        self.message_repository = message_repository
+        self.token_budget = token_budget
+        self._window: Optional[list[BaseMessage]] = None
+
+    @property
+    def messages(self):
+        raise RuntimeError(ASYNC_ONLY)
+
+    async def aget_messages(self) -> list[BaseMessage]:
+        """ Finds the last messages that belong to the given conversation_id """
+        if self._window is None and self.token_budget is None:
+            self._window = await self.message_repository.get_last_messages_by_conversation_id(
+                self.conversation_id, HISTORY_WINDOW)
+        elif self._window is None:
+            candidates = await self.message_repository.get_last_messages_by_conversation_id(
+                self.conversation_id, HISTORY_MAX_MESSAGES)
+            summary = await AsyncConversationSummaryRepository(self.message_repository.db).get(self.conversation_id)
+            self._window = build_window(self.conversation_id, candidates, summary, self.token_budget, count_tokens)
+        return list(self._window)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """ Stores the messages of the turn tied to the given conversation_id, in one INSERT """
+        await self.message_repository.save_many(self.conversation_id, messages)
+        if self.token_budget is not None:
+            self._window = None
+        elif self._window is not None:
+            self._window = (self._window + list(messages))[-HISTORY_WINDOW:]
+
+    def add_message(self, message: BaseMessage):
+        raise RuntimeError(ASYNC_ONLY)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        raise RuntimeError(ASYNC_ONLY)
+
+    def clear(self):
+        self._window = None
 
 
 def build_agent_memory(message_repository: MessageRepository, conversation_id):
     return SqlMessageHistory(
         conversation_id=conversation_id,
         message_repository=message_repository,
+        token_budget=history_token_budget(),
+    )
+
+
+def build_async_agent_memory(message_repository: AsyncMessageRepository, conversation_id):
+    return AsyncSqlMessageHistory(
+        conversation_id=conversation_id,
+        message_repository=message_repository,
+        token_budget=history_token_budget(),
     )
 
 
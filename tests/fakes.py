@@ -0,0 +1,79 @@
+from sqlalchemy.dialects import postgresql
+
+
+class FakeResult:
+    """Result of a fake session, holding the value or the rows answered to a statement"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def first(self):
+        return self.value
+
+    def scalar_one(self):
+        return self.value
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.value
+
+
+class FakeSession:
+    """
+    Answers the statements in order, then with None, and records them compiled for PostgreSQL with their
+    parameters. Opened as a context manager, it is closed at the end of the block like a session of the pool.
+    """
+
+    def __init__(self, answers=(), literal_binds=False):
+        self.answers = list(answers)
+        self.literal_binds = literal_binds
+        self.statements = []
+        self.parameters = []
+        self.added = []
+        self.commits = 0
+        self.closed = False
+
+    def _answer(self, stmt, parameters):
+        compile_kwargs = {"literal_binds": True} if self.literal_binds else {}
+        self.statements.append(stmt.compile(dialect=postgresql.dialect(), compile_kwargs=compile_kwargs))
+        self.parameters.append(parameters)
+        return FakeResult(self.answers.pop(0) if self.answers else None)
+
+    def execute(self, stmt, parameters=None):
+        return self._answer(stmt, parameters)
+
+    def add(self, instance):
+        instance.id = 7
+        self.added.append(instance)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.closed = True
+
+
+class FakeAsyncSession(FakeSession):
+
+    async def execute(self, stmt, parameters=None):
+        return self._answer(stmt, parameters)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
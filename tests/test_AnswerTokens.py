@@ -0,0 +1,32 @@
+import unittest
+
+from langchain_core.messages import AIMessageChunk
+
+from chat.AnswerTokens import AnswerTokens
+
+
+def stream_event(run_id, content="", tool_call_chunks=()):
+    chunk = AIMessageChunk(content=content, tool_call_chunks=list(tool_call_chunks))
+    return {"event": "on_chat_model_stream", "run_id": run_id, "data": {"chunk": chunk}}
+
+
+class TestAnswerTokens(unittest.TestCase):
+
+    def test_tool_calling_step_is_left_out(self):
+        tool_call = {"name": "search_library", "args": '{"query": "q"}', "id": "call_1", "index": 0}
+        events = [stream_event("step", tool_call_chunks=[tool_call]),
+                  stream_event("step", content=" the library"),
+                  stream_event("answer", content="The answer"),
+                  stream_event("answer", content=" is 42")]
+        answer_tokens = AnswerTokens()
+
+        tokens = [answer_tokens.token(event) for event in events]
+        self.assertEqual(tokens, ["", "", "The answer", " is 42"])
+
+    def test_answer_without_tools(self):
+        answer_tokens = AnswerTokens()
+        self.assertEqual(answer_tokens.token(stream_event("answer", content="Hello")), "Hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
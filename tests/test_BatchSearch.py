@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from embeddings import BatchSearch
+
+
+class FakeEmbeddings:
+
+    def __init__(self):
+        self.calls = []
+
+    async def aembed_queries(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class FakeRetriever:
+
+    def __init__(self, cached=None):
+        self.cached = cached
+        self.searched = []
+
+    def get_cached(self, query):
+        return self.cached
+
+    async def asearch_embedded(self, query, embedding):
+        self.searched.append((query, embedding))
+        await asyncio.sleep(0)
+        return [Document(page_content=query, metadata={})]
+
+
+class TestBatchSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.embeddings = FakeEmbeddings()
+        patcher = patch.object(BatchSearch, "get_embeddings", return_value=self.embeddings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queries_are_embedded_in_one_call(self):
+        retrievers = [FakeRetriever(), FakeRetriever(), FakeRetriever()]
+        searches = [("a", retrievers[0], "one"), ("b", retrievers[1], "three"), ("c", retrievers[2], "seven")]
+
+        results = asyncio.run(BatchSearch.abatch_search(searches))
+
+        self.assertEqual(self.embeddings.calls, [["one", "three", "seven"]])
+        self.assertEqual(list(results.keys()), ["a", "b", "c"])
+        self.assertEqual(results["b"][0].page_content, "three")
+        self.assertEqual(retrievers[2].searched, [("seven", [5.0])])
+
+    def test_cached_queries_are_neither_embedded_nor_searched(self):
+        cached = FakeRetriever(cached=[Document(page_content="cached", metadata={})])
+        searches = [("a", cached, "one"), ("b", FakeRetriever(), "two")]
+
+        results = asyncio.run(BatchSearch.abatch_search(searches))
+
+        self.assertEqual(self.embeddings.calls, [["two"]])
+        self.assertEqual(cached.searched, [])
+        self.assertEqual(results["a"][0].page_content, "cached")
+
+    def test_all_cached(self):
+        cached = FakeRetriever(cached=[])
+        self.assertEqual(asyncio.run(BatchSearch.abatch_search([("a", cached, "one")])), {"a": []})
+        self.assertEqual(self.embeddings.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import unittest
+
+from sqlalchemy.dialects import postgresql
+
+from document.BlobStore import ZSTD, AsyncBlobStore
+from fakes import FakeResult
+
+
+class FakeLargeObjects:
+    """Session keeping the large objects in memory, and the blob_content rows by hash"""
+
+    def __init__(self):
+        self.objects = {}
+        self.blobs = {}
+        self.unlinked = []
+
+    async def execute(self, stmt):
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        params = list(compiled.params.values())
+        if "lo_create" in sql:
+            oid = len(self.objects) + 1
+            self.objects[oid] = b""
+            return FakeResult(oid)
+        if "lo_put" in sql:
+            oid, offset, data = params
+            self.objects[oid] = self.objects[oid][:offset] + data
+            return FakeResult(None)
+        if "lo_get" in sql:
+            oid, offset, length = params
+            return FakeResult(self.objects[oid][offset:offset + length])
+        if "lo_unlink" in sql:
+            self.unlinked.append(params[0])
+            return FakeResult(None)
+        if "INSERT INTO blob_content" in sql:
+            content_hash, oid = params[0], params[1]
+            self.blobs.setdefault(content_hash, oid)
+            return FakeResult(self.blobs[content_hash])
+        raise AssertionError(sql)
+
+
+async def chunks_of(*parts):
+    for part in parts:
+        yield part
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestAsyncBlobStore(unittest.TestCase):
+
+    def test_same_content_is_stored_once(self):
+        session = FakeLargeObjects()
+        store = AsyncBlobStore(session)
+        first = asyncio.run(store.put(chunks_of(b"abc", b"de")))
+        second = asyncio.run(store.put(chunks_of(b"abcde")))
+
+        self.assertEqual(first, second)
+        self.assertEqual(first.content_hash, hashlib.sha256(b"abcde").hexdigest())
+        self.assertEqual(list(session.blobs.values()), [1])
+        self.assertEqual(session.unlinked, [2])
+
+    def test_compressed_range_is_decompressed_from_the_start(self):
+        content = bytes(range(256)) * 100
+        session = FakeLargeObjects()
+        asyncio.run(AsyncBlobStore(session, ZSTD).put(chunks_of(content[:10000], content[10000:])))
+        self.assertLess(len(session.objects[1]), len(content))
+
+        parts = asyncio.run(collect(AsyncBlobStore(session).iter_range(1, ZSTD, 5000, 20000, chunk_size=64)))
+        self.assertEqual(b"".join(parts), content[5000:20000])
+
+    def test_uncompressed_range(self):
+        session = FakeLargeObjects()
+        asyncio.run(AsyncBlobStore(session).put(chunks_of(b"0123456789")))
+
+        parts = asyncio.run(collect(AsyncBlobStore(session).iter_range(1, None, 2, 9, chunk_size=3)))
+        self.assertEqual(parts, [b"234", b"567", b"8"])
+
+
+if __name__ == "__main__":
+    unittest.main()
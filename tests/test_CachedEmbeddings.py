@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+
+from langchain_core.embeddings import Embeddings
+
+from embeddings.CachedEmbeddings import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.underlying = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(self.underlying, model="model", deployment="deployment",
+                                           max_bytes=1024 * 1024, persistent=False)
+
+    def test_embed_query_is_cached(self):
+        first = self.embeddings.embed_query("hello")
+        second = self.embeddings.embed_query("hello")
+        self.assertEqual(first, [5.0, 1.0])
+        self.assertEqual(second, first)
+        self.assertEqual(self.underlying.calls, [["hello"]])
+        self.assertEqual(self.embeddings.stats()["memory"]["hits"], 1)
+
+    def test_embed_queries_embeds_missing_texts_in_one_call(self):
+        self.embeddings.embed_query("a")
+        result = self.embeddings.embed_queries(["a", "bb", "ccc", "bb"])
+        self.assertEqual(result, [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0], [2.0, 1.0]])
+        self.assertEqual(self.underlying.calls, [["a"], ["bb", "ccc"]])
+
+    def test_aembed_query_shares_the_cache(self):
+        self.embeddings.embed_query("hello")
+        self.assertEqual(asyncio.run(self.embeddings.aembed_query("hello")), [5.0, 1.0])
+        self.assertEqual(len(self.underlying.calls), 1)
+
+    def test_aembed_queries_embeds_missing_texts_in_one_call(self):
+        self.embeddings.embed_query("a")
+        result = asyncio.run(self.embeddings.aembed_queries(["a", "bb", "bb"]))
+        self.assertEqual(result, [[1.0, 1.0], [2.0, 1.0], [2.0, 1.0]])
+        self.assertEqual(self.underlying.calls, [["a"], ["bb"]])
+
+    def test_embed_documents_is_not_cached(self):
+        self.embeddings.embed_documents(["a"])
+        self.embeddings.embed_documents(["a"])
+        self.assertEqual(len(self.underlying.calls), 2)
+        self.assertEqual(len(self.embeddings.memory_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
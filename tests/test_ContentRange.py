@@ -0,0 +1,47 @@
+import unittest
+
+from document.ContentRange import RangeNotSatisfiable, etag_matches, make_etag, parse_range
+
+
+class TestParseRange(unittest.TestCase):
+
+    def test_no_header(self):
+        self.assertIsNone(parse_range(None, 100))
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+
+    def test_open_range(self):
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+
+    def test_end_is_clamped(self):
+        self.assertEqual(parse_range("bytes=500-5000", 1000), (500, 999))
+
+    def test_ignored_ranges(self):
+        for header in ["items=0-1", "bytes=0-1,5-6", "bytes=a-b", "bytes=5-1"]:
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range("bytes=1000-", 1000)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range("bytes=-0", 1000)
+
+
+class TestEtag(unittest.TestCase):
+
+    def test_matches(self):
+        etag = make_etag("abc")
+        self.assertTrue(etag_matches('"abc"', etag))
+        self.assertTrue(etag_matches('"x", W/"abc"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"abd"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from datetime import datetime
+
+from conversation.Conversation import Conversation
+from conversation.ConversationRepository import ConversationRepository
+from fakes import FakeSession
+
+
+class TestConversationRepository(unittest.TestCase):
+
+    def test_page_of_conversations(self):
+        conversation = Conversation(id=41, perimeter="alice", document_id=3, description="chat",
+                                    created_on=datetime(2025, 1, 2))
+        session = FakeSession([[(conversation, "report.pdf"), (conversation, None)]], literal_binds=True)
+        conversations = ConversationRepository(session).get_conversation_by_perimeter("alice", before=42, limit=20)
+
+        sql = " ".join(str(session.statements[0]).split())
+        self.assertIn("NOT (EXISTS (SELECT assistants.id FROM assistants "
+                      "WHERE assistants.conversation_id = conversation.id))", sql)
+        self.assertIn("conversation.id < 42", sql)
+        self.assertTrue(sql.endswith("ORDER BY conversation.id DESC LIMIT 20"))
+        self.assertEqual([c.pdf_name for c in conversations], ["report.pdf", ""])
+        self.assertEqual(conversations[0].created_on, "02.01.2025")
+
+    def test_whole_list(self):
+        session = FakeSession([[]], literal_binds=True)
+        ConversationRepository(session).get_conversation_by_perimeter("alice")
+
+        self.assertNotIn("LIMIT", str(session.statements[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from embeddings.Diversity import suppress_near_duplicates, maximal_marginal_relevance, diversify
+
+
+class TestDiversity(unittest.TestCase):
+
+    def setUp(self):
+        # 0 and 1 are near copies, 2 is relevant but different, 3 is off topic
+        self.vectors = np.array([[1.0, 0.0, 0.0],
+                                 [0.99, -0.01, 0.0],
+                                 [0.6, 0.8, 0.0],
+                                 [0.0, 0.0, 1.0]])
+        self.query = np.array([1.0, 0.3, 0.0])
+
+    def test_suppress_near_duplicates_keeps_the_best_ranked_copy(self):
+        self.assertEqual(suppress_near_duplicates(self.vectors, 0.98).tolist(), [0, 2, 3])
+
+    def test_suppress_near_duplicates_without_duplicates(self):
+        self.assertEqual(suppress_near_duplicates(np.eye(3), 0.9).tolist(), [0, 1, 2])
+
+    def test_mmr_with_lambda_one_is_the_relevance_order(self):
+        self.assertEqual(maximal_marginal_relevance(self.query, self.vectors, 3, 1.0), [0, 1, 2])
+
+    def test_mmr_skips_the_copy(self):
+        self.assertEqual(maximal_marginal_relevance(self.query, self.vectors, 2, 0.5), [0, 2])
+
+    def test_mmr_k_larger_than_candidates(self):
+        self.assertEqual(len(maximal_marginal_relevance(self.query, self.vectors, 10, 0.5)), 4)
+
+    def test_diversify_rows(self):
+        rows = [SimpleNamespace(name=i, embedding=vector) for i, vector in enumerate(self.vectors)]
+        result = diversify(rows, self.query, k=2, mmr_lambda=0.7, duplicate_threshold=0.98)
+        self.assertEqual([row.name for row in result], [0, 2])
+
+    def test_diversify_without_k_keeps_all_distinct_rows(self):
+        rows = [SimpleNamespace(name=i, embedding=vector) for i, vector in enumerate(self.vectors)]
+        result = diversify(rows, self.query, k=None, duplicate_threshold=0.98)
+        self.assertEqual([row.name for row in result], [0, 2, 3])
+
+    def test_diversify_empty(self):
+        self.assertEqual(diversify([], self.query, k=5, mmr_lambda=0.5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from LRUCache import LRUCache
+from document import DocumentText as document_text
+
+
+class FakeDocumentsRepository:
+
+    def __init__(self, content_hash, content=b"some text"):
+        self.db = None
+        self.content_hash = content_hash
+        self.content = content
+        self.content_reads = 0
+
+    def get_content_hash(self, blob_id):
+        return self.content_hash
+
+    def get_document_by_id(self, blob_id):
+        self.content_reads += 1
+        return SimpleNamespace(name="notes.txt", document=self.content)
+
+
+class FakeTextRepository:
+    stored = {}
+
+    def __init__(self, db):
+        pass
+
+    def get_pages(self, content_hash):
+        return self.stored.get(content_hash)
+
+    def save_pages(self, content_hash, pages):
+        self.stored[content_hash] = pages
+
+
+class TestLoadDocumentText(unittest.TestCase):
+
+    def setUp(self):
+        FakeTextRepository.stored = {}
+        patches = [patch.object(document_text, "DocumentTextRepository", FakeTextRepository),
+                   patch.object(document_text, "text_cache", LRUCache(1024))]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_content_is_extracted_once(self):
+        repository = FakeDocumentsRepository("hash")
+        self.assertEqual(document_text.load_document_text(repository, 1), "some text")
+        self.assertEqual(document_text.load_document_text(repository, 1), "some text")
+
+        self.assertEqual(repository.content_reads, 1)
+        self.assertEqual(FakeTextRepository.stored, {"hash": ["some text"]})
+
+    def test_stored_pages_are_served_without_the_content(self):
+        FakeTextRepository.stored = {"hash": ["page 1 ", "page 2"]}
+        repository = FakeDocumentsRepository("hash")
+
+        self.assertEqual(document_text.load_document_text(repository, 1), "page 1 page 2")
+        self.assertEqual(repository.content_reads, 0)
+
+    def test_document_without_hash_is_not_stored(self):
+        repository = FakeDocumentsRepository(None)
+        self.assertEqual(document_text.load_document_text(repository, 1), "some text")
+        self.assertEqual(FakeTextRepository.stored, {})
+
+    def test_missing_document(self):
+        self.assertIsNone(document_text.load_document_text(FakeDocumentsRepository(None, content=None), 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
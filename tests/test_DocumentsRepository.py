@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from document import DocumentsRepository as repository
+from document.BlobStore import MissingContentError
+from document.Document import DocumentCreate
+from fakes import FakeAsyncSession
+
+
+def stored(content_oid, size, external=True, blob_oid=None, compression=None, content_hash=None):
+    return SimpleNamespace(content_oid=content_oid, size=size, external=external, blob_oid=blob_oid,
+                           compression=compression, content_hash=content_hash)
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+async def chunks_of(*parts):
+    for part in parts:
+        yield part
+
+
+class TestAsyncDocumentsRepository(unittest.TestCase):
+
+    def test_iter_content_reads_large_object_by_offset(self):
+        session = FakeAsyncSession([stored(content_oid=42, size=5), b"abc", b"de"])
+        chunks = asyncio.run(collect(repository.AsyncDocumentsRepository(session).iter_content(1, chunk_size=3)))
+
+        self.assertEqual(chunks, [b"abc", b"de"])
+        reads = session.statements[1:]
+        self.assertTrue(all("lo_get" in str(stmt) for stmt in reads))
+        self.assertEqual([list(stmt.params.values())[1:] for stmt in reads], [[0, 3], [3, 2]])
+
+    def test_iter_content_of_a_range(self):
+        session = FakeAsyncSession([stored(content_oid=42, size=10), b"cde", b"f"])
+        chunks = asyncio.run(collect(repository.AsyncDocumentsRepository(session).iter_content(
+            1, start=2, end=5, chunk_size=3)))
+
+        self.assertEqual(chunks, [b"cde", b"f"])
+        self.assertEqual([list(stmt.params.values())[1:] for stmt in session.statements[1:]], [[2, 3], [5, 1]])
+
+    def test_iter_content_of_bytea_document(self):
+        session = FakeAsyncSession([stored(content_oid=None, size=4, external=False), b"ab", b"cd"])
+        chunks = asyncio.run(collect(repository.AsyncDocumentsRepository(session).iter_content(1, chunk_size=2)))
+
+        self.assertEqual(chunks, [b"ab", b"cd"])
+        self.assertIn("substring", str(session.statements[1]))
+
+    def test_iter_content_of_missing_document(self):
+        session = FakeAsyncSession([None])
+        self.assertEqual(asyncio.run(collect(repository.AsyncDocumentsRepository(session).iter_content(1))), [])
+
+    def test_iter_content_of_blob_store_document(self):
+        session = FakeAsyncSession([stored(content_oid=None, size=5, blob_oid=43), b"abc", b"de"])
+        chunks = asyncio.run(collect(repository.AsyncDocumentsRepository(session).iter_content(1, chunk_size=3)))
+
+        self.assertEqual(chunks, [b"abc", b"de"])
+        self.assertEqual([list(stmt.params.values()) for stmt in session.statements[1:]], [[43, 0, 3], [43, 3, 2]])
+
+    def test_iter_content_of_a_content_missing_from_the_blob_store(self):
+        session = FakeAsyncSession([stored(content_oid=None, size=5, content_hash="abc")])
+        with self.assertRaises(MissingContentError):
+            asyncio.run(collect(repository.AsyncDocumentsRepository(session).iter_content(1)))
+
+    def test_content_info_of_a_content_missing_from_the_blob_store(self):
+        session = FakeAsyncSession([stored(content_oid=None, size=5, content_hash="abc")])
+        with self.assertRaises(MissingContentError):
+            asyncio.run(repository.AsyncDocumentsRepository(session).get_content_info(1))
+
+    def test_content_info(self):
+        session = FakeAsyncSession([stored(content_oid=None, size=5, content_hash="abc", blob_oid=43)])
+        info = asyncio.run(repository.AsyncDocumentsRepository(session).get_content_info(1))
+        self.assertEqual((info.size, info.content_hash), (5, "abc"))
+
+    def test_save_stream_stores_the_content_in_the_blob_store(self):
+        session = FakeAsyncSession([42, None, None, 42])
+        document = DocumentCreate(name="a.pdf", owner="alice", perimeter="alice")
+        with patch.object(repository, "retrieval_cache"):
+            saved = asyncio.run(repository.AsyncDocumentsRepository(session).save_stream(
+                document, chunks_of(b"abc", b"de")))
+
+        self.assertIn("blob_content", str(session.statements[3]))
+        self.assertIsNone(session.added[0].content_oid)
+        self.assertEqual(session.added[0].content_size, 5)
+        self.assertEqual(session.added[0].content_hash, hashlib.sha256(b"abcde").hexdigest())
+        self.assertEqual(session.commits, 1)
+        self.assertEqual(saved.id, "7")
+
+
+if __name__ == "__main__":
+    unittest.main()
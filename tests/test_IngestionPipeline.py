@@ -0,0 +1,178 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from document.Document import DocumentCreate, DocumentStatus, DocumentType
+from embeddings import IngestionPipeline as ingestion
+from embeddings.PageParser import Chunk, hash_content
+
+
+class FakeEmbeddings:
+
+    def __init__(self):
+        self.batches = []
+
+    async def aembed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def chunk(page, text):
+    return Chunk(page, text, 1, hash_content(text))
+
+
+def no_stored_vectors(pipeline):
+    async def find_vectors(collection_id, content_hashes):
+        return {}
+    return patch.object(pipeline, "find_vectors", side_effect=find_vectors)
+
+
+class FakeSessionMaker:
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *args):
+        pass
+
+
+def fake_documents_repository(document):
+    class FakeDocumentsRepository:
+
+        def __init__(self, session):
+            pass
+
+        async def get_content(self, blob_id):
+            return b"content"
+
+        async def get_by_id(self, blob_id):
+            return document
+
+    return FakeDocumentsRepository
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestIngestionPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.pipeline = ingestion.IngestionPipeline(workers=1, chunk_size=100, chunk_overlap=10,
+                                                    embed_batch_size=2, embed_concurrency=2)
+        self.addCleanup(self.pipeline.close)
+
+    def test_build_metadata(self):
+        metadata = self.pipeline.build_metadata(12, "report.pdf", "alice team", Chunk(3, "text", 7, "hash"))
+        self.assertEqual(metadata, {"blob_id": "12", "file_name": "report.pdf", "page": 3, "text": "text",
+                                    "perimeter": "/alice/ /team/", "token_count": 7})
+
+    def test_embed_batches_keep_the_chunk_order(self):
+        chunks = [chunk(1, "a" * (i + 1)) for i in range(5)]
+        fake = FakeEmbeddings()
+        with patch.object(ingestion, "get_embeddings", return_value=fake), no_stored_vectors(self.pipeline):
+            batches = asyncio.run(collect(self.pipeline.embed(chunks, "collection", {})))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual([vector for batch in batches for _, vector in batch],
+                         [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual(len(fake.batches), 3)
+
+    def test_embed_reuses_stored_and_repeated_contents(self):
+        chunks = [chunk(1, "header"), chunk(1, "new"), chunk(2, "header"), chunk(2, "stored")]
+        stored = {hash_content("stored"): [42.0]}
+        fake = FakeEmbeddings()
+        stats = {}
+
+        async def find_vectors(collection_id, content_hashes):
+            return {h: stored[h] for h in content_hashes if h in stored}
+
+        with patch.object(ingestion, "get_embeddings", return_value=fake), \
+                patch.object(self.pipeline, "find_vectors", side_effect=find_vectors):
+            batches = asyncio.run(collect(self.pipeline.embed(chunks, "collection", stats)))
+
+        self.assertEqual(sorted(text for batch in fake.batches for text in batch), ["header", "new"])
+        self.assertEqual([vector for batch in batches for _, vector in batch],
+                         [[6.0], [3.0], [6.0], [42.0]])
+        self.assertEqual((stats["embedded_chunks"], stats["reused_chunks"]), (2, 2))
+
+    def test_embed_without_reuse_does_not_look_up(self):
+        self.pipeline.reuse_vectors = False
+        fake = FakeEmbeddings()
+        with patch.object(ingestion, "get_embeddings", return_value=fake), \
+                patch.object(self.pipeline, "find_vectors") as find_vectors:
+            asyncio.run(collect(self.pipeline.embed([chunk(1, "a")], "collection", {})))
+
+        find_vectors.assert_not_called()
+        self.assertEqual(fake.batches, [["a"]])
+
+    def test_ingest_skips_the_documents_the_jobs_do_not_embed(self):
+        document = DocumentCreate(name="t.docx", owner="alice", perimeter="alice", document_type=DocumentType.TEMPLATE)
+        with patch.object(ingestion.config, "AsyncSessionLocal", FakeSessionMaker), \
+                patch.object(ingestion, "AsyncDocumentsRepository", fake_documents_repository(document)), \
+                patch.object(self.pipeline, "claim_embedding_jobs") as claim:
+            self.assertIsNone(asyncio.run(self.pipeline.ingest(1)))
+
+        claim.assert_not_called()
+
+    def test_ingest_takes_over_the_queued_embedding_job(self):
+        document = DocumentCreate(name="a.txt", owner="alice", perimeter="alice")
+        statuses = []
+
+        async def claim(blob_id):
+            return [5]
+
+        async def set_status(blob_id, status, job_ids):
+            statuses.append((status, job_ids))
+
+        async def parse(name, content):
+            raise ValueError("unreadable")
+
+        with patch.object(ingestion.config, "AsyncSessionLocal", FakeSessionMaker), \
+                patch.object(ingestion, "AsyncDocumentsRepository", fake_documents_repository(document)), \
+                patch.object(self.pipeline, "claim_embedding_jobs", side_effect=claim), \
+                patch.object(self.pipeline, "set_status", side_effect=set_status), \
+                patch.object(self.pipeline, "parse", side_effect=parse):
+            asyncio.run(self.pipeline.ingest(1))
+
+        self.assertEqual(statuses, [(DocumentStatus.IN_PROGRESS, [5]), (DocumentStatus.FAILED, [5])])
+
+    def test_embed_nothing(self):
+        with patch.object(ingestion, "get_embeddings", return_value=FakeEmbeddings()):
+            self.assertEqual(asyncio.run(collect(self.pipeline.embed([], "collection", {}))), [])
+
+
+
+async def produce(events, count, fail=False):
+    for index in range(count):
+        events.append(f"produced {index}")
+        yield index
+    if fail:
+        raise ValueError("embedding failed")
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_producer_runs_ahead_of_the_consumer(self):
+        events = []
+
+        async def consume():
+            async for item in ingestion.prefetch(produce(events, 3), 2):
+                await asyncio.sleep(0)
+                events.append(f"consumed {item}")
+
+        asyncio.run(consume())
+        self.assertLess(events.index("produced 1"), events.index("consumed 0"))
+        self.assertEqual([event for event in events if event.startswith("consumed")],
+                         ["consumed 0", "consumed 1", "consumed 2"])
+
+    def test_producer_error_reaches_the_consumer(self):
+        async def consume():
+            return [item async for item in ingestion.prefetch(produce([], 2, fail=True), 1)]
+
+        with self.assertRaises(ValueError):
+            asyncio.run(consume())
+
+
+if __name__ == "__main__":
+    unittest.main()
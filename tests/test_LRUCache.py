@@ -0,0 +1,65 @@
+import unittest
+
+from LRUCache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(max_size=100)
+
+    def test_get_missing_key(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_put_and_get(self):
+        self.cache.put("a", [1.0], 10)
+        self.assertEqual(self.cache.get("a"), [1.0])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.size, 10)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.put("a", "a", 40)
+        self.cache.put("b", "b", 40)
+        self.cache.get("a")
+        self.cache.put("c", "c", 40)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.get("c"), "c")
+        self.assertEqual(self.cache.size, 80)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_put_replaces_existing_entry(self):
+        self.cache.put("a", "old", 30)
+        self.cache.put("a", "new", 50)
+        self.assertEqual(self.cache.get("a"), "new")
+        self.assertEqual(self.cache.size, 50)
+
+    def test_entry_larger_than_the_cache_is_not_stored(self):
+        self.cache.put("a", "a", 101)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.size, 0)
+
+    def test_pop(self):
+        self.cache.put("a", "a", 10)
+        self.assertEqual(self.cache.pop("a"), "a")
+        self.assertIsNone(self.cache.pop("a"))
+        self.assertEqual(self.cache.size, 0)
+
+    def test_remove_if(self):
+        self.cache.put(1, "odd", 10)
+        self.cache.put(2, "even", 10)
+        self.cache.put(3, "odd", 10)
+        self.assertEqual(self.cache.remove_if(lambda key, value: value == "odd"), 2)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.size, 10)
+
+    def test_hit_ratio(self):
+        self.cache.put("a", "a", 10)
+        self.cache.get("a")
+        self.cache.get("b")
+        self.assertEqual(self.cache.stats()["hit_ratio"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+from message.MessagePage import encode_message_page
+
+
+def row(message_id, rank):
+    return SimpleNamespace(id=message_id, role="human", content=f"message {message_id}",
+                           created_on=datetime(2025, 1, 1), rank=rank)
+
+
+async def rows_of(rows):
+    for item in rows:
+        yield item
+
+
+def encode(rows, limit):
+    async def collect():
+        return "".join([chunk async for chunk in encode_message_page(rows_of(rows), limit)])
+    return json.loads(asyncio.run(collect()))
+
+
+class TestEncodeMessagePage(unittest.TestCase):
+
+    def test_older_messages_beyond_the_page(self):
+        # Page read backwards: the extra row is the oldest one
+        page = encode([row(10, 3), row(11, 2), row(12, 1)], limit=2)
+
+        self.assertEqual([message["id"] for message in page["messages"]], [11, 12])
+        self.assertEqual((page["has_more"], page["before"], page["after"]), (True, 11, 12))
+        self.assertEqual(page["messages"][0], {"id": 11, "type": "human", "content": "message 11",
+                                               "created_on": "2025-01-01T00:00:00"})
+
+    def test_newer_messages_beyond_the_page(self):
+        # Page read forwards: the extra row is the newest one
+        page = encode([row(10, 1), row(11, 2), row(12, 3)], limit=2)
+
+        self.assertEqual([message["id"] for message in page["messages"]], [10, 11])
+        self.assertTrue(page["has_more"])
+
+    def test_last_page(self):
+        page = encode([row(10, 1)], limit=2)
+        self.assertEqual((len(page["messages"]), page["has_more"]), (1, False))
+
+    def test_empty_page(self):
+        self.assertEqual(encode([], limit=2), {"messages": [], "has_more": False, "before": None, "after": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from langchain_core.messages import AIMessage, HumanMessage
+from fakes import FakeSession
+from message.MessageRepository import MessageRepository
+
+
+class TestMessageRepository(unittest.TestCase):
+
+    def test_save_many_inserts_once_and_sets_the_ids(self):
+        session = FakeSession([[10, 11]])
+        messages = [HumanMessage(content="question"), AIMessage(content="answer")]
+        MessageRepository(session).save_many("3", messages)
+
+        self.assertEqual(len(session.statements), 1)
+        parameters = session.parameters[0]
+        self.assertIn("RETURNING message.id", str(session.statements[0]))
+        self.assertEqual([(p["conversation_id"], p["role"], p["content"]) for p in parameters],
+                         [(3, "human", "question"), (3, "ai", "answer")])
+        self.assertEqual(session.commits, 1)
+        self.assertEqual([message.id for message in messages], [10, 11])
+
+    def test_save_nothing(self):
+        session = FakeSession()
+        MessageRepository(session).save_many("3", [])
+        self.assertEqual((session.statements, session.commits), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, exc
+
+import config
+from PoolMetrics import MeteredQueuePool, PoolMetrics
+
+
+def sqlite_engine(**kwargs):
+    return create_engine("sqlite://", poolclass=MeteredQueuePool, **kwargs)
+
+
+class TestPoolMetrics(unittest.TestCase):
+
+    def test_record(self):
+        metrics = PoolMetrics()
+        metrics.record(0.2)
+        metrics.record(0.4, timed_out=True)
+
+        stats = metrics.stats()
+        self.assertEqual(stats["waits"], 2)
+        self.assertAlmostEqual(stats["wait_seconds"], 0.6)
+        self.assertAlmostEqual(stats["mean_wait_seconds"], 0.3)
+        self.assertEqual(stats["max_wait_seconds"], 0.4)
+        self.assertEqual(stats["timeouts"], 1)
+
+    def test_stats_follow_checkouts(self):
+        engine = sqlite_engine(pool_size=1, max_overflow=1)
+        first = engine.connect()
+        second = engine.connect()
+
+        stats = engine.pool.stats()
+        self.assertEqual(stats["checked_out"], 2)
+        self.assertEqual(stats["overflow"], 1)
+        self.assertEqual(stats["waits"], 2)
+
+        second.close()
+        first.close()
+        self.assertEqual(engine.pool.stats()["checked_out"], 0)
+        engine.dispose()
+
+    def test_timeouts_are_counted(self):
+        engine = sqlite_engine(pool_size=1, max_overflow=0, pool_timeout=0.01)
+        with engine.connect():
+            with self.assertRaises(exc.TimeoutError):
+                engine.connect()
+
+        stats = engine.pool.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertGreaterEqual(stats["max_wait_seconds"], 0.01)
+        engine.dispose()
+
+
+class TestEngineOptions(unittest.TestCase):
+
+    def test_defaults(self):
+        with patch.dict(os.environ, {}, clear=True):
+            options = config.engine_options()
+
+        self.assertEqual(options["pool_size"], 5)
+        self.assertEqual(options["max_overflow"], 10)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertNotIn("connect_args", options)
+
+    def test_from_environment(self):
+        environment = {"DB_POOL_SIZE": "3", "DB_MAX_OVERFLOW": "0", "DB_POOL_PRE_PING": "false",
+                       "DB_POOL_RECYCLE": "600", "DB_STATEMENT_TIMEOUT_MS": "15000"}
+        with patch.dict(os.environ, environment, clear=True):
+            options = config.engine_options()
+
+        self.assertEqual((options["pool_size"], options["max_overflow"], options["pool_recycle"]), (3, 0, 600))
+        self.assertFalse(options["pool_pre_ping"])
+        self.assertEqual(options["connect_args"], {"options": "-c statement_timeout=15000"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from langchain_core.documents import Document
+
+from embeddings.RetrievalCache import RetrievalCache
+
+
+def chunk(blob_id: str, content: str = "content") -> Document:
+    return Document(page_content=content, metadata={"blob_id": blob_id})
+
+
+PERIMETER_FILTER = {"perimeters": {"$in": ["finance", "hr"]}}
+
+
+class TestRetrievalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = RetrievalCache(max_bytes=1024 * 1024, ttl=60)
+
+    def test_key_normalizes_query(self):
+        self.cache.put("What is  the Budget?", {"blob_id": {"$eq": "1"}}, 10, [chunk("1")])
+        self.assertIsNotNone(self.cache.get("what is the budget? ", {"blob_id": {"$eq": "1"}}, 10))
+
+    def test_key_includes_filter_and_k(self):
+        self.cache.put("query", {"blob_id": {"$eq": "1"}}, 10, [chunk("1")])
+        self.assertIsNone(self.cache.get("query", {"blob_id": {"$eq": "2"}}, 10))
+        self.assertIsNone(self.cache.get("query", {"blob_id": {"$eq": "1"}}, 5))
+
+    def test_returned_documents_are_copies(self):
+        self.cache.put("query", {"blob_id": {"$eq": "1"}}, 10, [chunk("1")])
+        self.cache.get("query", {"blob_id": {"$eq": "1"}}, 10)[0].metadata["blob_id"] = "changed"
+        self.assertEqual(self.cache.get("query", {"blob_id": {"$eq": "1"}}, 10)[0].metadata["blob_id"], "1")
+
+    def test_expired_entry_is_a_miss(self):
+        cache = RetrievalCache(max_bytes=1024, ttl=-1)
+        cache.put("query", {}, 10, [chunk("1")])
+        self.assertIsNone(cache.get("query", {}, 10))
+
+    def test_invalidate_blob_id_filters(self):
+        self.cache.put("query", {"blob_id": {"$in": ["1", "2"]}}, 10, [])
+        self.cache.put("query", {"blob_id": {"$eq": "3"}}, 10, [])
+        self.assertEqual(self.cache.invalidate(2), 1)
+        self.assertIsNone(self.cache.get("query", {"blob_id": {"$in": ["1", "2"]}}, 10))
+        self.assertIsNotNone(self.cache.get("query", {"blob_id": {"$eq": "3"}}, 10))
+
+    def test_invalidate_entries_containing_the_document(self):
+        self.cache.put("query", PERIMETER_FILTER, 10, [chunk("7")])
+        self.assertEqual(self.cache.invalidate("7", "/legal/"), 1)
+
+    def test_invalidate_perimeter_filters(self):
+        self.cache.put("query", PERIMETER_FILTER, 10, [chunk("7")])
+        self.assertEqual(self.cache.invalidate("8", "/legal/"), 0)
+        self.assertEqual(self.cache.invalidate("8", "/legal/ /hr/"), 1)
+
+    def test_invalidate_perimeter_path_filters_on_any_segment(self):
+        self.cache.put("query", {"perimeters": {"$in": ["finance/emea"]}}, 10, [])
+        self.assertEqual(self.cache.invalidate("8", "/legal/"), 0)
+        self.assertEqual(self.cache.invalidate("8", "/emea/"), 1)
+
+    def test_invalidate_unknown_perimeter_drops_perimeter_filters(self):
+        self.cache.put("query", PERIMETER_FILTER, 10, [chunk("7")])
+        self.assertEqual(self.cache.invalidate("8"), 1)
+
+    def test_search_overlapping_an_invalidation_is_not_cached(self):
+        generation = self.cache.generation
+        # The document is deleted while the search runs
+        self.cache.invalidate("7", "/finance/")
+
+        self.assertFalse(self.cache.put("query", PERIMETER_FILTER, 10, [chunk("7")], generation))
+        self.assertIsNone(self.cache.get("query", PERIMETER_FILTER, 10))
+
+    def test_search_after_an_invalidation_is_cached(self):
+        self.cache.invalidate("7", "/finance/")
+        generation = self.cache.generation
+
+        self.assertTrue(self.cache.put("query", PERIMETER_FILTER, 10, [chunk("8")], generation))
+        self.assertIsNotNone(self.cache.get("query", PERIMETER_FILTER, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from message.RollingSummary import MESSAGE_TOKEN_OVERHEAD, RollingSummarizer, build_window, fit_to_budget
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def conversation(*sizes):
+    """Messages of the given number of words, with ids 1, 2, ..."""
+    return [(HumanMessage if i % 2 == 0 else AIMessage)(id=i + 1, content=" ".join(["word"] * size))
+            for i, size in enumerate(sizes)]
+
+
+class FakeSummarizer:
+
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, conversation_id, before_id):
+        self.scheduled.append((conversation_id, before_id))
+
+
+class TestFitToBudget(unittest.TestCase):
+
+    def test_keeps_the_most_recent_messages(self):
+        messages = conversation(10, 10, 10, 10)
+        kept, evicted = fit_to_budget(messages, 2 * (10 + MESSAGE_TOKEN_OVERHEAD), count_words)
+
+        self.assertEqual([m.id for m in kept], ["3", "4"])
+        self.assertEqual([m.id for m in evicted], ["1", "2"])
+
+    def test_a_large_message_evicts_the_older_ones(self):
+        messages = conversation(5, 1000, 5)
+        kept, evicted = fit_to_budget(messages, 100, count_words)
+
+        self.assertEqual([m.id for m in kept], ["3"])
+        self.assertEqual(len(evicted), 2)
+
+    def test_last_message_is_truncated_to_fit(self):
+        kept, evicted = fit_to_budget(conversation(1000), 104, count_words)
+
+        self.assertEqual(evicted, [])
+        self.assertEqual(kept[0].id, "1")
+        self.assertLessEqual(count_words(kept[0].content), 101)
+
+    def test_everything_fits(self):
+        kept, evicted = fit_to_budget(conversation(1, 1), 100, count_words)
+        self.assertEqual((len(kept), evicted), (2, []))
+
+
+class TestBuildWindow(unittest.TestCase):
+
+    def test_summary_comes_first_and_counts_in_the_budget(self):
+        summary = SimpleNamespace(summary="they talked", last_message_id=2)
+        summarizer = FakeSummarizer()
+        window = build_window("7", conversation(10, 10, 10, 10), summary,
+                              2 * (10 + MESSAGE_TOKEN_OVERHEAD) + 9, count_words, summarizer)
+
+        self.assertIsInstance(window[0], SystemMessage)
+        self.assertIn("they talked", window[0].content)
+        self.assertEqual([m.id for m in window[1:]], ["4"])
+        self.assertEqual(summarizer.scheduled, [("7", 4)])
+
+    def test_no_update_when_the_summary_covers_the_evicted_messages(self):
+        summary = SimpleNamespace(summary="s", last_message_id=2)
+        summarizer = FakeSummarizer()
+        # 6 words + overhead for the summary, two messages of 10 words
+        window = build_window("7", conversation(10, 10, 10, 10), summary,
+                              6 + MESSAGE_TOKEN_OVERHEAD + 2 * (10 + MESSAGE_TOKEN_OVERHEAD), count_words, summarizer)
+
+        self.assertEqual([m.id for m in window[1:]], ["3", "4"])
+        self.assertEqual(summarizer.scheduled, [])
+
+    def test_no_update_when_nothing_is_evicted(self):
+        summarizer = FakeSummarizer()
+        window = build_window("7", conversation(1, 1), None, 1000, count_words, summarizer)
+
+        self.assertEqual(len(window), 2)
+        self.assertEqual(summarizer.scheduled, [])
+
+
+
+class TestRollingSummarizer(unittest.TestCase):
+
+    def test_slow_summary_does_not_hold_back_other_conversations(self):
+        release = threading.Event()
+        done = threading.Event()
+        calls = []
+
+        def update(conversation_id, before_id):
+            calls.append(conversation_id)
+            if conversation_id == "slow":
+                release.wait(5)
+            else:
+                done.set()
+
+        summarizer = RollingSummarizer(workers=2)
+        self.addCleanup(summarizer.executor.shutdown)
+        with patch.object(RollingSummarizer, "update", side_effect=update):
+            summarizer.schedule("slow", 10)
+            # Already pending, not queued a second time
+            summarizer.schedule("slow", 12)
+            summarizer.schedule("fast", 10)
+            self.assertTrue(done.wait(5))
+            release.set()
+            summarizer.executor.shutdown(wait=True)
+
+        self.assertEqual(sorted(calls), ["fast", "slow"])
+
+
+if __name__ == "__main__":
+    unittest.main()
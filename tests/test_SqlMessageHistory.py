@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from message.SqlMessageHistory import HISTORY_WINDOW, AsyncSqlMessageHistory, SqlMessageHistory
+
+
+class FakeMessageRepository:
+
+    def __init__(self, count):
+        self.stored = [HumanMessage(id=i, content=f"message {i}") for i in range(count)]
+        self.reads = 0
+        self.writes = 0
+
+    def get_last_messages_by_conversation_id(self, conversation_id, limit):
+        self.reads += 1
+        return self.stored[-limit:]
+
+    def save_many(self, conversation_id, messages):
+        self.writes += 1
+        for message in messages:
+            message.id = len(self.stored)
+            self.stored.append(message)
+        return messages
+
+
+class FakeAsyncMessageRepository(FakeMessageRepository):
+
+    async def get_last_messages_by_conversation_id(self, conversation_id, limit):
+        return super().get_last_messages_by_conversation_id(conversation_id, limit)
+
+    async def save_many(self, conversation_id, messages):
+        return super().save_many(conversation_id, messages)
+
+
+class TestSqlMessageHistory(unittest.TestCase):
+
+    def test_window_is_read_once_per_turn(self):
+        repository = FakeMessageRepository(25)
+        history = SqlMessageHistory("1", repository)
+
+        for _ in range(3):
+            messages = history.messages
+        self.assertEqual(repository.reads, 1)
+        self.assertEqual([message.id for message in messages], [str(i) for i in range(25 - HISTORY_WINDOW, 25)])
+
+    def test_added_messages_slide_the_window(self):
+        repository = FakeMessageRepository(25)
+        history = SqlMessageHistory("1", repository)
+        history.messages
+        history.add_message(AIMessage(content="answer"))
+
+        self.assertEqual(history.messages, repository.stored[-HISTORY_WINDOW:])
+        self.assertEqual(repository.reads, 1)
+
+    def test_short_conversation(self):
+        self.assertEqual(len(SqlMessageHistory("1", FakeMessageRepository(3)).messages), 3)
+
+    def test_async_history(self):
+        repository = FakeAsyncMessageRepository(12)
+        history = AsyncSqlMessageHistory("1", repository)
+
+        async def turn():
+            await history.aget_messages()
+            await history.aadd_messages([HumanMessage(content="question"), AIMessage(content="answer")])
+            return await history.aget_messages()
+
+        self.assertEqual(asyncio.run(turn()), repository.stored[-HISTORY_WINDOW:])
+        self.assertEqual((repository.reads, repository.writes), (1, 1))
+
+    def test_async_history_rejects_sync_access(self):
+        history = AsyncSqlMessageHistory("7", FakeAsyncMessageRepository(0))
+
+        with self.assertRaisesRegex(RuntimeError, "aget_messages"):
+            history.messages
+        with self.assertRaisesRegex(RuntimeError, "aadd_messages"):
+            history.add_messages([HumanMessage("hi")])
+
+    def test_turn_is_stored_in_one_write(self):
+        repository = FakeMessageRepository(0)
+        messages = [HumanMessage(content="question"), AIMessage(content="answer")]
+        SqlMessageHistory("1", repository).add_messages(messages)
+
+        self.assertEqual(repository.writes, 1)
+        self.assertEqual([message.id for message in messages], [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import asyncio
+import json
+import unittest
+
+from SseEncoder import format_sse, encode_events
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestSseEncoder(unittest.TestCase):
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse("token", {"token": "Hello"}), 'event: token\ndata: {"token": "Hello"}\n\n')
+
+    def test_format_sse_keeps_new_lines_in_a_single_data_line(self):
+        event = format_sse("token", {"token": "line 1\nline 2"})
+        self.assertEqual(event.count("\n"), 3)
+        self.assertEqual(json.loads(event.split("data: ")[1]), {"token": "line 1\nline 2"})
+
+    def test_encode_events(self):
+        async def events():
+            yield "token", {"token": "a"}
+            yield "end", {"sources": [{"blob_id": "1"}]}
+
+        self.assertEqual(asyncio.run(collect(encode_events(events()))),
+                         ['event: token\ndata: {"token": "a"}\n\n',
+                          'event: end\ndata: {"sources": [{"blob_id": "1"}]}\n\n'])
+
+    def test_encode_events_sends_errors_as_last_event(self):
+        async def events():
+            yield "token", {"token": "a"}
+            raise ValueError("boom")
+
+        chunks = asyncio.run(collect(encode_events(events())))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[1], 'event: error\ndata: {"detail": "boom"}\n\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+
+from LRUCache import LRUCache
+from document import TemplatePlaceholders as template_placeholders
+from document.TemplatePlaceholders import format_placeholder, format_placeholders, index_placeholders
+
+
+class FakeDocumentsRepository:
+
+    def get_content_hash(self, blob_id):
+        return "hash"
+
+
+class TestIndexPlaceholders(unittest.TestCase):
+
+    def test_windows_around_placeholders(self):
+        text = "Dear @@@ client @@@, your contract @@@number@@@ ends soon."
+        placeholders = index_placeholders(text, window=5)
+
+        self.assertEqual([(p.id, p.name) for p in placeholders], [(1, "client"), (2, "number")])
+        self.assertEqual((placeholders[0].before, placeholders[0].after), ("Dear ", ", you"))
+        self.assertEqual((placeholders[1].before, placeholders[1].after), ("ract ", " ends"))
+        self.assertEqual(text[placeholders[1].start:placeholders[1].end], "@@@number@@@")
+
+    def test_close_placeholder_keeps_its_whole_window(self):
+        text = "Dear @@@client@@@, your contract @@@number@@@ starts on @@@date@@@."
+        placeholders = index_placeholders(text, window=30)
+
+        self.assertEqual(placeholders[1].before, "r @@@client@@@, your contract ")
+        self.assertIn("your contract @@@number@@@ starts on", format_placeholder(placeholders[1]))
+
+    def test_list_does_not_repeat_text(self):
+        text = "Dear @@@client@@@, your contract @@@number@@@ starts on @@@date@@@."
+        rendered = format_placeholders(index_placeholders(text, window=30))
+
+        self.assertEqual(rendered.count("your contract"), 1)
+        self.assertEqual(rendered.count("starts on"), 1)
+        self.assertIn("@@@client@@@, your contract ...", rendered)
+
+    def test_placeholder_over_several_lines(self):
+        self.assertEqual(index_placeholders("x @@@first\nname@@@ y", window=10)[0].name, "first\nname")
+
+    def test_no_placeholder(self):
+        self.assertEqual(index_placeholders("plain text", window=10), [])
+
+    def test_format(self):
+        placeholder = index_placeholders("Dear @@@client@@@,", window=5)[0]
+        self.assertEqual(format_placeholder(placeholder),
+                         'Placeholder 1 "client" at characters 5-17:\n...Dear @@@client@@@,...')
+
+
+class TestLoadTemplatePlaceholders(unittest.TestCase):
+
+    def test_index_is_computed_once_per_content(self):
+        with patch.object(template_placeholders, "placeholder_cache", LRUCache(1024 * 1024)), \
+                patch.object(template_placeholders, "load_document_text", return_value="a @@@b@@@ c") as load:
+            first = template_placeholders.load_template_placeholders(FakeDocumentsRepository(), 1, window=10)
+            second = template_placeholders.load_template_placeholders(FakeDocumentsRepository(), 1, window=10)
+
+        self.assertEqual(first, second)
+        self.assertEqual(load.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import config
+from assistants import ToolManager as tools
+from assistants.ToolSession import async_tool_session, bind_async_session, bind_session, tool_session
+from fakes import FakeAsyncSession, FakeSession
+
+
+class ExclusiveSession(FakeAsyncSession):
+    """Fails when two statements run at the same time, like an AsyncSession"""
+
+    active = False
+
+    async def execute(self, stmt, parameters=None):
+        if self.active:
+            raise RuntimeError("concurrent operations are not permitted")
+        self.active = True
+        await asyncio.sleep(0.01)
+        self.active = False
+        return await super().execute(stmt, parameters)
+
+
+class TestToolSession(unittest.TestCase):
+
+    def test_bound_session_is_used_and_left_open(self):
+        session = FakeSession()
+        with bind_session(session):
+            with tool_session() as used:
+                self.assertIs(used, session)
+        self.assertFalse(session.closed)
+
+    def test_pooled_session_is_closed_without_binding(self):
+        pooled = FakeSession()
+        with patch.object(config, "SessionLocal", return_value=pooled):
+            with tool_session() as used:
+                self.assertIs(used, pooled)
+        self.assertTrue(pooled.closed)
+
+    def test_binding_ends_with_the_block(self):
+        with bind_session(FakeSession()):
+            pass
+        pooled = FakeSession()
+        with patch.object(config, "SessionLocal", return_value=pooled):
+            with tool_session() as used:
+                self.assertIs(used, pooled)
+
+    def test_async_pooled_session_is_closed_without_binding(self):
+        pooled = FakeSession()
+
+        async def use():
+            async with async_tool_session() as used:
+                self.assertIs(used, pooled)
+
+        with patch.object(config, "AsyncSessionLocal", return_value=pooled):
+            asyncio.run(use())
+        self.assertTrue(pooled.closed)
+
+    def test_concurrent_tool_calls_take_turns_on_the_bound_session(self):
+        session = ExclusiveSession([[], [], []])
+
+        async def run():
+            with bind_async_session(session):
+                return await asyncio.gather(*[tools.search_library.ainvoke({"assistant_id": "1", "query": "q"})
+                                              for _ in range(3)])
+
+        self.assertEqual(asyncio.run(run()), [[], [], []])
+        self.assertEqual(len(session.statements), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import unittest
+from unittest import mock
+
+from chat import azure_openai
+from chat.azure_openai import ModelRegistry
+from embeddings.azure_openai import build_embeddings
+
+TEST_ENVIRONMENT = {
+    "AZURE_OPENAI_CH_ENDPOINT": "https://ch.example.com/",
+    "AZURE_OPENAI_API_CH_KEY": "ch-key",
+    "AZURE_OPENAI_SWEDEN_ENDPOINT": "https://sweden.example.com/",
+    "AZURE_OPENAI_SWEDEN_API_KEY": "sweden-key",
+    "AZURE_WHISPER_API_VERSION": "2024-06-01",
+    "AZURE_WHISPER_DEPLOYMENT_NAME": "whisper",
+    "AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT_NAME": "embeddings",
+    "AZURE_OPENAI_EMBEDDINGS_API_VERSION": "2024-10-21",
+}
+for prefix, _ in azure_openai.CHAT_DEPLOYMENTS.values():
+    TEST_ENVIRONMENT[f"{prefix}_API_VERSION"] = "2024-10-21"
+    TEST_ENVIRONMENT[f"{prefix}_CHAT_DEPLOYMENT_NAME"] = f"{prefix.lower()}-deployment"
+    TEST_ENVIRONMENT[f"{prefix}_CHAT_MODEL_NAME"] = "gpt-4o"
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, TEST_ENVIRONMENT)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("AZURE_OPENAI_ENDPOINT", None)
+        os.environ.pop("AZURE_OPENAI_API_KEY", None)
+        self.registry = ModelRegistry()
+
+    def test_get_returns_the_same_client(self):
+        self.assertIs(self.registry.get("4o"), self.registry.get("4o"))
+
+    def test_models_use_the_endpoint_of_their_region(self):
+        self.assertEqual(self.registry.get("o1").azure_endpoint, "https://sweden.example.com/")
+        self.assertEqual(self.registry.get("o3-mini").azure_endpoint, "https://sweden.example.com/")
+        self.assertEqual(self.registry.get("4o").azure_endpoint, "https://ch.example.com/")
+        self.assertEqual(self.registry.get("whisper").azure_endpoint, "https://ch.example.com/")
+
+    def test_environment_is_not_modified(self):
+        self.registry.get("o1")
+        self.registry.get("4o-mini")
+        self.assertNotIn("AZURE_OPENAI_ENDPOINT", os.environ)
+        self.assertNotIn("AZURE_OPENAI_API_KEY", os.environ)
+
+    def test_chat_models_share_the_http_client(self):
+        self.assertIs(self.registry.get("4o").http_client, self.registry.http_client)
+        self.assertIs(self.registry.get("o1").http_async_client, self.registry.http_async_client)
+
+    def test_get_with_invalid_model_name(self):
+        with self.assertRaises(ValueError):
+            self.registry.get("unknown")
+
+    def test_get_model_before_init(self):
+        with mock.patch.object(azure_openai, "registry", None):
+            with self.assertRaises(RuntimeError):
+                azure_openai.get_model("4o")
+
+
+
+class TestBuildEmbeddings(unittest.TestCase):
+
+    def test_credentials_are_given_to_the_client(self):
+        with mock.patch.dict(os.environ, {**TEST_ENVIRONMENT, "EMBEDDING_CACHE_PERSISTENT": "false"}):
+            os.environ.pop("AZURE_OPENAI_ENDPOINT", None)
+            os.environ.pop("AZURE_OPENAI_API_KEY", None)
+            embeddings = build_embeddings()
+
+            self.assertEqual(embeddings.embeddings.azure_endpoint, "https://ch.example.com/")
+            self.assertNotIn("AZURE_OPENAI_ENDPOINT", os.environ)
+            self.assertNotIn("AZURE_OPENAI_API_KEY", os.environ)
+
+
+if __name__ == "__main__":
+    unittest.main()